@@ -14,17 +14,95 @@ SRC = os.path.join(ROOT, 'src')
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-import os, time, json, pandas as pd, streamlit as st
+import io, os, time, json, hashlib, pandas as pd, streamlit as st
 from typing import Dict, Any, Optional, List
-from enrichment.utils import rate_limiter, sanitize_domain
+from enrichment.utils import sanitize_domain
+from enrichment.ratelimit import TokenBucket
 from enrichment.clients.zoominfo import ZoomInfoClient
 from enrichment.clients.apollo import ApolloClient
-from enrichment.logic import do_enrich_row
+from enrichment.clients.transport import Transport
+from enrichment.engine import enrich_frame
+from enrichment.backfill import SalesforceIndex
+from enrichment.jobs import JobRegistry
+from enrichment import sinks
+from enrichment.metrics import REGISTRY as metrics, strategy_table
 
 st.set_page_config(page_title="Company Enrichment (ZoomInfo + Apollo)", layout="wide")
 st.title("Company Enrichment — ZoomInfo + Apollo")
 st.caption("Matching priorities: ZoomInfo ID → Domain → Name; Apollo ID → Salesforce ID → Domain → Name")
 
+@st.cache_data(show_spinner="Parsing CSV...")
+def load_csv(data: bytes) -> pd.DataFrame:
+    # Keyed on the file bytes, so reruns and other sessions uploading the same file skip the parse
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False).fillna("")
+
+@st.cache_resource(show_spinner="Indexing Salesforce accounts...")
+def salesforce_index(digest: str, sf_id_col: str, sf_dom_col: str, _df_sf: pd.DataFrame) -> SalesforceIndex:
+    # One on-disk index per upload and column pair: shared by sessions, reused after a restart
+    source = json.dumps([digest, sf_id_col, sf_dom_col])
+    name = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+    index = SalesforceIndex(os.path.join(ROOT, ".cache", "salesforce", f"{name}.sqlite"))
+    if index.source() != source:
+        index.load([_df_sf], sf_id_col, sf_dom_col, source)
+    return index
+
+@st.cache_resource
+def job_registry() -> JobRegistry:
+    # One registry per server process: jobs outlive reruns and are visible to every session
+    return JobRegistry()
+
+def show_metrics():
+    summary = metrics.summary()
+    http = pd.DataFrame([dict(s["labels"], calls=s["value"])
+                         for s in summary["counters"].get("http_responses_total", [])])
+    st.caption("Per strategy: lookups, outcomes and latency (seconds), across all jobs in this process")
+    st.dataframe(pd.DataFrame(strategy_table(summary)))
+    if not http.empty:
+        st.caption("HTTP status codes per endpoint")
+        st.dataframe(http)
+    retries = sum(s["value"] for s in summary["counters"].get("http_retries_total", []))
+    backoff = sum(s["value"] for s in summary["counters"].get("backoff_seconds_total", []))
+    waited = sum(s["value"] for s in summary["counters"].get("ratelimit_wait_seconds_total", []))
+    st.caption(f"Retries: {int(retries)} · backoff sleep: {backoff:.1f}s · rate-limit wait: {waited:.1f}s")
+
+def _job_panel(job_id: str):
+    job = job_registry().get(job_id)
+    if job is None:
+        return
+    p = job.progress()
+    eta = f" · ~{p['eta_seconds']:.0f}s left" if p["eta_seconds"] else ""
+    st.progress(min(p["fraction"], 1.0), text=f"{p['status'].capitalize()}: {p['done']}/{p['total']} rows"
+                                              f" · {p['rows_per_sec']} rows/s{eta}")
+    if not job.done:
+        c1, c2, _ = st.columns([1, 1, 4])
+        if job.pause_requested:
+            c1.button("Resume", key=f"resume-{job.id}", on_click=job.resume)
+        else:
+            c1.button("Pause", key=f"pause-{job.id}", on_click=job.pause)
+        c2.button("Cancel", key=f"cancel-{job.id}", on_click=job.cancel)
+        if fragment is None:
+            st.button("Refresh progress", key=f"refresh-{job.id}")
+    elif job.status == "failed":
+        st.error(f"Enrichment failed:\n\n{job.error}")
+    if job.done and job.rows and st.session_state.get("df_out_job") != job.id:
+        st.session_state["df_out"] = pd.DataFrame(job.rows)
+        st.session_state["df_out_job"] = job.id
+    if job.done and st.session_state.get("job_finished") != job.id:
+        st.session_state["job_finished"] = job.id
+        if fragment is not None:
+            # A fragment rerun only redraws this panel; the Output tab needs the whole page
+            st.rerun(scope="app")
+    if job.done and job.rows:
+        partial = " (partial: cancelled)" if job.status == "cancelled" else ""
+        st.success(f"Done. Enriched {len(job.rows)} rows{partial}. Move to the 'Output & Rename' tab.")
+    with st.expander("Live metrics", expanded=False):
+        show_metrics()
+
+# Polls every second without blocking the rest of the page (plain function on older Streamlit)
+fragment = getattr(st, "fragment", None)
+job_panel = fragment(run_every=1.0)(_job_panel) if fragment is not None else _job_panel
+
+
 with st.sidebar:
     st.header("API Keys")
     zi_key = st.text_input("ZoomInfo API Key", type="password", value=os.getenv("ZOOMINFO_API_KEY", ""))
@@ -37,6 +115,7 @@ with st.sidebar:
     prefix_zi = st.text_input("ZoomInfo prefix", value="zi")
     prefix_ap = st.text_input("Apollo prefix", value="ap")
     include_inputs = st.checkbox("Include input columns in output", value=True)
+    workers = st.number_input("Rows enriched concurrently", min_value=1, max_value=64, value=4)
 
 tab_upload, tab_mapping, tab_run, tab_output = st.tabs(["1) Upload", "2) Map Columns", "3) Run", "4) Output & Rename"])
 
@@ -49,15 +128,17 @@ with tab_upload:
     sf = st.file_uploader("Salesforce Accounts CSV (optional)", type=["csv"])
 
     if src:
-        df_src = pd.read_csv(src, dtype=str, keep_default_na=False).fillna("")
+        df_src = load_csv(src.getvalue())
         st.write("Sample rows:")
         st.dataframe(df_src.head(10))
         st.session_state["df_src"] = df_src
+        st.session_state["src_name"] = src.name
     if sf:
-        df_sf = pd.read_csv(sf, dtype=str, keep_default_na=False).fillna("")
+        df_sf = load_csv(sf.getvalue())
         st.write("Salesforce sample rows:")
         st.dataframe(df_sf.head(10))
         st.session_state["df_sf"] = df_sf
+        st.session_state["sf_digest"] = hashlib.blake2b(sf.getvalue(), digest_size=16).hexdigest()
 
 with tab_mapping:
     st.subheader("Map Input Columns")
@@ -112,51 +193,50 @@ with tab_run:
             sf_mapping = st.session_state.get("sf_mapping", {})
             df_sf = st.session_state.get("df_sf")
 
-            # Optional backfill from Salesforce CSV
-            if df_sf is not None and mapping_in.get("salesforce_id") and sf_mapping.get("sf_id"):
-                sf_id_col = sf_mapping.get("sf_id")
-                sf_dom_col = sf_mapping.get("sf_domain")
-                if sf_id_col and sf_dom_col and sf_id_col in df_sf.columns and sf_dom_col in df_sf.columns:
-                    sf_map = dict(zip(df_sf[sf_id_col].astype(str), df_sf[sf_dom_col].astype(str)))
-                else:
-                    sf_map = {}
-            else:
-                sf_map = {}
+            # Optional domain backfill from the Salesforce CSV, applied to the lookup keys
+            df_run = df_src
+            sf_index = None
+            if (df_sf is not None and mapping_in.get("salesforce_id") and sf_mapping.get("sf_id")
+                    and sf_mapping.get("sf_domain")):
+                sf_index = salesforce_index(st.session_state["sf_digest"], sf_mapping["sf_id"],
+                                            sf_mapping["sf_domain"], df_sf)
 
             cfg = {
                 "prefix_zoominfo": prefix_zi,
                 "prefix_apollo": prefix_ap,
                 "include_input_columns": include_inputs,
                 "max_attempts": int(max_attempts),
-                "sleep_zi": rate_limiter(int(zi_per_min)),
-                "sleep_ap": rate_limiter(int(ap_per_min))
             }
 
+            pool = max(10, int(workers))
             vendors = {
-                "zoominfo": ZoomInfoClient(zi_key),
-                "apollo": ApolloClient(ap_key)
+                "zoominfo": ZoomInfoClient(zi_key, transport=Transport(pool_size=pool, limiter=TokenBucket(int(zi_per_min)))),
+                "apollo": ApolloClient(ap_key, transport=Transport(pool_size=pool, limiter=TokenBucket(int(ap_per_min))))
             }
 
-            out_rows: List[Dict[str, Any]] = []
-            total = len(df_src)
-            prog = st.progress(0, text="Starting...")
-            for i, row in df_src.iterrows():
-                # Backfill website from SF if missing
-                if mapping_in.get("salesforce_id") and mapping_in.get("website"):
-                    sfid = str(row[mapping_in["salesforce_id"]]) if mapping_in["salesforce_id"] else ""
-                    if sfid and (not str(row[mapping_in["website"]]).strip()):
-                        if sfid in sf_map:
-                            row[mapping_in["website"]] = sf_map[sfid]
-
-                enriched = do_enrich_row(row, mapping_in, vendors, cfg)
-                out_rows.append(enriched)
-                pct = int(((i + 1) / total) * 100)
-                prog.progress(min(pct, 100), text=f"Processed {i+1}/{total} rows")
-                time.sleep(max(cfg["sleep_zi"], cfg["sleep_ap"]))
-
-            df_out = pd.DataFrame(out_rows)
-            st.session_state["df_out"] = df_out
-            st.success(f"Done. Enriched {len(df_out)} rows. Move to the 'Output & Rename' tab.")
+            def make_rows(df=df_run, mapping_in=mapping_in, vendors=vendors, cfg=cfg, workers=int(workers),
+                          sf_index=sf_index):
+                return enrich_frame(df, mapping_in, vendors, cfg, workers=workers, salesforce=sf_index)
+
+            def close_clients(vendors=vendors):
+                for c in vendors.values():
+                    c.transport.close()
+
+            label = f"{st.session_state.get('src_name', 'upload')} ({len(df_run)} rows)"
+            job = job_registry().submit(make_rows, len(df_run), label, on_close=close_clients)
+            st.session_state["job_id"] = job.id
+            st.session_state.pop("df_out", None)
+
+        job_id = st.session_state.get("job_id")
+        if job_id and job_registry().get(job_id) is not None:
+            job_panel(job_id)
+
+        with st.expander("All jobs on this server", expanded=False):
+            jobs = [j.progress() for j in job_registry().jobs()]
+            if jobs:
+                st.dataframe(pd.DataFrame(jobs)[["id", "label", "status", "done", "total", "rows_per_sec", "eta_seconds"]])
+            else:
+                st.caption("No jobs yet.")
 
 with tab_output:
     st.subheader("Preview & Output")
@@ -180,6 +260,11 @@ with tab_output:
                 common_suggestions[col] = "Domain"
             if ".website" in col or "_website" in col:
                 common_suggestions[col] = "Website"
+        # Both vendors suggest the same names; keep them apart with the column's prefix
+        taken = list(common_suggestions.values())
+        for col, name in common_suggestions.items():
+            if name != col and taken.count(name) > 1:
+                common_suggestions[col] = f"{name} ({col.split('_', 1)[0]})"
         seed = json.dumps(common_suggestions, indent=2)
         rename_json = st.text_area("Rename mapping JSON", value=seed, height=200)
         try:
@@ -192,5 +277,22 @@ with tab_output:
         st.write("Final preview:")
         st.dataframe(df_final.head(20))
 
-        csv_bytes = df_final.to_csv(index=False).encode("utf-8")
-        st.download_button("Download CSV", csv_bytes, file_name="enriched_companies.csv", mime="text/csv")
+        dupes = sorted(set(df_final.columns[df_final.columns.duplicated()]))
+        if dupes:
+            # One of each pair of values would be lost (or the file unreadable); make the names unique first
+            st.error(f"Rename mapping produces duplicate column names: {', '.join(map(str, dupes))}")
+        else:
+            csv_bytes = df_final.to_csv(index=False).encode("utf-8")
+            st.download_button("Download CSV", csv_bytes, file_name="enriched_companies.csv", mime="text/csv")
+        if sinks.pa is not None and not dupes:
+            # Typed, compressed columns; much smaller than CSV for wide vendor output. Built on request
+            # and kept until the output or the renames change.
+            parquet_key = (st.session_state.get("df_out_job"), json.dumps(rename_map, sort_keys=True))
+            if st.button("Prepare Parquet download"):
+                buf = io.BytesIO()
+                sinks.write_frame(df_final, buf, "parquet")
+                st.session_state["parquet_out"] = (parquet_key, buf.getvalue())
+            ready = st.session_state.get("parquet_out")
+            if ready is not None and ready[0] == parquet_key:
+                st.download_button("Download Parquet", ready[1], file_name="enriched_companies.parquet",
+                                   mime="application/vnd.apache.parquet")
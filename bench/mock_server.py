@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# Local stand-in for the ZoomInfo (/zoominfo/...) and Apollo (/apollo/...) endpoints the clients hit.
+# python bench/mock_server.py --port 8765 --latency-ms 80 --rate-429 0.02 --rate-5xx 0.01 --payload-kb 4
+import argparse, gzip, json, random, socket, threading, time, zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+class MockConfig:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 20.0, rate_429: float = 0.0,
+                 rate_5xx: float = 0.0, payload_kb: float = 2.0, not_found_rate: float = 0.2,
+                 retry_after: float = 0.2, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.payload_kb = payload_kb
+        self.not_found_rate = not_found_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+def _found(key: str, rate: float) -> bool:
+    # Deterministic per key so repeat lookups (and cache hits) agree with the first answer
+    return zlib.crc32(key.lower().encode()) % 1000 >= rate * 1000
+
+def _company(key: str, payload_kb: float) -> Dict[str, Any]:
+    h = zlib.crc32(key.encode())
+    filler = max(0, int(payload_kb * 1024) - 200)
+    return {"id": h, "name": f"Company {h % 100000}", "website": f"www.{key}" if "." in key else "",
+            "primary_domain": key if "." in key else "", "employeeCount": h % 5000, "revenue": h % 10**7,
+            "industries": ["software", "services"], "city": "Springfield", "country": "US",
+            "description": "x" * filler}
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockVendorServer"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle plus delayed ACK adds ~40 ms a call
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None, vendor: str = ""):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if len(body) > 512 and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, 5)
+            self.send_header("Content-Encoding", "gzip")
+        if vendor:
+            self.server.count(vendor, "bytes", len(body))
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(n) or b"{}") if n else {}
+        url = urlparse(self.path)
+        if url.path == "/__stats":
+            return self._reply(200, self.server.snapshot())
+        vendor, _, path = url.path.lstrip("/").partition("/")
+        path = "/" + path
+        cfg = self.server.cfg
+        with cfg.lock:
+            delay = max(0.0, cfg.latency_ms + cfg.rng.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000.0
+            roll = cfg.rng.random()
+        self.server.count(vendor, path)
+        time.sleep(delay)
+        if roll < cfg.rate_429:
+            self.server.count(vendor, "429")
+            return self._reply(429, {"error": "rate limited"}, {"Retry-After": str(cfg.retry_after)}, vendor)
+        if roll < cfg.rate_429 + cfg.rate_5xx:
+            self.server.count(vendor, "5xx")
+            return self._reply(503, {"error": "unavailable"}, vendor=vendor)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        route = ROUTES.get((vendor, path))
+        if route is None:
+            return self._reply(404, {"error": f"unknown path {path}"})
+        status, payload = route(q, body, cfg)
+        self._reply(status, payload, vendor=vendor)
+
+    do_GET = _handle
+    do_POST = _handle
+
+def _single(key: Optional[str], cfg: MockConfig, wrap=None):
+    if not key or not _found(key, cfg.not_found_rate):
+        return 404, {"error": "not found"}
+    company = _company(key, cfg.payload_kb)
+    return 200, wrap(company) if wrap else company
+
+def _search(key: Optional[str], cfg: MockConfig, results_key: str, page_size: Any = None):
+    # Like the real search APIs, a page of ranked hits (10 unless the request asks for fewer)
+    if not key or not _found(key, cfg.not_found_rate):
+        return 200, {results_key: []}
+    n = max(1, min(int(page_size or 10), 100))
+    return 200, {results_key: [_company(key, cfg.payload_kb)] + [_company(f"{key}#{i}", cfg.payload_kb) for i in range(1, n)]}
+
+def _zi_enrich(q, body, cfg):
+    results = []
+    for item in body.get("matchCompanyInput", []):
+        key = str(item.get("companyWebsite") or item.get("companyId") or "")
+        found = key and _found(key, cfg.not_found_rate)
+        results.append({"input": item, "data": [_company(key, cfg.payload_kb)] if found else [],
+                        "matchStatus": "FULL_MATCH" if found else "NO_MATCH"})
+    return 200, {"data": {"result": results}}
+
+def _ap_bulk(q, body, cfg):
+    return 200, {"organizations": [_company(d, cfg.payload_kb) for d in body.get("domains", [])
+                                   if _found(d, cfg.not_found_rate)]}
+
+ROUTES = {
+    ("zoominfo", "/company/detail"): lambda q, b, c: _single(q.get("companyId"), c),
+    ("zoominfo", "/lookup/company"): lambda q, b, c: _single(q.get("domain"), c),
+    ("zoominfo", "/search/company"): lambda q, b, c: _search(b.get("companyName"), c, "data", b.get("rpp")),
+    ("zoominfo", "/enrich/company"): _zi_enrich,
+    ("apollo", "/companies/enrich"): lambda q, b, c: _single(b.get("domain") or b.get("id"), c,
+                                                              lambda o: {"organization": o}),
+    ("apollo", "/mixed_companies/search"): lambda q, b, c: _search(b.get("q_organization_name"), c, "organizations",
+                                                                    b.get("per_page")),
+    ("apollo", "/companies/search"): lambda q, b, c: _search((b.get("filters") or {}).get("salesforce_id"), c,
+                                                             "organizations", b.get("per_page")),
+    ("apollo", "/organizations/bulk_enrich"): _ap_bulk,
+}
+
+class MockVendorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, cfg: Optional[MockConfig] = None):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.cfg = cfg or MockConfig()
+        self._calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, vendor: str, what: str, n: int = 1) -> None:
+        with self._lock:
+            self._calls[f"{vendor} {what}"] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._calls)
+
+    def start(self) -> "MockVendorServer":
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+def add_arguments(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--latency-ms", type=float, default=50.0, help="Mean response latency")
+    p.add_argument("--jitter-ms", type=float, default=20.0, help="Uniform +/- jitter on the latency")
+    p.add_argument("--rate-429", type=float, default=0.0, help="Fraction of calls answered 429 (with Retry-After)")
+    p.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of calls answered 503")
+    p.add_argument("--payload-kb", type=float, default=2.0, help="Approximate size of each company payload")
+    p.add_argument("--not-found-rate", type=float, default=0.2, help="Fraction of keys with no match")
+    p.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds sent with 429s")
+    p.add_argument("--seed", type=int, default=0)
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+                      rate_5xx=args.rate_5xx, payload_kb=args.payload_kb, not_found_rate=args.not_found_rate,
+                      retry_after=args.retry_after, seed=args.seed)
+
+def main():
+    p = argparse.ArgumentParser(description="Mock ZoomInfo/Apollo server for benchmarks")
+    p.add_argument("--port", type=int, default=8765)
+    add_arguments(p)
+    args = p.parse_args()
+    server = MockVendorServer(args.port, config_from_args(args))
+    print(f"Serving on {server.url} (ZoomInfo base_url {server.url}/zoominfo, Apollo base_url {server.url}/apollo)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Runs scripts/enrich_cli.py against the mock vendor server over inputs of increasing size.
+# python bench/run_bench.py --sizes 1000,10000 --workers 16 --latency-ms 80 --rate-429 0.02
+import argparse, csv, json, os, random, subprocess, sys, tempfile, time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+from mock_server import MockVendorServer, add_arguments, config_from_args
+
+CLI = os.path.join(ROOT, "scripts", "enrich_cli.py")
+STATUS_LABELS = ("429", "5xx", "bytes")
+
+def generate_input(path: str, rows: int, dup_rate: float, seed: int = 0) -> None:
+    # Company name + website, a share of Salesforce IDs, and dup_rate rows repeating an earlier company
+    rng = random.Random(seed)
+    seen: List[List[str]] = []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Account Name", "Website", "Salesforce Id"])
+        for i in range(rows):
+            if seen and rng.random() < dup_rate:
+                w.writerow(rng.choice(seen))
+                continue
+            row = [f"Company {i}",
+                   f"https://www.company{i}.example.com" if rng.random() < 0.8 else "",
+                   f"001{i:012d}" if rng.random() < 0.3 else ""]
+            seen.append(row)
+            w.writerow(row)
+
+def write_config(path: str, url: str, tmp: str, per_min: int, max_attempts: int) -> None:
+    cfg = {
+        "zoominfo": {"base_url": f"{url}/zoominfo"},
+        "apollo": {"base_url": f"{url}/apollo"},
+        "rate_limits": {"zoominfo_per_min": per_min, "apollo_per_min": per_min},
+        "mapping": {"name": "Account Name", "website": "Website", "salesforce_id": "Salesforce Id"},
+        "retries": {"max_attempts": max_attempts, "base_delay_seconds": 0.05},
+        "cache": {"path": os.path.join(tmp, "cache.sqlite")},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f)  # JSON is valid YAML
+
+def run_cli(argv: List[str]) -> Dict[str, Any]:
+    # os.wait4 reports the child's own peak RSS (ru_maxrss is in KiB on Linux)
+    proc = subprocess.Popen([sys.executable, CLI] + argv, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise SystemExit(f"enrich_cli.py exited with {proc.returncode}")
+    return {"peak_rss_mb": round(usage.ru_maxrss / 1024, 1), "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 2)}
+
+def bench_size(server: MockVendorServer, tmp: str, rows: int, args: argparse.Namespace, extra: List[str]) -> Dict[str, Any]:
+    inp = os.path.join(tmp, f"in_{rows}.csv")
+    out = os.path.join(tmp, f"out_{rows}.{args.format}")
+    stats_path = os.path.join(tmp, f"stats_{rows}.json")
+    generate_input(inp, rows, args.dup_rate, args.seed)
+    before = server.snapshot()
+    argv = ["-i", inp, "-o", out, "-c", os.path.join(tmp, "config.yaml"), "--engine", args.engine,
+            "-w", str(args.workers), "--stats-out", stats_path] + extra
+    if not args.cache:
+        argv.append("--no-cache")
+    usage = run_cli(argv)
+    after = server.snapshot()
+    calls = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+    with open(stats_path, encoding="utf-8") as f:
+        stats = json.load(f)
+    http_calls = sum(v for k, v in calls.items() if k.split(" ", 1)[1] not in STATUS_LABELS)
+    return {
+        "rows": rows,
+        "rows_per_sec": stats["rows_per_sec"],
+        "p50_ms": stats["row_latency_ms"]["p50"],
+        "p99_ms": stats["row_latency_ms"]["p99"],
+        "peak_rss_mb": usage["peak_rss_mb"],
+        "cpu_seconds": usage["cpu_seconds"],
+        "calls_per_row": round(http_calls / rows, 3) if rows else None,
+        "kb_per_row": round(sum(v for k, v in calls.items() if k.endswith(" bytes")) / 1024 / rows, 2) if rows else None,
+        "http_429": sum(v for k, v in calls.items() if k.endswith(" 429")),
+        "http_5xx": sum(v for k, v in calls.items() if k.endswith(" 5xx")),
+        "calls": {k: v for k, v in sorted(calls.items()) if v},
+    }
+
+COLUMNS = ("rows", "rows_per_sec", "p50_ms", "p99_ms", "peak_rss_mb", "cpu_seconds", "calls_per_row", "kb_per_row",
+           "http_429", "http_5xx")
+
+def report(result: Dict[str, Any]) -> None:
+    print("  ".join(f"{result[c]!s:>13}" for c in COLUMNS), flush=True)
+
+def regressions(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["rows"]: r for r in json.load(f)["results"]}
+    out = []
+    for r in results:
+        b = baseline.get(r["rows"])
+        if not b:
+            continue
+        if r["rows_per_sec"] < b["rows_per_sec"] * (1 - tolerance):
+            out.append(f"{r['rows']} rows: {r['rows_per_sec']} rows/sec vs baseline {b['rows_per_sec']}")
+        if r["calls_per_row"] > b["calls_per_row"] * (1 + tolerance):
+            out.append(f"{r['rows']} rows: {r['calls_per_row']} calls/row vs baseline {b['calls_per_row']}")
+    return out
+
+def main():
+    p = argparse.ArgumentParser(description="Offline throughput benchmark for enrich_cli.py",
+                                epilog="Arguments after -- are passed to enrich_cli.py (e.g. -- --batch)")
+    p.add_argument("--sizes", default="1000,5000,20000", help="Comma-separated input sizes")
+    p.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    p.add_argument("-w", "--workers", type=int, default=16)
+    p.add_argument("--dup-rate", type=float, default=0.1, help="Share of input rows repeating an earlier company")
+    p.add_argument("--per-min", type=int, default=1_000_000, help="Client rate limit per vendor")
+    p.add_argument("--max-attempts", type=int, default=5)
+    p.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv")
+    p.add_argument("--cache", action="store_true", help="Keep the response cache on (off by default)")
+    p.add_argument("--json-out", default=None, help="Write results as JSON (usable later as --baseline)")
+    p.add_argument("--baseline", default=None, help="Earlier --json-out to compare against; exits 1 on regression")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression vs the baseline")
+    add_arguments(p)
+    argv = sys.argv[1:]
+    extra = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = p.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    server = MockVendorServer(0, config_from_args(args)).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="enrich-bench-") as tmp:
+            write_config(os.path.join(tmp, "config.yaml"), server.url, tmp, args.per_min, args.max_attempts)
+            print("  ".join(f"{c:>13}" for c in COLUMNS))
+            for rows in (int(s) for s in args.sizes.split(",") if s.strip()):
+                results.append(bench_size(server, tmp, rows, args, extra))
+                report(results[-1])
+    finally:
+        server.stop()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "argv": argv, "results": results}, f, indent=2)
+    if args.baseline:
+        problems = regressions(results, args.baseline, args.tolerance)
+        for msg in problems:
+            print(f"REGRESSION {msg}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
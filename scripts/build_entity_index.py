@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import os, sys
+HERE = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+SRC = os.path.join(ROOT, 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import argparse
+from enrichment.entities import EntityIndex, index_outputs
+from enrich_cli import load_config
+
+def main():
+    p = argparse.ArgumentParser(description="Add matched rows of earlier enrich_cli.py outputs to a local entity index")
+    p.add_argument("outputs", nargs="+", help="Enriched outputs (CSV, Parquet or Arrow) that kept their input columns")
+    p.add_argument("--index", default=None, help="Index path (default: entities.path from the config)")
+    p.add_argument("-c", "--config", default=None,
+                   help="YAML config the outputs were produced with (input mapping and output prefixes)")
+    args = p.parse_args()
+    cfg = load_config(args.config)
+    path = args.index or cfg.get("entities", {}).get("path")
+    if not path:
+        p.error("no index path: pass --index or set entities.path in the config")
+    out_cfg = cfg.get("output", {})
+    prefixes = {"zoominfo": out_cfg.get("prefix_zoominfo", "zi"), "apollo": out_cfg.get("prefix_apollo", "ap")}
+    index = EntityIndex(path)
+    try:
+        added = index_outputs(index, args.outputs, cfg.get("mapping", {}), prefixes)
+        total = len(index)
+    finally:
+        index.close()
+    print(f"Indexed {added['zoominfo']} ZoomInfo and {added['apollo']} Apollo matches into {path} ({total} records)")
+
+if __name__ == "__main__":
+    main()
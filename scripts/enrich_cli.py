@@ -6,15 +6,34 @@ SRC = os.path.join(ROOT, 'src')
 if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
-import argparse, os, sys, csv, json, time, pandas as pd
+import argparse, os, sys, csv, hashlib, json, time, itertools, pandas as pd
 try:
     import yaml
 except ImportError:
     yaml = None
 from enrichment.clients.zoominfo import ZoomInfoClient
 from enrichment.clients.apollo import ApolloClient
-from enrichment.logic import do_enrich_row
-from enrichment.utils import rate_limiter
+from enrichment.clients.transport import Transport
+from enrichment.clients.aio import AsyncApolloClient, AsyncZoomInfoClient, AsyncTransport
+from enrichment.engine import enrich_key_stream, enrich_key_stream_async, iterate_async
+from enrichment.preprocess import lookup_key_frame, iter_lookup_keys
+from enrichment.projection import compile_projection
+from enrichment.ratelimit import AdaptiveLimiter, CircuitBreaker, TokenBucket
+from enrichment.retry import BUDGET_COLUMN, DeferredRetries
+from enrichment.sinks import FORMATS, open_sink
+from enrichment.sharding import ROW_INDEX, parse_shard, shard_of
+from enrichment.journal import Journal, JournalMismatch, file_fingerprint
+from array import array
+from collections import deque
+from enrichment.cache import ResponseCache, CachedClient, AsyncCachedClient
+from enrichment.coalesce import CoalescingClient, AsyncCoalescingClient
+from enrichment.batching import BatchingClient
+from enrichment.metrics import REGISTRY as metrics, strategy_table
+from enrichment.planner import CascadePlanner
+from enrichment.backfill import backfill_domains, open_salesforce_index
+from enrichment.entities import EntityIndex
+from enrichment.dryrun import CASCADES, CallPlan, format_plan
+from enrichment.delta import ENRICHED_AT, PreviousOutput, enriched_at, row_fingerprints, source_signature
 
 def load_config(path: str | None) -> dict:
     cfg = {
@@ -23,6 +42,7 @@ def load_config(path: str | None) -> dict:
             "company_by_id_path": "/company/detail",
             "company_lookup_path": "/lookup/company",
             "search_by_name_path": "/search/company",
+            "enrich_path": "/enrich/company",
             "api_key_env": "ZOOMINFO_API_KEY",
         },
         "apollo": {
@@ -31,13 +51,31 @@ def load_config(path: str | None) -> dict:
             "company_enrich_by_id_path": "/companies/enrich",
             "company_search_by_name_path": "/mixed_companies/search",
             "company_search_by_salesforce_id_path": "/companies/search",
+            "company_bulk_enrich_path": "/organizations/bulk_enrich",
             "api_key_env": "APOLLO_API_KEY",
         },
-        "rate_limits": {"zoominfo_per_min": 50, "apollo_per_min": 50},
+        "rate_limits": {"zoominfo_per_min": 50, "apollo_per_min": 50, "adaptive": False,
+                        "zoominfo_max_per_min": None, "apollo_max_per_min": None, "adaptive_min_per_min": 5},
         "mapping": {"zoominfo_id": None, "apollo_id": None, "salesforce_id": None, "name": None, "website": None},
-        "output": {"include_input_columns": True, "prefix_zoominfo": "zi", "prefix_apollo": "ap", "add_vendor_json_columns": False},
-        "retries": {"max_attempts": 5, "base_delay_seconds": 1.0},
-        "http": {"timeout_seconds": 30},
+        "output": {"include_input_columns": True, "prefix_zoominfo": "zi", "prefix_apollo": "ap", "add_vendor_json_columns": False,
+                   "fields": {"zoominfo": [], "apollo": []}, "max_list_items": None,
+                   "add_enriched_at": False},
+        "retries": {"max_attempts": 5, "base_delay_seconds": 1.0, "deferred": False, "inline_attempts": 1,
+                    "row_budget_seconds": 600, "max_waiting_rows": 10000, "breaker_failures": 10,
+                    "breaker_reset_seconds": 30},
+        "http": {"timeout_seconds": 30, "pool_size": 10},
+        "engine": {"max_in_flight": 200, "dedupe_max_keys": 10000, "zoominfo_concurrency": 50, "apollo_concurrency": 50,
+                   "speculative_fallbacks": False},
+        "planner": {"enabled": False, "min_yield": 0.02, "min_samples": 200, "reorder": False,
+                    "parallel_top_two": False, "state_path": None},
+        "batching": {"enabled": False, "max_wait_ms": 50, "zoominfo_batch_size": 25, "apollo_batch_size": 10},
+        "salesforce": {"accounts_csv": None, "id_column": "Id", "domain_column": "Website", "index_path": None},
+        "service": {"host": "127.0.0.1", "port": 8080, "workers": 16, "max_batch": 256, "max_wait_ms": 5,
+                    "max_in_flight": 2000, "max_records": 10000},
+        "delta": {"previous": None, "max_age_days": None, "retry_not_found": False},
+        "entities": {"path": None, "fuzzy_threshold": None, "max_age_days": None, "learn": True},
+        "cache": {"enabled": True, "path": ".cache/vendor_responses.sqlite", "ttl_hours": 720,
+                  "negative_ttl_hours": 24, "max_entries": 1000000},
     }
     if path and yaml:
         with open(path, "r", encoding="utf-8") as f:
@@ -50,42 +88,282 @@ def load_config(path: str | None) -> dict:
                 cfg[k] = v
     return cfg
 
-def main():
-    p = argparse.ArgumentParser(description="Company enrichment via ZoomInfo + Apollo (CLI)")
-    p.add_argument("-i", "--input", required=True, help="Path to input CSV")
-    p.add_argument("-o", "--output", required=True, help="Path to output CSV")
-    p.add_argument("-c", "--config", default=None, help="Path to YAML config (optional)")
-    args = p.parse_args()
+def inline_attempts(cfg: dict, args: argparse.Namespace) -> int:
+    # Attempts a vendor call makes before giving up; with deferred retries the rest happen later
+    retry_cfg = cfg.get("retries", {})
+    if args.deferred_retries or retry_cfg.get("deferred", False):
+        return int(retry_cfg.get("inline_attempts", 1))
+    return int(retry_cfg.get("max_attempts", 5))
 
-    cfg = load_config(args.config)
+def kept_fields(cfg: dict, args: argparse.Namespace, vendor: str):
+    # Results are cut to output.fields as soon as they are decoded, unless whole payloads are
+    # written (_json columns) or kept for later runs (entity index)
+    out_cfg = cfg.get("output", {})
+    if out_cfg.get("add_vendor_json_columns") or args.entity_index or cfg.get("entities", {}).get("path"):
+        return None
+    return out_cfg.get("fields", {}).get(vendor) or None
 
-    # Instantiate clients with configured endpoints and API keys
+def cache_namespace(cfg: dict, args: argparse.Namespace, vendor: str) -> str:
+    fields = kept_fields(cfg, args, vendor)
+    if not fields:
+        return vendor
+    return f"{vendor}:{hashlib.blake2b(json.dumps(sorted(fields)).encode(), digest_size=6).hexdigest()}"
+
+def open_cache(cfg: dict, args: argparse.Namespace):
+    cache_cfg = cfg.get("cache", {})
+    if not cache_cfg.get("enabled", True) or args.no_cache:
+        return None
+    return ResponseCache(
+        cache_cfg.get("path", ".cache/vendor_responses.sqlite"),
+        ttl_seconds=float(cache_cfg.get("ttl_hours", 720)) * 3600,
+        negative_ttl_seconds=float(cache_cfg.get("negative_ttl_hours", 24)) * 3600,
+        max_entries=int(cache_cfg.get("max_entries", 1000000)),
+    )
+
+def build_vendors(cfg: dict, args: argparse.Namespace):
+    # Instantiate clients with configured endpoints, API keys and a pooled, rate-limited transport per vendor
+    asynchronous = args.engine == "asyncio"
     zi_cfg = cfg.get("zoominfo", {})
     ap_cfg = cfg.get("apollo", {})
-    zi = ZoomInfoClient(
+    limits = cfg.get("rate_limits", {})
+    http_cfg = cfg.get("http", {})
+    retry_cfg = cfg.get("retries", {})
+    engine_cfg = cfg.get("engine", {})
+
+    def limiter(vendor: str, cap: int) -> TokenBucket:
+        per_min = limits.get(f"{vendor}_per_min", 50)
+        if not (args.adaptive or limits.get("adaptive", False)):
+            return TokenBucket(per_min)
+        # Starts at the configured rate and a few calls in flight, then probes up to the caps
+        return AdaptiveLimiter(per_min, name=vendor, max_per_minute=limits.get(f"{vendor}_max_per_min"),
+                               min_per_minute=float(limits.get("adaptive_min_per_min", 5)),
+                               concurrency=min(cap, 4), max_concurrency=cap)
+
+    def transport(vendor: str):
+        cap = int(engine_cfg.get(f"{vendor}_concurrency", 50)) if asynchronous else max(1, args.workers)
+        common = dict(
+            timeout=http_cfg.get("timeout_seconds", 30),
+            max_attempts=inline_attempts(cfg, args),
+            base_delay=float(retry_cfg.get("base_delay_seconds", 1.0)),
+            limiter=limiter(vendor, cap),
+        )
+        if args.deferred_retries or retry_cfg.get("deferred", False):
+            # Refuse calls while the vendor keeps failing; the refused rows wait on the retry queue
+            common["breaker"] = CircuitBreaker(vendor, failures=int(retry_cfg.get("breaker_failures", 10)),
+                                               reset_seconds=float(retry_cfg.get("breaker_reset_seconds", 30)))
+        if asynchronous:
+            return AsyncTransport(pool_size=cap, max_concurrency=cap, **common)
+        return Transport(pool_size=max(int(http_cfg.get("pool_size", 10)), args.workers), **common)
+
+    zi_cls, ap_cls = (AsyncZoomInfoClient, AsyncApolloClient) if asynchronous else (ZoomInfoClient, ApolloClient)
+    zi = zi_cls(
         api_key=os.getenv(zi_cfg.get("api_key_env", "ZOOMINFO_API_KEY"), ""),
         base_url=zi_cfg.get("base_url", "https://api.zoominfo.com"),
         company_by_id_path=zi_cfg.get("company_by_id_path", "/company/detail"),
         company_lookup_path=zi_cfg.get("company_lookup_path", "/lookup/company"),
         search_by_name_path=zi_cfg.get("search_by_name_path", "/search/company"),
-        timeout=cfg.get("http", {}).get("timeout_seconds", 30),
+        enrich_path=zi_cfg.get("enrich_path", "/enrich/company"),
+        timeout=http_cfg.get("timeout_seconds", 30),
+        transport=transport("zoominfo"),
+        fields=kept_fields(cfg, args, "zoominfo"),
     )
-    ap = ApolloClient(
+    ap = ap_cls(
         api_key=os.getenv(ap_cfg.get("api_key_env", "APOLLO_API_KEY"), ""),
         base_url=ap_cfg.get("base_url", "https://api.apollo.io/v1"),
         enrich_by_domain_path=ap_cfg.get("company_enrich_by_domain_path", "/companies/enrich"),
         enrich_by_id_path=ap_cfg.get("company_enrich_by_id_path", "/companies/enrich"),
         search_by_name_path=ap_cfg.get("company_search_by_name_path", "/mixed_companies/search"),
         search_by_salesforce_id_path=ap_cfg.get("company_search_by_salesforce_id_path", "/companies/search"),
-        timeout=cfg.get("http", {}).get("timeout_seconds", 30),
+        bulk_enrich_path=ap_cfg.get("company_bulk_enrich_path", "/organizations/bulk_enrich"),
+        timeout=http_cfg.get("timeout_seconds", 30),
+        transport=transport("apollo"),
+        fields=kept_fields(cfg, args, "apollo"),
     )
 
-    df = pd.read_csv(args.input, dtype=str, keep_default_na=False).fillna("")
+    vendors = {"zoominfo": zi, "apollo": ap}
+    batchers = []
+    batch_cfg = cfg.get("batching", {})
+    if args.batch or batch_cfg.get("enabled", False):
+        if asynchronous:
+            print("Micro-batching applies to the threads engine only; ignoring it for --engine asyncio.", file=sys.stderr)
+        else:
+            # Domain / ID lookups from concurrent rows are merged into bulk enrich calls
+            vendors = {v: BatchingClient(c, max_batch=int(batch_cfg.get(f"{v}_batch_size", c.bulk_max)),
+                                         max_wait=float(batch_cfg.get("max_wait_ms", 50)) / 1000.0,
+                                         retries=inline_attempts(cfg, args))
+                       for v, c in vendors.items()}
+            batchers = list(vendors.values())
+    cache = open_cache(cfg, args)
+    if cache is not None:
+        cached = AsyncCachedClient if asynchronous else CachedClient
+        vendors = {v: cached(c, cache, v, refresh=args.refresh_cache, namespace=cache_namespace(cfg, args, v))
+                   for v, c in vendors.items()}
+    # Identical lookups (e.g. rows sharing a domain but not a name) hit the vendor once per run
+    coalescing = AsyncCoalescingClient if asynchronous else CoalescingClient
+    vendors = {v: coalescing(c) for v, c in vendors.items()}
+    return vendors, cache, batchers
+
+def build_planner(cfg: dict, args: argparse.Namespace):
+    plan_cfg = cfg.get("planner", {})
+    if not (args.cascade_planner or plan_cfg.get("enabled", False)):
+        return None
+    return CascadePlanner(min_yield=float(plan_cfg.get("min_yield", 0.02)),
+                          min_samples=int(plan_cfg.get("min_samples", 200)),
+                          reorder=bool(plan_cfg.get("reorder", False)),
+                          parallel_top=bool(plan_cfg.get("parallel_top_two", False)),
+                          state_path=plan_cfg.get("state_path"))
+
+def build_entities(cfg: dict, args: argparse.Namespace):
+    ent_cfg = cfg.get("entities", {})
+    path = args.entity_index or ent_cfg.get("path")
+    if not path:
+        return None
+    max_age = ent_cfg.get("max_age_days")
+    return EntityIndex(path, fuzzy_threshold=ent_cfg.get("fuzzy_threshold"),
+                       max_age_seconds=float(max_age) * 86400 if max_age is not None else None,
+                       learn=bool(ent_cfg.get("learn", True)))
+
+def build_retry(cfg: dict, args: argparse.Namespace):
+    retry_cfg = cfg.get("retries", {})
+    if not (args.deferred_retries or retry_cfg.get("deferred", False)):
+        return None
+    return DeferredRetries(max_attempts=int(retry_cfg.get("max_attempts", 5)),
+                           base_delay=float(retry_cfg.get("base_delay_seconds", 1.0)),
+                           budget_seconds=float(retry_cfg.get("row_budget_seconds", 600)),
+                           circuit_delay=float(retry_cfg.get("breaker_reset_seconds", 30)),
+                           max_waiting=int(retry_cfg.get("max_waiting_rows", 10000)))
+
+def build_row_cfg(cfg: dict, args: argparse.Namespace) -> dict:
+    # What enrich_keys / the engines read per row; shared with scripts/serve.py
+    out_cfg = cfg.get("output", {})
+    return {
+        "prefix_zoominfo": out_cfg.get("prefix_zoominfo", "zi"),
+        "prefix_apollo": out_cfg.get("prefix_apollo", "ap"),
+        "include_input_columns": out_cfg.get("include_input_columns", True),
+        "max_attempts": inline_attempts(cfg, args),
+        "dedupe_max_keys": cfg.get("engine", {}).get("dedupe_max_keys", 10000),
+        "add_vendor_json_columns": out_cfg.get("add_vendor_json_columns", False),
+        "projections": {v: compile_projection(out_cfg.get("fields", {}).get(v) or [], out_cfg.get("max_list_items"))
+                        for v in ("zoominfo", "apollo")},
+        "speculative_fallbacks": cfg.get("engine", {}).get("speculative_fallbacks", False),
+        "planner": build_planner(cfg, args),
+        "entities": build_entities(cfg, args),
+        "retry": build_retry(cfg, args),
+    }
+
+def write_stats(path: str, rows: int, seconds: float, latencies) -> None:
+    # Latency is per row, from being read off the input to being written
+    lat = sorted(latencies)
+
+    def pct(q):
+        return round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 2) if lat else None
+
+    stats = {"rows": rows, "rows_enriched": len(lat), "seconds": round(seconds, 3),
+             "rows_per_sec": round(len(lat) / seconds, 2) if seconds else None,
+             "row_latency_ms": {"p50": pct(0.50), "p90": pct(0.90), "p99": pct(0.99), "max": pct(1.0)}}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+def write_metrics(args: argparse.Namespace, planner=None) -> None:
+    summary = metrics.summary()
+    if args.metrics_out:
+        summary["strategies"] = strategy_table(summary)
+        if planner is not None:
+            summary["planner"] = planner.snapshot()
+        with open(args.metrics_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.prometheus_out:
+        with open(args.prometheus_out, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus())
+
+def plan_job(cfg: dict, args: argparse.Namespace, row_cfg: dict, chunks) -> dict:
+    # --plan: count the lookups the job would make from its keys, the cache and the entity index
+    batch_cfg = cfg.get("batching", {})
+    bulk = {}
+    if (args.batch or batch_cfg.get("enabled", False)) and args.engine == "threads":
+        for v, cls in (("zoominfo", ZoomInfoClient), ("apollo", ApolloClient)):
+            size = min(int(batch_cfg.get(f"{v}_batch_size", cls.bulk_max)), cls.bulk_max)
+            bulk.update({(v, m): size for m, fn in (("company_by_id", "companies_by_ids"),
+                                                     ("company_by_domain", "companies_by_domains"))
+                         if hasattr(cls, fn)})
+    cache = None if args.refresh_cache else open_cache(cfg, args)
+    plan = CallPlan(cache=cache, namespaces={v: cache_namespace(cfg, args, v) for v in CASCADES},
+                    entities=row_cfg["entities"], planner=row_cfg["planner"], bulk=bulk)
+    try:
+        for keys in chunks:
+            plan.add(keys)
+        limits = cfg.get("rate_limits", {})
+        return plan.report({v: limits.get(f"{v}_per_min", 50) for v in CASCADES})
+    finally:
+        if cache is not None:
+            cache.close()
+
+def main():
+    p = argparse.ArgumentParser(description="Company enrichment via ZoomInfo + Apollo (CLI)")
+    p.add_argument("-i", "--input", required=True, help="Path to input CSV")
+    p.add_argument("-o", "--output", default=None, help="Path to output file (CSV, Parquet or Arrow)")
+    p.add_argument("--format", choices=FORMATS, default=None,
+                   help="Output format; inferred from the output extension (.parquet, .arrow) when omitted")
+    p.add_argument("-c", "--config", default=None, help="Path to YAML config (optional)")
+    p.add_argument("-w", "--workers", type=int, default=1,
+                   help="Rows enriched concurrently; ZoomInfo and Apollo cascades run in parallel when > 1")
+    p.add_argument("--engine", choices=["threads", "asyncio"], default="threads",
+                   help="Row engine: thread pool (--workers) or asyncio (requires aiohttp; caps under engine: in the YAML)")
+    p.add_argument("--chunksize", type=int, default=10000,
+                   help="Input rows read per chunk; results are written to disk as they finish")
+    p.add_argument("--resume", action="store_true",
+                   help="Continue an interrupted run from its journal (<output>.journal.jsonl), skipping finished rows")
+    p.add_argument("--batch", action="store_true",
+                   help="Merge domain/ID lookups from concurrent rows into bulk vendor calls (threads engine)")
+    p.add_argument("--adaptive", action="store_true",
+                   help="Tune each vendor's request rate and concurrency from 429/503s and latency (AIMD)")
+    p.add_argument("--deferred-retries", action="store_true",
+                   help="Park rows whose vendor calls fail transiently on a retry queue instead of backing off inline; "
+                        "a per-vendor circuit breaker fails fast during outages (retries: in the YAML)")
+    p.add_argument("--cascade-planner", action="store_true",
+                   help="Skip (or reorder) lookup strategies that rarely match, learned during the run (planner: in the YAML)")
+    p.add_argument("--salesforce-accounts", default=None, metavar="CSV",
+                   help="Salesforce Accounts export; rows with an SF ID but no website get the account's domain "
+                        "(indexed once into <CSV>.index.sqlite; columns under salesforce: in the YAML)")
+    p.add_argument("--entity-index", default=None, metavar="SQLITE",
+                   help="Resolve rows from a local index of earlier results before calling the vendors, and add "
+                        "new matches to it (build one with scripts/build_entity_index.py; entities: in the YAML)")
+    p.add_argument("--previous", default=None, metavar="OUTPUT",
+                   help="Delta mode: carry over rows of this earlier output whose mapped inputs are unchanged and that "
+                        "neither failed nor are older than --max-age-days; enrich only the rest")
+    p.add_argument("--max-age-days", type=float, default=None,
+                   help="With --previous, re-enrich rows whose vendor data is older than this (delta: in the YAML)")
+    p.add_argument("--no-cache", action="store_true", help="Bypass the on-disk vendor response cache")
+    p.add_argument("--refresh-cache", action="store_true", help="Ignore cached responses but store fresh ones")
+    p.add_argument("--stats-out", default=None,
+                   help="Write run statistics (rows/sec, row latency percentiles) as JSON to this path")
+    p.add_argument("--metrics-out", default=None,
+                   help="Write per-vendor / per-strategy metrics (latency, status codes, retries, cache hits) as JSON")
+    p.add_argument("--prometheus-out", default=None, help="Also write the metrics in Prometheus text format")
+    p.add_argument("--shard", default=None, metavar="i/N",
+                   help="Enrich only shard i of N (rows split by a stable hash of their lookup key); "
+                        "outputs carry a _row column for scripts/merge_shards.py")
+    p.add_argument("--plan", nargs="?", const="", default=None, metavar="JSON",
+                   help="Dry run: report the vendor calls per strategy (worst case and expected) and the wall time "
+                        "under rate_limits, after duplicates, cached results and the entity index; calls no vendor "
+                        "and writes no output (the report also goes to JSON if a path is given)")
+    args = p.parse_args()
+    if args.output is None and args.plan is None:
+        p.error("the following arguments are required: -o/--output")
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        p.error(str(e))
+    started = time.perf_counter()
+
+    cfg = load_config(args.config)
+
+    input_columns = list(pd.read_csv(args.input, dtype=str, nrows=0).columns)
 
     mapping = cfg.get("mapping", {})
     if not any(mapping.values()):
         # simple interactive mapping if nothing set
-        cols = list(df.columns)
+        cols = input_columns
         print("No mapping provided; select columns by number or press Enter to skip.")
         for key in ["zoominfo_id", "apollo_id", "salesforce_id", "name", "website"]:
             print(f"Select column for {key}:")
@@ -94,41 +372,173 @@ def main():
             sel = input("Enter number (or blank to skip): ").strip()
             mapping[key] = cols[int(sel)] if sel.isdigit() and 0 <= int(sel) < len(cols) else None
 
-    sleep_zi = rate_limiter(cfg.get("rate_limits", {}).get("zoominfo_per_min", 50))
-    sleep_ap = rate_limiter(cfg.get("rate_limits", {}).get("apollo_per_min", 50))
-
-    out_rows = []
-    total = len(df)
-    for i, row in df.iterrows():
-        enriched = do_enrich_row(
-            row,
-            mapping,
-            {"zoominfo": zi, "apollo": ap},
-            {
-                "prefix_zoominfo": cfg.get("output", {}).get("prefix_zoominfo", "zi"),
-                "prefix_apollo": cfg.get("output", {}).get("prefix_apollo", "ap"),
-                "include_input_columns": cfg.get("output", {}).get("include_input_columns", True),
-                "max_attempts": cfg.get("retries", {}).get("max_attempts", 5),
-            },
+    out_cfg = cfg.get("output", {})
+    row_cfg = build_row_cfg(cfg, args)
+
+    sf_cfg = cfg.get("salesforce", {})
+    sf_csv = args.salesforce_accounts or sf_cfg.get("accounts_csv")
+    salesforce = None
+    if sf_csv and mapping.get("salesforce_id"):
+        salesforce = open_salesforce_index(sf_csv, sf_cfg.get("id_column", "Id"), sf_cfg.get("domain_column", "Website"),
+                                           sf_cfg.get("index_path"))
+
+    delta_cfg = cfg.get("delta", {})
+    previous_path = args.previous or delta_cfg.get("previous")
+    previous = None
+    if previous_path:
+        max_age = args.max_age_days if args.max_age_days is not None else delta_cfg.get("max_age_days")
+        try:
+            previous = PreviousOutput(previous_path, mapping, [row_cfg["prefix_zoominfo"], row_cfg["prefix_apollo"]],
+                                      max_age_seconds=float(max_age) * 86400 if max_age is not None else None,
+                                      retry_not_found=bool(delta_cfg.get("retry_not_found", False)))
+        except (ImportError, ValueError) as e:
+            sys.exit(str(e))
+        print(f"Previous output: {len(previous)} rows reusable; {previous.refresh['failed']} failed and "
+              f"{previous.refresh['stale']} stale rows will be enriched again")
+    def key_chunks(usecols=None, chunksize=args.chunksize):
+        # (input chunk, normalized lookup keys, delta fingerprints) after the Salesforce backfill and the shard filter
+        for chunk in pd.read_csv(args.input, dtype=str, keep_default_na=False, chunksize=chunksize, usecols=usecols):
+            chunk = chunk.fillna("")
+            keys = lookup_key_frame(chunk, mapping)
+            fps = row_fingerprints(keys) if previous is not None else pd.Series(0, index=chunk.index)
+            if salesforce is not None:
+                keys = backfill_domains(keys, salesforce)
+            if shard is not None:
+                mine = shard_of(keys, shard[1]) == shard[0]
+                chunk, keys, fps = chunk[mine], keys[mine], fps[mine]
+            yield chunk, keys, fps
+
+    if args.plan is not None:
+        def plan_keys():
+            # Only the mapped columns are read; rows carried over from --previous cost nothing
+            for _, keys, fps in key_chunks([c for c in mapping.values() if c], max(args.chunksize, 200_000)):
+                if previous is not None:
+                    keys = keys[~fps.isin(list(previous.get_many(fps.tolist())))]
+                yield keys
+
+        try:
+            report = plan_job(cfg, args, row_cfg, plan_keys())
+        finally:
+            if salesforce is not None:
+                salesforce.close()
+            if previous is not None:
+                previous.close()
+            if row_cfg["entities"] is not None:
+                row_cfg["entities"].close()
+        print(f"Plan for {args.input}: {report['rows']} rows to enrich"
+              + (f" ({shard[0]}/{shard[1]} shard)" if shard is not None else ""))
+        print(format_plan(report))
+        if args.plan:
+            with open(args.plan, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    vendors, cache, batchers = build_vendors(cfg, args)
+
+    # Per-row enrichment time, so a later delta run can tell how old the vendor data is
+    stamp = previous is not None or out_cfg.get("add_enriched_at", False)
+
+    # Durable progress journal keyed by input fingerprint and row index
+    fingerprint = file_fingerprint(args.input, mapping, cfg.get("output", {}), args.shard,
+                                   salesforce.source() if salesforce is not None else None,
+                                   source_signature(previous_path) if previous is not None else None)
+    try:
+        journal = Journal(f"{args.output}.journal.jsonl", fingerprint, resume=args.resume)
+    except JournalMismatch as e:
+        sys.exit(str(e))
+    if journal.done:
+        print(f"Resuming: {len(journal.done)} rows already finished")
+    include_inputs = cfg.get("output", {}).get("include_input_columns", True)
+    # (row index, input values, time read, carried-over vendor columns or None) per input row;
+    # input columns are reattached only when the row is written. Carried rows go to the engine as
+    # None and cost no lookups.
+    held = deque()
+
+    def read_keys():
+        for chunk, keys, fps in key_chunks():
+            if journal.done:
+                todo = ~chunk.index.isin(journal.done)
+                chunk, keys, fps = chunk[todo], keys[todo], fps[todo]
+            values = chunk.itertuples(index=False, name=None) if include_inputs else itertools.repeat(())
+            reusable = previous.get_many(fps.tolist()) if previous is not None else {}
+            for i, vals, k, fp in zip(chunk.index.tolist(), values, iter_lookup_keys(keys), fps.tolist()):
+                carried = reusable.get(fp)
+                held.append((i, (i,) + vals if shard is not None else vals, time.perf_counter(), carried))
+                yield k if carried is None else None
+
+    keys = read_keys()
+    if args.engine == "asyncio":
+        async def close_clients():
+            for c in vendors.values():
+                await c.close()
+
+        results = iterate_async(
+            lambda: enrich_key_stream_async(keys, vendors, row_cfg,
+                                            max_in_flight=int(cfg.get("engine", {}).get("max_in_flight", 200))),
+            finalize=close_clients,
         )
-        out_rows.append(enriched)
-        time.sleep(max(sleep_zi, sleep_ap))
+    else:
+        results = enrich_key_stream(keys, vendors, row_cfg, workers=args.workers)
+
+    # Deterministic column order: input columns, then sorted vendor columns
+    base_cols = input_columns if include_inputs else []
+    if shard is not None:
+        base_cols = [ROW_INDEX] + base_cols
+    try:
+        sink = open_sink(args.output, base_cols, journal, args.format)
+    except ImportError as e:
+        journal.close()
+        sys.exit(str(e))
+    latencies = array("d") if args.stats_out else None
+    carried_rows = exhausted_rows = 0
+    try:
+        # Results arrive in input order, one per row read
+        for vendor_out in results:
+            i, vals, read_at, carried = held.popleft()
+            row = dict(zip(base_cols, vals))
+            if carried is not None:
+                row.update(carried)
+                carried_rows += 1
+                sink.write(row, i)
+                continue
+            if latencies is not None:
+                latencies.append(time.perf_counter() - read_at)
+            row.update(vendor_out)
+            exhausted_rows += bool(vendor_out.get(BUDGET_COLUMN))
+            if stamp:
+                row[ENRICHED_AT] = enriched_at()
+            sink.write(row, i)
+    except BaseException:
+        sink.abort()
+        print(f"Interrupted after {sink.rows} rows; rerun with --resume to continue.", file=sys.stderr)
+        raise
+    finally:
+        for b in batchers:
+            b.close()
+        if cache is not None:
+            cache.close()
+        if salesforce is not None:
+            salesforce.close()
+        if previous is not None:
+            previous.close()
+        if row_cfg["entities"] is not None:
+            row_cfg["entities"].close()
+        if row_cfg["planner"] is not None:
+            row_cfg["planner"].close()
+    written = sink.close()
+    if args.stats_out:
+        write_stats(args.stats_out, written, time.perf_counter() - started, latencies)
+    write_metrics(args, row_cfg["planner"])
 
-    if not out_rows:
+    if not written:
         print("No rows processed; nothing to write.")
         return
 
-    # Write CSV with deterministic column order
-    base_cols = list(df.columns) if cfg.get("output", {}).get("include_input_columns", True) else []
-    all_keys = set().union(*[set(r.keys()) for r in out_rows])
-    vendor_cols = sorted([k for k in all_keys if k not in base_cols])
-    columns = base_cols + vendor_cols
-
-    with open(args.output, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=columns)
-        writer.writeheader()
-        for r in out_rows:
-            writer.writerow(r)
+    if previous is not None:
+        print(f"Carried over {carried_rows} unchanged rows from {previous_path}")
+    if exhausted_rows:
+        print(f"{exhausted_rows} rows ran out of retry budget ({BUDGET_COLUMN}); pass this output as --previous "
+              "to a later run to retry just those")
 
     print(f"Wrote {args.output}")
 
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import os, sys
+HERE = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+SRC = os.path.join(ROOT, 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import argparse
+from enrichment.sharding import merge_shards
+from enrichment.sinks import FORMATS
+
+def main():
+    p = argparse.ArgumentParser(description="Merge enrich_cli.py --shard outputs back into one file in input order")
+    p.add_argument("shards", nargs="+", help="Shard outputs (CSV, Parquet or Arrow)")
+    p.add_argument("-o", "--output", required=True, help="Path to merged output")
+    p.add_argument("--format", choices=FORMATS, default=None,
+                   help="Output format; inferred from the output extension when omitted")
+    p.add_argument("--keep-row-index", action="store_true", help="Keep the _row column in the merged output")
+    args = p.parse_args()
+    n = merge_shards(args.shards, args.output, args.format, keep_row_index=args.keep_row_index)
+    print(f"Wrote {args.output} ({n} rows from {len(args.shards)} shards)")
+
+if __name__ == "__main__":
+    main()
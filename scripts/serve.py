@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import os, sys
+HERE = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+SRC = os.path.join(ROOT, 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import argparse
+from enrichment.service import EnrichmentServer, RowBatcher
+from enrich_cli import build_row_cfg, build_vendors, load_config
+
+def main():
+    p = argparse.ArgumentParser(description="Enrichment HTTP service: POST /enrich with a record or a list of "
+                                            "records, results stream back as NDJSON")
+    p.add_argument("-c", "--config", default=None, help="Path to YAML config (optional; service: section)")
+    p.add_argument("--host", default=None, help="Bind address (default 127.0.0.1)")
+    p.add_argument("--port", type=int, default=None, help="Port (default 8080)")
+    p.add_argument("-w", "--workers", type=int, default=None, help="Rows enriched concurrently across all requests")
+    p.add_argument("--batch", action="store_true", help="Merge domain/ID lookups into bulk vendor calls")
+    p.add_argument("--adaptive", action="store_true", help="Tune each vendor's rate and concurrency (AIMD)")
+    p.add_argument("--cascade-planner", action="store_true", help="Skip lookup strategies that rarely match")
+    p.add_argument("--deferred-retries", action="store_true",
+                   help="Retry transient vendor failures from a queue, with a circuit breaker per vendor")
+    p.add_argument("--entity-index", default=None, help="Resolve records from a local entity index first")
+    p.add_argument("--no-cache", action="store_true", help="Bypass the on-disk vendor response cache")
+    args = p.parse_args()
+    cfg = load_config(args.config)
+    svc = cfg.get("service", {})
+    args.workers = args.workers or int(svc.get("workers", 16))
+    args.engine, args.refresh_cache = "threads", False
+
+    vendors, cache, batchers = build_vendors(cfg, args)
+    row_cfg = build_row_cfg(cfg, args)
+    batcher = RowBatcher(vendors, row_cfg, workers=args.workers, max_batch=int(svc.get("max_batch", 256)),
+                         max_wait=float(svc.get("max_wait_ms", 5)) / 1000.0,
+                         max_in_flight=int(svc.get("max_in_flight", 2000)))
+    server = EnrichmentServer(batcher, cfg.get("mapping", {}), host=args.host or svc.get("host", "127.0.0.1"),
+                              port=args.port if args.port is not None else int(svc.get("port", 8080)),
+                              max_records=int(svc.get("max_records", 10000)))
+    print(f"Serving on {server.url} (POST /enrich, GET /healthz, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        for b in batchers:
+            b.close()
+        if cache is not None:
+            cache.close()
+        for key in ("planner", "entities"):
+            if row_cfg[key] is not None:
+                row_cfg[key].close()
+
+if __name__ == "__main__":
+    main()
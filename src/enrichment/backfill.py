@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json, os, sqlite3, threading
+from typing import Dict, Iterable, Optional, Sequence
+import pandas as pd
+from enrichment.preprocess import sanitize_domains
+
+class SalesforceIndex:
+    # SF Account ID -> sanitized domain, in SQLite so a multi-million-row export is parsed once
+    # and later runs only pay for the IDs they actually look up.
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS accounts (sf_id TEXT PRIMARY KEY, domain TEXT) WITHOUT ROWID")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def source(self) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key='source'").fetchone()
+        return row[0] if row else None
+
+    def load(self, frames: Iterable[pd.DataFrame], id_col: str, domain_col: str, source: str = "") -> int:
+        # Replaces the contents; later rows win for repeated IDs, rows without a domain are skipped
+        n = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM accounts")
+                for df in frames:
+                    ids = df[id_col].fillna("").astype(str).str.strip()
+                    domains = sanitize_domains(df[domain_col])
+                    keep = (ids != "") & (domains != "")
+                    pairs = list(zip(ids[keep].tolist(), domains[keep].tolist()))
+                    self._db.executemany("INSERT OR REPLACE INTO accounts VALUES (?, ?)", pairs)
+                    n += len(pairs)
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return n
+
+    def lookup(self, ids: Sequence[str]) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        ids = list(ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):  # stays under SQLite's bound-parameter limit
+                batch = ids[start:start + 500]
+                q = f"SELECT sf_id, domain FROM accounts WHERE sf_id IN ({','.join('?' * len(batch))})"
+                out.update(self._db.execute(q, batch).fetchall())
+        return out
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def _source_signature(csv_path: str, id_col: str, domain_col: str) -> str:
+    st = os.stat(csv_path)
+    return json.dumps([os.path.abspath(csv_path), st.st_size, st.st_mtime_ns, id_col, domain_col])
+
+def open_salesforce_index(csv_path: str, id_col: str, domain_col: str, index_path: Optional[str] = None,
+                          chunksize: int = 200_000) -> SalesforceIndex:
+    # Reuses the index while the export is unchanged (path, size, mtime and columns); rebuilds otherwise
+    index = SalesforceIndex(index_path or f"{csv_path}.index.sqlite")
+    source = _source_signature(csv_path, id_col, domain_col)
+    if index.source() != source:
+        frames = pd.read_csv(csv_path, dtype=str, keep_default_na=False, usecols=[id_col, domain_col],
+                             chunksize=chunksize)
+        index.load(frames, id_col, domain_col, source)
+    return index
+
+def backfill_domains(keys: pd.DataFrame, index: SalesforceIndex) -> pd.DataFrame:
+    # Lookup-key frame stage: rows with a Salesforce ID but no domain get the account's domain,
+    # so they cascade through the domain lookups instead of falling back to name search
+    need = (keys["domain"] == "") & (keys["salesforce_id"] != "")
+    if not need.any():
+        return keys
+    found = index.lookup(keys.loc[need, "salesforce_id"].unique().tolist())
+    if not found:
+        return keys
+    fill = keys.loc[need, "salesforce_id"].map(found).dropna()
+    keys = keys.copy()
+    keys.loc[fill.index, "domain"] = fill
+    return keys
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Result = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+class MicroBatcher:
+    # Collects keys submitted by many row workers and resolves them with one bulk call,
+    # flushing when max_batch keys are waiting or max_wait seconds after the first arrived.
+    def __init__(self, flush: Callable[[List[str]], Dict[str, Result]], *,
+                 max_batch: int = 10, max_wait: float = 0.05, max_concurrent_batches: int = 4):
+        self.flush = flush
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._waiting: Dict[str, List[Future]] = {}
+        self._first_at = 0.0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="enrich-batch")
+        self._thread = threading.Thread(target=self._run, name="enrich-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            if not self._waiting:
+                self._first_at = time.monotonic()
+            self._waiting.setdefault(key, []).append(fut)
+            if len(self._waiting) == 1 or len(self._waiting) >= self.max_batch:
+                self._cond.notify()
+        return fut
+
+    def _take(self) -> Optional[Dict[str, List[Future]]]:
+        with self._cond:
+            while True:
+                if self._waiting:
+                    due = self._first_at + self.max_wait
+                    now = time.monotonic()
+                    if len(self._waiting) >= self.max_batch or now >= due or self._closed:
+                        keys = list(self._waiting)[:self.max_batch]
+                        batch = {k: self._waiting.pop(k) for k in keys}
+                        if self._waiting:
+                            self._first_at = now
+                        return batch
+                    self._cond.wait(due - now)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            self._pool.submit(self._resolve, batch)
+
+    def _resolve(self, batch: Dict[str, List[Future]]) -> None:
+        try:
+            results = self.flush(list(batch))
+        except BaseException as e:
+            for futs in batch.values():
+                for f in futs:
+                    f.set_exception(e)
+            return
+        for key, futs in batch.items():
+            result = results.get(key, (None, "not found"))
+            for f in futs:
+                f.set_result(result)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+class BatchingClient:
+    # Routes single-key lookups that have a bulk endpoint through micro-batchers;
+    # everything else goes straight to the wrapped client.
+    def __init__(self, client: Any, *, max_batch: Optional[int] = None, max_wait: float = 0.05,
+                 retries: int = 3):
+        self.client = client
+        size = min(max_batch or client.bulk_max, client.bulk_max)
+        self._batchers: Dict[str, MicroBatcher] = {}
+        if hasattr(client, "companies_by_domains"):
+            self._batchers["company_by_domain"] = MicroBatcher(
+                lambda keys: client.companies_by_domains(keys, retries=retries), max_batch=size, max_wait=max_wait)
+        if hasattr(client, "companies_by_ids"):
+            self._batchers["company_by_id"] = MicroBatcher(
+                lambda keys: client.companies_by_ids(keys, retries=retries), max_batch=size, max_wait=max_wait)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _lookup(self, lookup: str, key: str, retries: int) -> Result:
+        batcher = self._batchers.get(lookup)
+        if batcher is None or not key:
+            return getattr(self.client, lookup)(key, retries=retries)
+        return batcher.submit(key).result()
+
+    def company_by_id(self, key: str, retries: int = 3):
+        return self._lookup("company_by_id", key, retries)
+
+    def company_by_domain(self, key: str, retries: int = 3):
+        return self._lookup("company_by_domain", key, retries)
+
+    def close(self) -> None:
+        for b in self._batchers.values():
+            b.close()
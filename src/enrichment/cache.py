@@ -0,0 +1,164 @@
+from __future__ import annotations
+import json, os, re, sqlite3, threading, time
+from typing import Any, Dict, Optional, Sequence, Tuple
+from enrichment.metrics import REGISTRY as metrics, STRATEGIES
+
+LOOKUPS = ("company_by_id", "company_by_domain", "company_by_name", "company_by_salesforce_id")
+NOT_FOUND = "not found"
+
+def normalize_key(lookup: str, key: str) -> str:
+    key = str(key).strip()
+    if lookup in ("company_by_domain", "company_by_name"):
+        return re.sub(r"\s+", " ", key.lower())
+    return key  # IDs (e.g. 15-char Salesforce IDs) are case-sensitive
+
+class ResponseCache:
+    def __init__(self, path: str, *, ttl_seconds: float = 30 * 86400,
+                 negative_ttl_seconds: float = 86400, max_entries: int = 1_000_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " vendor TEXT, lookup TEXT, key TEXT, payload TEXT, error TEXT,"
+            " stored_at REAL, accessed_at REAL, PRIMARY KEY (vendor, lookup, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, vendor: str, lookup: str, key: str) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+        k = normalize_key(lookup, key)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload, error, stored_at FROM responses WHERE vendor=? AND lookup=? AND key=?",
+                (vendor, lookup, k),
+            ).fetchone()
+            if row is None:
+                return False, None, None
+            payload, error, stored_at = row
+            ttl = self.ttl_seconds if payload is not None else self.negative_ttl_seconds
+            if now - stored_at > ttl:
+                self._db.execute("DELETE FROM responses WHERE vendor=? AND lookup=? AND key=?", (vendor, lookup, k))
+                return False, None, None
+            self._db.execute(
+                "UPDATE responses SET accessed_at=? WHERE vendor=? AND lookup=? AND key=?",
+                (now, vendor, lookup, k),
+            )
+        return True, (json.loads(payload) if payload is not None else None), error
+
+    def peek_many(self, vendor: str, lookup: str, keys: Sequence[str]) -> Dict[str, bool]:
+        # Which keys (as normalize_key leaves them) have a live entry, True for a match and False
+        # for not found, without touching accessed_at or expiring anything; for dry runs
+        keys = list(keys)
+        now = time.time()
+        out: Dict[str, bool] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # stays under SQLite's bound-parameter limit
+                batch = keys[start:start + 500]
+                q = (f"SELECT key, payload IS NOT NULL, stored_at FROM responses "
+                     f"WHERE vendor=? AND lookup=? AND key IN ({','.join('?' * len(batch))})")
+                for k, matched, stored_at in self._db.execute(q, [vendor, lookup] + batch):
+                    if now - stored_at <= (self.ttl_seconds if matched else self.negative_ttl_seconds):
+                        out[k] = bool(matched)
+        return out
+
+    def match_rates(self, vendor: str) -> Dict[str, Tuple[int, int]]:
+        # (entries, matches) per lookup over everything stored for vendor
+        with self._lock:
+            rows = self._db.execute("SELECT lookup, COUNT(*), COUNT(payload) FROM responses WHERE vendor=? "
+                                    "GROUP BY lookup", (vendor,)).fetchall()
+        return {lookup: (n, hits) for lookup, n, hits in rows}
+
+    def put(self, vendor: str, lookup: str, key: str, obj: Optional[Dict[str, Any]], err: Optional[str]) -> None:
+        # Only matches and definitive misses are cached; transient failures are retried next run
+        if obj is None and err != NOT_FOUND:
+            return
+        k = normalize_key(lookup, key)
+        now = time.time()
+        payload = json.dumps(obj, separators=(",", ":")) if obj is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (vendor, lookup, k, payload, None if obj is not None else err, now, now),
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._evict()
+
+    def _evict(self) -> None:
+        # LRU: drop the least recently read entries beyond the cap
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict()
+            self._db.close()
+
+class CachedClient:
+    # Wraps a ZoomInfoClient / ApolloClient; refresh=True skips reads but still stores fresh results.
+    # namespace (default: vendor) keeps entries of clients that prune payloads apart from full ones.
+    def __init__(self, client: Any, cache: ResponseCache, vendor: str, *, refresh: bool = False,
+                 namespace: Optional[str] = None):
+        self.client = client
+        self.cache = cache
+        self.vendor = vendor
+        self.namespace = namespace or vendor
+        self.refresh = refresh
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _lookup(self, lookup: str, key: str, retries: int):
+        if not key:
+            return getattr(self.client, lookup)(key, retries=retries)
+        if not self.refresh:
+            hit, obj, err = self.cache.get(self.namespace, lookup, key)
+            metrics.inc("cache_lookups_total", vendor=self.vendor, strategy=STRATEGIES[lookup],
+                        result="hit" if hit else "miss")
+            if hit:
+                return obj, err
+        obj, err = getattr(self.client, lookup)(key, retries=retries)
+        self.cache.put(self.namespace, lookup, key, obj, err)
+        return obj, err
+
+    def company_by_id(self, key: str, retries: int = 3):
+        return self._lookup("company_by_id", key, retries)
+
+    def company_by_domain(self, key: str, retries: int = 3):
+        return self._lookup("company_by_domain", key, retries)
+
+    def company_by_name(self, key: str, retries: int = 3):
+        return self._lookup("company_by_name", key, retries)
+
+    def company_by_salesforce_id(self, key: str, retries: int = 3):
+        return self._lookup("company_by_salesforce_id", key, retries)
+
+class AsyncCachedClient(CachedClient):
+    # Same cache in front of the async clients; SQLite reads are short enough to run on the loop
+    async def _lookup(self, lookup: str, key: str, retries: int):
+        if not key:
+            return await getattr(self.client, lookup)(key, retries=retries)
+        if not self.refresh:
+            hit, obj, err = self.cache.get(self.namespace, lookup, key)
+            metrics.inc("cache_lookups_total", vendor=self.vendor, strategy=STRATEGIES[lookup],
+                        result="hit" if hit else "miss")
+            if hit:
+                return obj, err
+        obj, err = await getattr(self.client, lookup)(key, retries=retries)
+        self.cache.put(self.namespace, lookup, key, obj, err)
+        return obj, err
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import asyncio, inspect, time
+from typing import Any, Dict, Optional, Sequence, Tuple
+from enrichment.clients.apollo import ApolloClient
+from enrichment.clients.transport import (CIRCUIT_OPEN, ERROR_BODY_BYTES, ERROR_DRAIN_BYTES, EXHAUSTED,
+                                          RETRYABLE_STATUS, Reply, jittered_backoff, record_response)
+from enrichment.clients.zoominfo import ZoomInfoClient
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.ratelimit import CircuitBreaker, TokenBucket
+
+try:
+    import aiohttp
+except ImportError:  # optional: only needed for the asyncio engine
+    aiohttp = None
+
+async def _read(resp) -> Tuple[bytes, int]:
+    # Counterpart of transport._read; the wire size comes from Content-Length when the server sends it
+    if resp.status < 300:
+        body = await resp.read()
+        return body, int(resp.headers.get("Content-Length") or len(body))
+    kept, seen = b"", 0
+    async for chunk in resp.content.iter_chunked(8192):
+        if len(kept) < ERROR_BODY_BYTES:
+            kept += chunk[:ERROR_BODY_BYTES - len(kept)]
+        seen += len(chunk)
+        if seen > ERROR_DRAIN_BYTES:
+            break
+    return kept, int(resp.headers.get("Content-Length") or seen)
+
+class AsyncTransport:
+    def __init__(self, *, timeout: float = 30, pool_size: int = 100, max_concurrency: int = 50,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 limiter: Optional[TokenBucket] = None, breaker: Optional[CircuitBreaker] = None):
+        if aiohttp is None:
+            raise ImportError("the asyncio engine requires aiohttp (pip install aiohttp)")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self.breaker = breaker
+        self._session = None
+        self._slots = None
+
+    def _ensure_session(self):
+        # Created lazily so the session and semaphore bind to the running loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max(1, self.pool_size)),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept-Encoding": "gzip, deflate"},
+            )
+            self._slots = asyncio.Semaphore(max(1, self.max_concurrency))
+        return self._session
+
+    async def request(self, method: str, url: str, *, headers: Dict[str, str], retries: Optional[int] = None,
+                      vendor: str = "", endpoint: str = "", **kwargs: Any) -> Tuple[Optional[Reply], Optional[str]]:
+        session = self._ensure_session()
+        attempts = retries or self.max_attempts
+        for attempt in range(1, attempts + 1):
+            if self.breaker is not None and not self.breaker.allow():
+                return None, CIRCUIT_OPEN
+            if attempt > 1:
+                metrics.inc("http_retries_total", vendor=vendor, endpoint=endpoint)
+            if self.limiter is not None:
+                waited = await self.limiter.acquire_async()
+                if waited:
+                    metrics.inc("ratelimit_wait_seconds_total", waited, vendor=vendor)
+            r, status, wire = None, 0, 0  # 0: abandoned (cancelled / interrupted) before an outcome
+            started = time.perf_counter()
+            try:
+                async with self._slots:
+                    started = time.perf_counter()
+                    async with session.request(method, url, headers=headers, **kwargs) as resp:
+                        body, wire = await _read(resp)
+                        r = Reply(resp.status, resp.headers, body)
+                status = r.status_code
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = None
+            finally:
+                elapsed = time.perf_counter() - started
+                if self.limiter is not None:
+                    self.limiter.release(status, elapsed)
+            if self.breaker is not None:
+                self.breaker.record(status)
+            record_response(vendor, endpoint, r, elapsed, wire)
+            if r is not None:
+                if self.limiter is not None:
+                    self.limiter.observe(r.status_code, r.headers)
+                if r.status_code not in RETRYABLE_STATUS:
+                    return r, None
+                if self.limiter is not None and self.limiter.paces(r.status_code):
+                    continue
+            if attempt < attempts:
+                delay = jittered_backoff(attempt, self.base_delay, self.max_delay)
+                metrics.inc("backoff_seconds_total", delay, vendor=vendor)
+                await asyncio.sleep(delay)
+        metrics.inc("http_exhausted_total", vendor=vendor, endpoint=endpoint)
+        return None, EXHAUSTED
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+async def _resolve(result):
+    # Lookups short-circuit with a plain tuple on missing keys; otherwise they return a coroutine
+    return await result if inspect.isawaitable(result) else result
+
+class _AsyncFetch:
+    transport_class = AsyncTransport
+
+    async def _fetch(self, method: str, path: str, retries: int, *, first_of: Optional[Sequence[str]] = None,
+                     envelope: bool = False, **kwargs: Any):
+        r, err = await self.transport.request(method, f"{self.base_url}{path}", headers=self._headers(),
+                                              retries=retries, vendor=self.vendor, endpoint=path, **kwargs)
+        if r is None:
+            return None, err
+        return self._parse(r, first_of, envelope)
+
+    async def close(self) -> None:
+        await self.transport.close()
+
+class AsyncZoomInfoClient(_AsyncFetch, ZoomInfoClient):
+    async def company_by_id(self, company_id: str, retries: int = 3):
+        return await _resolve(super().company_by_id(company_id, retries))
+
+    async def company_by_domain(self, domain: str, retries: int = 3):
+        return await _resolve(super().company_by_domain(domain, retries))
+
+    async def company_by_name(self, name: str, retries: int = 3):
+        return await _resolve(super().company_by_name(name, retries))
+
+class AsyncApolloClient(_AsyncFetch, ApolloClient):
+    async def company_by_id(self, apollo_id: str, retries: int = 3):
+        return await _resolve(super().company_by_id(apollo_id, retries))
+
+    async def company_by_domain(self, domain: str, retries: int = 3):
+        return await _resolve(super().company_by_domain(domain, retries))
+
+    async def company_by_name(self, name: str, retries: int = 3):
+        return await _resolve(super().company_by_name(name, retries))
+
+    async def company_by_salesforce_id(self, sf_id: str, retries: int = 3):
+        return await _resolve(super().company_by_salesforce_id(sf_id, retries))
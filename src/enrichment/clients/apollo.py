@@ -1,117 +1,68 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple
-import os, requests
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+from enrichment.clients.base import VendorClient
+from enrichment.clients.transport import Transport
+from enrichment.ratelimit import TokenBucket
+from enrichment.utils import sanitize_domain
 
-class ApolloClient:
+SEARCH_RESULT_KEYS = ("companies", "organizations", "data", "results")
+
+class ApolloClient(VendorClient):
+    vendor = "apollo"
+    bulk_max = 10
     def __init__(self, api_key: Optional[str] = None, *, base_url: str = "https://api.apollo.io/v1",
                  enrich_by_domain_path: str = "/companies/enrich",
                  enrich_by_id_path: str = "/companies/enrich",
                  search_by_name_path: str = "/mixed_companies/search",
                  search_by_salesforce_id_path: str = "/companies/search",
-                 timeout: int = 30):
-        self.api_key = api_key or os.getenv("APOLLO_API_KEY", "")
-        self.base_url = base_url.rstrip("/")
+                 bulk_enrich_path: str = "/organizations/bulk_enrich",
+                 timeout: int = 30,
+                 limiter: Optional[TokenBucket] = None,
+                 transport: Optional[Transport] = None,
+                 fields: Optional[Sequence[str]] = None):
+        super().__init__(api_key or os.getenv("APOLLO_API_KEY", ""), base_url, timeout, limiter, transport, fields)
         self.enrich_by_domain_path = enrich_by_domain_path
         self.enrich_by_id_path = enrich_by_id_path
         self.search_by_name_path = search_by_name_path
         self.search_by_salesforce_id_path = search_by_salesforce_id_path
-        self.timeout = timeout
-
-    def _headers(self):
-        return {
-            "Authorization": f"Bearer {self.api_key}",
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
+        self.bulk_enrich_path = bulk_enrich_path
 
     def company_by_domain(self, domain: str, retries: int = 3):
         if not domain:
             return None, "missing domain"
-        url = f"{self.base_url}{self.enrich_by_domain_path}"
-        payload = {"domain": domain}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
-                if r.status_code == 200:
-                    return r.json(), None
-                elif r.status_code == 404:
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("POST", self.enrich_by_domain_path, retries, json={"domain": domain})
 
     def company_by_id(self, apollo_id: str, retries: int = 3):
         if not apollo_id:
             return None, "missing apollo_id"
-        url = f"{self.base_url}{self.enrich_by_id_path}"
-        payload = {"id": apollo_id}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
-                if r.status_code == 200:
-                    return r.json(), None
-                elif r.status_code == 404:
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("POST", self.enrich_by_id_path, retries, json={"id": apollo_id})
 
     def company_by_name(self, name: str, retries: int = 3):
         if not name:
             return None, "missing name"
-        url = f"{self.base_url}{self.search_by_name_path}"
         payload = {"q_organization_name": name, "page": 1, "per_page": 1}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
-                if r.status_code == 200:
-                    data = r.json()
-                    for key in ("companies", "organizations", "data", "results"):
-                        if isinstance(data, dict) and key in data and data[key]:
-                            return data[key][0], None
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("POST", self.search_by_name_path, retries, json=payload, first_of=SEARCH_RESULT_KEYS)
 
     def company_by_salesforce_id(self, sf_id: str, retries: int = 3):
         if not sf_id:
             return None, "missing salesforce_id"
-        url = f"{self.base_url}{self.search_by_salesforce_id_path}"
         payload = {"filters": {"salesforce_id": sf_id}, "page": 1, "per_page": 1}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
-                if r.status_code == 200:
-                    data = r.json()
-                    for key in ("companies", "organizations", "data", "results"):
-                        if isinstance(data, dict) and key in data and data[key]:
-                            return data[key][0], None
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("POST", self.search_by_salesforce_id_path, retries, json=payload, first_of=SEARCH_RESULT_KEYS)
+
+    def companies_by_domains(self, domains: List[str], retries: int = 3) -> Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        # Bulk enrich returns the matched organizations only; pair them back up by domain and wrap
+        # each like the /companies/enrich body, so --batch leaves the output columns and cache unchanged
+        out: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+        for start in range(0, len(domains), self.bulk_max):
+            batch = domains[start:start + self.bulk_max]
+            data, err = self._fetch("POST", self.bulk_enrich_path, retries, json={"domains": batch}, envelope=True)
+            orgs = data.get("organizations") if isinstance(data, dict) else None
+            found = {}
+            for org in orgs or []:
+                if isinstance(org, dict):
+                    found[sanitize_domain(str(org.get("primary_domain") or org.get("website_url") or ""))] = org
+            for d in batch:
+                org = found.get(sanitize_domain(d))
+                out[d] = (self.prune({"organization": org}), None) if org is not None else (None, err or "not found")
+        return out
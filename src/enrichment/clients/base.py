@@ -0,0 +1,53 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Sequence, Tuple
+from enrichment.clients.transport import ERROR_BODY_BYTES, Transport
+from enrichment.projection import compile_pruner
+from enrichment.ratelimit import TokenBucket
+
+class VendorClient:
+    transport_class = Transport
+    vendor = ""
+
+    def __init__(self, api_key: str, base_url: str, timeout: int,
+                 limiter: Optional[TokenBucket], transport: Optional[Transport],
+                 fields: Optional[Sequence[str]] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.transport = transport or self.transport_class(timeout=timeout, limiter=limiter)
+        self.limiter = self.transport.limiter
+        # Dotted paths (output.fields) a result is cut down to as soon as it is decoded; None keeps everything
+        self.fields = list(fields) if fields else None
+        self.prune = compile_pruner(self.fields or [])
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+
+    def _fetch(self, method: str, path: str, retries: int, *, first_of: Optional[Sequence[str]] = None,
+               envelope: bool = False, **kwargs: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        # first_of: search endpoints return a list under one of these keys; we take the top hit.
+        # envelope: bulk responses come back whole and the caller prunes each result.
+        r, err = self.transport.request(method, f"{self.base_url}{path}", headers=self._headers(),
+                                        retries=retries, vendor=self.vendor, endpoint=path, **kwargs)
+        if r is None:
+            return None, err
+        return self._parse(r, first_of, envelope)
+
+    def _parse(self, r: Any, first_of: Optional[Sequence[str]],
+               envelope: bool = False) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        if r.status_code == 200:
+            data = r.json()
+            if first_of is None:
+                return (data if envelope else self.prune(data)), None
+            for key in first_of:
+                if isinstance(data, dict) and key in data and data[key]:
+                    # The other hits and the envelope go as soon as this returns
+                    return self.prune(data[key][0]), None
+            return None, "not found"
+        if r.status_code == 404 and first_of is None:
+            return None, "not found"
+        return None, f"HTTP {r.status_code}: {r.text[:ERROR_BODY_BYTES]}"
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import json, random, time
+from typing import Any, Dict, Mapping, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.ratelimit import CircuitBreaker, TokenBucket
+
+try:
+    import orjson
+except ImportError:  # optional: faster decoding of vendor payloads
+    orjson = None
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+EXHAUSTED = "max attempts reached"
+CIRCUIT_OPEN = "circuit open"
+TRANSIENT_ERRORS = (EXHAUSTED, CIRCUIT_OPEN)  # lookups worth trying again later
+ERROR_BODY_BYTES = 300     # kept from a non-2xx body for the error message
+ERROR_DRAIN_BYTES = 65536  # read (and discarded) beyond that so the connection stays reusable
+
+loads = orjson.loads if orjson is not None else json.loads
+
+class Reply:
+    # Status, headers and body of a finished response; non-2xx bodies are cut to ERROR_BODY_BYTES
+    def __init__(self, status_code: int, headers: Mapping[str, str], content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self) -> Any:
+        return loads(self.content)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+def _read(r: requests.Response) -> Tuple[bytes, int]:
+    # Whole (decompressed) body of a success; a bounded head of anything else. Returns the body
+    # and the bytes that came over the wire.
+    if r.status_code < 300:
+        body = r.content
+        return body, r.raw.tell() or len(body)
+    kept, seen = b"", 0
+    for chunk in r.iter_content(8192):
+        if len(kept) < ERROR_BODY_BYTES:
+            kept += chunk[:ERROR_BODY_BYTES - len(kept)]
+        seen += len(chunk)
+        if seen > ERROR_DRAIN_BYTES:
+            r.close()
+            break
+    return kept, r.raw.tell() or seen
+
+def jittered_backoff(attempt: int, base_delay: float, max_delay: float) -> float:
+    # Full jitter keeps concurrent rows from retrying in lockstep
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+def record_response(vendor: str, endpoint: str, r: Any, seconds: float, wire_bytes: int = 0) -> None:
+    status = str(r.status_code) if r is not None else "error"
+    metrics.observe("http_request_seconds", seconds, vendor=vendor, endpoint=endpoint)
+    metrics.inc("http_responses_total", vendor=vendor, endpoint=endpoint, status=status)
+    if wire_bytes:
+        metrics.inc("http_response_bytes_total", wire_bytes, vendor=vendor, endpoint=endpoint)
+
+class Transport:
+    # One pooled keep-alive session per vendor plus the shared retry/backoff policy
+    def __init__(self, *, timeout: float = 30, pool_size: int = 10, max_attempts: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 limiter: Optional[TokenBucket] = None, breaker: Optional[CircuitBreaker] = None):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # gzip / deflate, plus br and zstd when brotli / zstandard are installed
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    def backoff(self, attempt: int) -> float:
+        return jittered_backoff(attempt, self.base_delay, self.max_delay)
+
+    def request(self, method: str, url: str, *, headers: Dict[str, str], retries: Optional[int] = None,
+                vendor: str = "", endpoint: str = "", **kwargs: Any) -> Tuple[Optional[Reply], Optional[str]]:
+        # vendor / endpoint only label the metrics
+        attempts = retries or self.max_attempts
+        for attempt in range(1, attempts + 1):
+            if self.breaker is not None and not self.breaker.allow():
+                return None, CIRCUIT_OPEN
+            if attempt > 1:
+                metrics.inc("http_retries_total", vendor=vendor, endpoint=endpoint)
+            if self.limiter is not None:
+                waited = self.limiter.acquire()
+                if waited:
+                    metrics.inc("ratelimit_wait_seconds_total", waited, vendor=vendor)
+            r, status, wire = None, 0, 0  # 0: abandoned (cancelled / interrupted) before an outcome
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, headers=headers, timeout=self.timeout, stream=True, **kwargs)
+                body, wire = _read(resp)
+                r = Reply(resp.status_code, resp.headers, body)
+                status = r.status_code
+            except requests.RequestException:
+                status = None
+            finally:
+                elapsed = time.perf_counter() - started
+                if self.limiter is not None:
+                    self.limiter.release(status, elapsed)
+            if self.breaker is not None:
+                self.breaker.record(status)
+            record_response(vendor, endpoint, r, elapsed, wire)
+            if r is not None:
+                if self.limiter is not None:
+                    self.limiter.observe(r.status_code, r.headers)
+                if r.status_code not in RETRYABLE_STATUS:
+                    return r, None
+                if self.limiter is not None and self.limiter.paces(r.status_code):
+                    continue  # the limiter slows the whole lane instead of this row sleeping
+            if attempt < attempts:
+                delay = self.backoff(attempt)
+                metrics.inc("backoff_seconds_total", delay, vendor=vendor)
+                time.sleep(delay)
+        metrics.inc("http_exhausted_total", vendor=vendor, endpoint=endpoint)
+        return None, EXHAUSTED
+
+    def close(self) -> None:
+        self.session.close()
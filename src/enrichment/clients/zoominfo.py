@@ -1,90 +1,71 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple
-import os, requests
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+from enrichment.clients.base import VendorClient
+from enrichment.clients.transport import Transport
+from enrichment.ratelimit import TokenBucket
 
-class ZoomInfoClient:
+ENRICH_OUTPUT_FIELDS = ("id", "name", "website", "revenue", "employeeCount", "industries",
+                        "city", "state", "country", "phone")
+
+class ZoomInfoClient(VendorClient):
+    vendor = "zoominfo"
+    bulk_max = 25
     def __init__(self, api_key: Optional[str] = None, *, base_url: str = "https://api.zoominfo.com",
                  company_by_id_path: str = "/company/detail",
                  company_lookup_path: str = "/lookup/company",
                  search_by_name_path: str = "/search/company",
-                 timeout: int = 30):
-        self.api_key = api_key or os.getenv("ZOOMINFO_API_KEY", "")
-        self.base_url = base_url.rstrip("/")
+                 enrich_path: str = "/enrich/company",
+                 enrich_output_fields: Sequence[str] = ENRICH_OUTPUT_FIELDS,
+                 timeout: int = 30,
+                 limiter: Optional[TokenBucket] = None,
+                 transport: Optional[Transport] = None,
+                 fields: Optional[Sequence[str]] = None):
+        super().__init__(api_key or os.getenv("ZOOMINFO_API_KEY", ""), base_url, timeout, limiter, transport, fields)
         self.company_by_id_path = company_by_id_path
         self.company_lookup_path = company_lookup_path
         self.search_by_name_path = search_by_name_path
-        self.timeout = timeout
-
-    def _headers(self):
-        return {
-            "Authorization": f"Bearer {self.api_key}",
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
+        self.enrich_path = enrich_path
+        if self.fields:
+            # Enrich returns only the requested top-level fields; ask for just the ones kept
+            enrich_output_fields = dict.fromkeys(["id"] + [str(f).split(".")[0] for f in self.fields])
+        self.enrich_output_fields = list(enrich_output_fields)
 
     def company_by_id(self, company_id: str, retries: int = 3):
         if not company_id:
             return None, "missing company_id"
-        url = f"{self.base_url}{self.company_by_id_path}"
-        params = {"companyId": company_id}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.get(url, headers=self._headers(), params=params, timeout=self.timeout)
-                if r.status_code == 200:
-                    return r.json(), None
-                elif r.status_code == 404:
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("GET", self.company_by_id_path, retries, params={"companyId": company_id})
 
     def company_by_domain(self, domain: str, retries: int = 3):
         if not domain:
             return None, "missing domain"
-        url = f"{self.base_url}{self.company_lookup_path}"
-        params = {"domain": domain}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.get(url, headers=self._headers(), params=params, timeout=self.timeout)
-                if r.status_code == 200:
-                    return r.json(), None
-                elif r.status_code == 404:
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-                else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+        return self._fetch("GET", self.company_lookup_path, retries, params={"domain": domain})
 
     def company_by_name(self, name: str, retries: int = 3):
         if not name:
             return None, "missing name"
-        url = f"{self.base_url}{self.search_by_name_path}"
-        payload = {"companyName": name}
-        for attempt in range(1, retries + 1):
-            try:
-                r = requests.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
-                if r.status_code == 200:
-                    data = r.json()
-                    if isinstance(data, dict) and "data" in data and data["data"]:
-                        return data["data"][0], None
-                    return None, "not found"
-                elif r.status_code in (429, 500, 502, 503, 504):
-                    from time import sleep
-                    sleep(min(60, 1.0 * (2 ** (attempt - 1))))
+        # Only the top hit is used, so ask for a one-result page
+        return self._fetch("POST", self.search_by_name_path, retries, json={"companyName": name, "rpp": 1, "page": 1},
+                           first_of=("data",))
+
+    def companies_by_ids(self, company_ids: List[str], retries: int = 3) -> Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        return self._enrich_many("companyId", company_ids, retries)
+
+    def companies_by_domains(self, domains: List[str], retries: int = 3) -> Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        return self._enrich_many("companyWebsite", domains, retries)
+
+    def _enrich_many(self, field: str, keys: List[str], retries: int):
+        # Enrich accepts up to bulk_max match inputs; results come back in input order
+        out: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+        for start in range(0, len(keys), self.bulk_max):
+            batch = keys[start:start + self.bulk_max]
+            payload = {"matchCompanyInput": [{field: k} for k in batch], "outputFields": self.enrich_output_fields}
+            data, err = self._fetch("POST", self.enrich_path, retries, json=payload, envelope=True)
+            results = (data or {}).get("data", {}).get("result", []) if isinstance(data, dict) else []
+            for i, key in enumerate(batch):
+                matches = results[i].get("data") if i < len(results) and isinstance(results[i], dict) else None
+                if matches:
+                    out[key] = (self.prune(matches[0]), None)
                 else:
-                    return None, f"HTTP {r.status_code}: {r.text[:300]}"
-            except requests.RequestException:
-                from time import sleep
-                sleep(min(60, 1.0 * (2 ** (attempt - 1))))
-        return None, "max attempts reached"
+                    out[key] = (None, err or "not found")
+        return out
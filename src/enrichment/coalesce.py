@@ -0,0 +1,115 @@
+from __future__ import annotations
+import asyncio, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional, Tuple
+from enrichment.cache import NOT_FOUND, normalize_key
+
+Result = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+class SingleFlight:
+    # Resolves each key once per run: concurrent callers share the in-flight call,
+    # later callers get the memoized result. Bounded LRU so long runs stay flat.
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Future]" = OrderedDict()
+
+    def do(self, key: Hashable, fn, *args, keep=lambda result: True, **kwargs):
+        with self._lock:
+            fut = self._entries.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._entries[key] = fut
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._entries.pop(key, None)
+            fut.set_exception(e)
+            raise
+        if not keep(result):
+            # Waiters already attached share this result; later callers retry
+            with self._lock:
+                if self._entries.get(key) is fut:
+                    del self._entries[key]
+        fut.set_result(result)
+        return result
+
+def _definitive(result: Result) -> bool:
+    obj, err = result
+    return obj is not None or err == NOT_FOUND
+
+class CoalescingClient:
+    # Wraps a vendor client so identical lookups within a run hit the vendor once
+    def __init__(self, client: Any, *, max_entries: int = 10_000):
+        self.client = client
+        self.flight = SingleFlight(max_entries)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _lookup(self, lookup: str, key: str, retries: int) -> Result:
+        if not key:
+            return getattr(self.client, lookup)(key, retries=retries)
+        return self.flight.do((lookup, normalize_key(lookup, key)), getattr(self.client, lookup), key,
+                              retries=retries, keep=_definitive)
+
+    def company_by_id(self, key: str, retries: int = 3):
+        return self._lookup("company_by_id", key, retries)
+
+    def company_by_domain(self, key: str, retries: int = 3):
+        return self._lookup("company_by_domain", key, retries)
+
+    def company_by_name(self, key: str, retries: int = 3):
+        return self._lookup("company_by_name", key, retries)
+
+    def company_by_salesforce_id(self, key: str, retries: int = 3):
+        return self._lookup("company_by_salesforce_id", key, retries)
+
+class AsyncCoalescingClient(CoalescingClient):
+    # Event-loop flavour: waiters share one task; it is cancelled only once every waiter has
+    # gone away (e.g. speculative fallbacks cancelled after a higher-priority match).
+    def __init__(self, client: Any, *, max_entries: int = 10_000):
+        self.client = client
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    async def _lookup(self, lookup: str, key: str, retries: int) -> Result:
+        if not key:
+            return await getattr(self.client, lookup)(key, retries=retries)
+        k = (lookup, normalize_key(lookup, key))
+        entry = self._entries.get(k)
+        if entry is None:
+            entry = [asyncio.ensure_future(getattr(self.client, lookup)(key, retries=retries)), 0]
+            self._entries[k] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(k)
+        task = entry[0]
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+                if self._entries.get(k) is entry:
+                    del self._entries[k]
+            raise
+        except Exception:
+            if self._entries.get(k) is entry:
+                del self._entries[k]
+            raise
+        finally:
+            entry[1] -= 1
+        if not _definitive(result) and self._entries.get(k) is entry:
+            del self._entries[k]
+        return result
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import json, os, sqlite3, tempfile, threading, time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Sequence
+import pandas as pd
+from enrichment import sinks
+from enrichment.cache import NOT_FOUND
+from enrichment.preprocess import KEY_COLUMNS, lookup_key_frame
+
+ENRICHED_AT = "enriched_at"
+_NOT_FOUND = (NOT_FOUND, "not_found")
+
+def enriched_at(now: Optional[float] = None) -> str:
+    return datetime.fromtimestamp(now or time.time(), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def row_fingerprints(keys: pd.DataFrame) -> pd.Series:
+    # 64-bit hash of a row's normalized lookup keys (IDs, name, domain), as lookup_key_frame builds them
+    joined = keys[KEY_COLUMNS[0]]
+    for c in KEY_COLUMNS[1:]:
+        joined = joined + "\x1f" + keys[c]
+    return pd.util.hash_pandas_object(joined, index=False)
+
+def source_signature(path: str) -> list:
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+class PreviousOutput:
+    # Vendor columns of an earlier output by input fingerprint. Rows that failed, or whose vendor
+    # data is older than max_age_seconds (by enriched_at, else the file's mtime), are left out so
+    # they are enriched again; so are misses when retry_not_found is set. The rows go to a scratch
+    # SQLite file (removed by close()) so memory stays flat however large the output is.
+    def __init__(self, path: str, mapping: Dict[str, Optional[str]], prefixes: Sequence[str], *,
+                 max_age_seconds: Optional[float] = None, retry_not_found: bool = False,
+                 now: Optional[float] = None, chunksize: int = 50_000):
+        self.path = path
+        self.refresh = {"failed": 0, "stale": 0}
+        fd, self._db_path = tempfile.mkstemp(prefix="previous-", suffix=".sqlite")
+        os.close(fd)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE rows (fp INTEGER PRIMARY KEY, payload TEXT)")
+        try:
+            self._load(mapping, prefixes, max_age_seconds, retry_not_found, now or time.time(), chunksize)
+        except BaseException:
+            self.close()
+            raise
+
+    def _load(self, mapping: Dict[str, Optional[str]], prefixes: Sequence[str], max_age_seconds: Optional[float],
+              retry_not_found: bool, now: float, chunksize: int) -> None:
+        mtime = os.path.getmtime(self.path)
+        for df in sinks.read_frames(self.path, chunksize):
+            missing = [c for c in mapping.values() if c and c not in df.columns]
+            if missing:
+                raise ValueError(f"{self.path} has no input column(s) {', '.join(missing)}; delta mode needs an "
+                                 "output written with include_input_columns")
+            keep = pd.Series(True, index=df.index)
+            for prefix in prefixes:
+                if f"{prefix}_error" not in df.columns:
+                    keep[:] = False
+                    continue
+                err = df[f"{prefix}_error"].astype(str)
+                failed = (err != "") if retry_not_found else (err != "") & ~err.isin(_NOT_FOUND)
+                self.refresh["failed"] += int((failed & keep).sum())
+                keep &= ~failed
+            # Unstamped rows are dated by the file and keep that date when carried over
+            stamps = df[ENRICHED_AT].astype(str) if ENRICHED_AT in df.columns else pd.Series("", index=df.index)
+            stamps = stamps.where(stamps != "", enriched_at(mtime))
+            if max_age_seconds is not None:
+                age = (pd.Timestamp(now, unit="s", tz="UTC") - pd.to_datetime(stamps, utc=True, errors="coerce")
+                       ).dt.total_seconds()
+                stale = ~(age <= max_age_seconds)
+                self.refresh["stale"] += int((stale & keep).sum())
+                keep &= ~stale
+            cols = [c for c in df.columns if any(c.startswith(f"{p}_") for p in prefixes)]
+            records = df.loc[keep, cols].to_dict("records")
+            for rec, stamp in zip(records, stamps[keep].tolist()):
+                rec[ENRICHED_AT] = stamp
+            fps = row_fingerprints(lookup_key_frame(df, mapping))
+            # Later rows win for repeated fingerprints
+            pairs = [(_signed(fp), json.dumps(rec, separators=(",", ":"), ensure_ascii=False))
+                     for fp, rec in zip(fps[keep].tolist(), records)]
+            with self._lock:
+                self._db.execute("BEGIN")
+                self._db.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?)", pairs)
+                self._db.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def get(self, fingerprint: int) -> Optional[Dict[str, Any]]:
+        return self.get_many([fingerprint]).get(fingerprint)
+
+    def get_many(self, fingerprints: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        # Reusable rows among the given fingerprints; one query per 500 of them
+        wanted = {_signed(fp): fp for fp in fingerprints}
+        keys = list(wanted)
+        out: Dict[int, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # stays under SQLite's bound-parameter limit
+                batch = keys[start:start + 500]
+                q = f"SELECT fp, payload FROM rows WHERE fp IN ({','.join('?' * len(batch))})"
+                for fp, payload in self._db.execute(q, batch):
+                    out[wanted[fp]] = json.loads(payload)
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+        try:
+            os.remove(self._db_path)
+        except OSError:
+            pass
+
+def _signed(fp: int) -> int:
+    # row_fingerprints are unsigned 64-bit; SQLite integers are signed
+    fp = int(fp)
+    return fp - (1 << 64) if fp >= 1 << 63 else fp
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from enrichment.metrics import STRATEGIES
+
+# Cascade order per vendor as (method, lookup key column); the order logic.zoominfo_steps / apollo_steps use
+CASCADES = {
+    "zoominfo": (("company_by_id", "zoominfo_id"), ("company_by_domain", "domain"), ("company_by_name", "name")),
+    "apollo": (("company_by_id", "apollo_id"), ("company_by_salesforce_id", "salesforce_id"),
+               ("company_by_domain", "domain"), ("company_by_name", "name")),
+}
+DEFAULT_YIELD = 0.5  # match rate assumed for a strategy nothing is known about
+MIN_SAMPLES = 50     # cache entries needed before their match rate is used
+
+class CallPlan:
+    # Dry run of a job: the vendor lookups its rows would make, counted without calling anyone.
+    # Rows are reduced to distinct keys per vendor and each (strategy, key) is looked up once, as
+    # the cache and coalescing do within a run. Cached results and entity index hits settle steps
+    # up front; the worst case has every other step miss, the expected case weighs each step by
+    # the chance that the ones before it missed.
+    def __init__(self, *, cache=None, namespaces: Optional[Dict[str, str]] = None, entities=None, planner=None,
+                 bulk: Optional[Dict[Tuple[str, str], int]] = None):
+        self.cache = cache
+        self.namespaces = namespaces or {}
+        self.entities = entities
+        self.planner = planner
+        self.bulk = bulk or {}  # (vendor, method) -> keys per call when lookups are batched
+        self.rows = 0
+        self._keys: Dict[str, List[pd.DataFrame]] = {v: [] for v in CASCADES}
+
+    def add(self, keys: pd.DataFrame) -> None:
+        # Lookup keys (preprocess.lookup_key_frame) of rows that will be enriched
+        self.rows += len(keys)
+        for vendor, steps in CASCADES.items():
+            k = keys[[c for _, c in steps]]
+            parts = self._keys[vendor]
+            parts.append(k[(k != "").any(axis=1)].drop_duplicates())
+            if len(parts) > 16:
+                parts[:] = [pd.concat(parts, ignore_index=True).drop_duplicates()]
+
+    def _yield(self, vendor: str, method: str) -> Tuple[float, str]:
+        if self.planner is not None:
+            s = self.planner.stats(vendor, method)
+            if s is not None and s.attempts >= self.planner.min_samples:
+                return s.yield_rate, "planner"
+        if self.cache is not None:
+            n, hits = self.cache.match_rates(self.namespaces.get(vendor, vendor)).get(method, (0, 0))
+            if n >= MIN_SAMPLES:
+                return hits / n, "cache"
+        return DEFAULT_YIELD, "assumed"
+
+    def _cached(self, vendor: str, method: str, uniques: np.ndarray) -> np.ndarray:
+        # Per distinct key: 1.0 cached match, 0.0 cached miss, NaN not cached
+        if self.cache is None:
+            return np.full(len(uniques), np.nan)
+        found = self.cache.peek_many(self.namespaces.get(vendor, vendor), method, [k for k in uniques if k])
+        return np.array([found.get(k, np.nan) for k in uniques], dtype=float)
+
+    def _indexed(self, vendor: str, keys: pd.DataFrame) -> np.ndarray:
+        hit = np.zeros(len(keys), dtype=bool)
+        if self.entities is None:
+            return hit
+        for method, col in CASCADES[vendor]:
+            codes, uniques = pd.factorize(keys[col])
+            hit |= np.array(self.entities.known(vendor, STRATEGIES[method], uniques), dtype=bool)[codes] & (
+                (uniques != "")[codes])
+        return hit
+
+    def vendor(self, vendor: str) -> Dict[str, Any]:
+        parts = self._keys[vendor]
+        keys = pd.concat(parts, ignore_index=True).drop_duplicates() if parts else pd.DataFrame(
+            columns=[c for _, c in CASCADES[vendor]], dtype=object)
+        indexed = self._indexed(vendor, keys)
+        worst_open = ~indexed               # nothing settled the row before this step (all lookups miss)
+        reach = (~indexed).astype(float)    # chance the cascade gets to this step
+        strategies = []
+        for method, col in CASCADES[vendor]:
+            key = keys[col]
+            if method in ("company_by_domain", "company_by_name"):
+                key = key.str.lower().str.replace(r"\s+", " ", regex=True)  # cache.normalize_key, column-wide
+            # Distinct keys as integer codes; a key shared by several rows is looked up once
+            codes, uniques = pd.factorize(key)
+            uniques = np.asarray(uniques, dtype=object)
+            present = (uniques != "")[codes]
+            cached = self._cached(vendor, method, uniques)[codes]
+            uncached = present & np.isnan(cached)
+            p, source = self._yield(vendor, method)
+            tried = 1.0
+            if self.planner is not None and self.planner.skips(vendor, method):
+                tried = 1.0 / self.planner.explore_every
+            worst = _distinct(codes[uncached & worst_open], len(uniques))
+            # ...if any of those rows gets to it
+            best = np.zeros(len(uniques))
+            np.maximum.at(best, codes[uncached], reach[uncached] * tried)
+            expected = float(best.sum())
+            size = self.bulk.get((vendor, method), 1)
+            strategies.append({"strategy": STRATEGIES[method], "keys": _distinct(codes[present], len(uniques)),
+                               "cached": _distinct(codes[present & ~uncached & worst_open], len(uniques)),
+                               "worst_lookups": worst, "expected_lookups": round(expected, 1),
+                               "worst_calls": math.ceil(worst / size), "expected_calls": math.ceil(expected / size),
+                               "yield": round(p, 4), "yield_source": source})
+            worst_open &= ~(present & (cached == 1.0))
+            miss = np.where(np.isnan(cached), 1.0 - p * tried, 1.0 - np.nan_to_num(cached))
+            reach = np.where(present, reach * miss, reach)
+        return {"vendor": vendor, "distinct_rows": len(keys), "indexed_rows": int(indexed.sum()),
+                "strategies": strategies,
+                "worst_calls": sum(s["worst_calls"] for s in strategies),
+                "expected_calls": sum(s["expected_calls"] for s in strategies)}
+
+    def report(self, per_minute: Dict[str, float]) -> Dict[str, Any]:
+        # Vendors run side by side, each at its own rate limit, so the job takes as long as the slowest
+        vendors = []
+        for vendor in CASCADES:
+            v = self.vendor(vendor)
+            rate = float(per_minute.get(vendor) or 0) / 60.0
+            for case in ("worst", "expected"):
+                v[f"{case}_seconds"] = round(v[f"{case}_calls"] / rate, 1) if rate > 0 else None
+            v["per_min"] = per_minute.get(vendor)
+            vendors.append(v)
+        out: Dict[str, Any] = {"rows": self.rows, "vendors": vendors}
+        for case in ("worst", "expected"):
+            seconds = [v[f"{case}_seconds"] for v in vendors if v[f"{case}_seconds"] is not None]
+            out[f"{case}_seconds"] = max(seconds) if seconds else None
+        return out
+
+def _distinct(codes: np.ndarray, n: int) -> int:
+    return int(np.count_nonzero(np.bincount(codes, minlength=n)))
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unlimited"
+    seconds = int(round(seconds))
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}h {m:02d}m" if h else f"{m}m {s:02d}s" if m else f"{s}s"
+
+def format_plan(report: Dict[str, Any]) -> str:
+    head = ("vendor", "strategy", "keys", "cached", "worst lookups", "exp. lookups", "worst calls", "exp. calls", "yield")
+    table = [head]
+    for v in report["vendors"]:
+        for s in v["strategies"]:
+            table.append((v["vendor"], s["strategy"], s["keys"], s["cached"], s["worst_lookups"],
+                          s["expected_lookups"], s["worst_calls"], s["expected_calls"],
+                          f"{s['yield']:.2f} ({s['yield_source']})"))
+        table.append((v["vendor"], "total", v["distinct_rows"], f"{v['indexed_rows']} indexed", "", "",
+                      v["worst_calls"], v["expected_calls"], ""))
+    widths = [max(len(str(r[i])) for r in table) for i in range(len(head))]
+    lines = ["  ".join(str(c).ljust(w) if i < 2 else str(c).rjust(w) for i, (c, w) in enumerate(zip(r, widths)))
+             for r in table]
+    for v in report["vendors"]:
+        lines.append(f"{v['vendor']}: {format_duration(v['worst_seconds'])} worst case, "
+                     f"{format_duration(v['expected_seconds'])} expected at {v['per_min']}/min")
+    lines.append(f"Estimated wall time: {format_duration(report['worst_seconds'])} worst case, "
+                 f"{format_duration(report['expected_seconds'])} expected")
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+import asyncio, itertools, queue, threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional
+import pandas as pd
+from enrichment.cache import NOT_FOUND
+from enrichment.logic import LookupKeys, enrich_keys, enrich_keys_async, lookup_keys
+from enrichment.preprocess import iter_lookup_keys, lookup_key_frame
+from enrichment.backfill import SalesforceIndex, backfill_domains
+
+def _reusable(vendor_out: Dict[str, Any], cfg: Dict[str, Any]) -> bool:
+    # Transient failures are not fanned out to later duplicates; they get their own attempt
+    for prefix in (cfg.get("prefix_zoominfo", "zi"), cfg.get("prefix_apollo", "ap")):
+        if vendor_out.get(f"{prefix}_error") not in ("", NOT_FOUND, "not_found", None):
+            return False
+    return True
+
+def _attach(row: pd.Series, vendor_out: Dict[str, Any], cfg: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    if cfg.get("include_input_columns", True):
+        for c in row.index:
+            out[c] = row[c]
+    out.update(vendor_out)
+    return out
+
+def _window(base: int, retry) -> int:
+    # Rows parked for a deferred retry keep their place in the output but not a worker, so the
+    # look-ahead grows by them (up to retry.max_waiting) and other rows keep flowing
+    return base + min(retry.waiting, retry.max_waiting) if retry is not None else base
+
+# A None key tuple is a row the caller resolves itself (e.g. carried over from an earlier output):
+# it yields None in its place in the order and costs no lookup.
+_SKIPPED: Future = Future()
+_SKIPPED.set_result(None)
+
+def enrich_key_stream(keys: Iterable[Optional[LookupKeys]],
+                      vendors: Dict[str, Any],
+                      cfg: Dict[str, Any],
+                      workers: int = 1) -> Iterator[Dict[str, Any]]:
+    # Yields vendor columns per lookup-key tuple in input order; pacing is left to the clients'
+    # rate limiters. Identical key tuples are resolved once and fanned out. With cfg["retry"]
+    # (enrichment.retry.DeferredRetries) rows that failed transiently are parked for a later pass.
+    max_keys = int(cfg.get("dedupe_max_keys", 10_000))
+    retry = cfg.get("retry")
+    resolved: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    def remember(k, value):
+        resolved[k] = value
+        while len(resolved) > max_keys:
+            resolved.popitem(last=False)
+
+    if workers <= 1 and retry is None:
+        for k in keys:
+            if k is None:
+                yield None
+                continue
+            vendor_out = resolved.get(k)
+            if vendor_out is None:
+                vendor_out = enrich_keys(k, vendors, cfg)
+                if _reusable(vendor_out, cfg):
+                    remember(k, vendor_out)
+            else:
+                resolved.move_to_end(k)
+            yield vendor_out
+        return
+
+    window = workers * 4
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich-row") as row_pool, \
+         ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich-vendor") as vendor_pool:
+        pending: deque = deque()
+        for k in keys:
+            fut: Optional[Future] = _SKIPPED if k is None else resolved.get(k)
+            if fut is None or (fut.done() and k is not None and not _reusable(fut.result(), cfg)):
+                if retry is not None:
+                    fut = retry.submit(row_pool, k, vendors, cfg, vendor_pool)
+                else:
+                    fut = row_pool.submit(enrich_keys, k, vendors, cfg, vendor_pool)
+                remember(k, fut)
+            elif k is not None:
+                resolved.move_to_end(k)
+            pending.append(fut)
+            # Bounded look-ahead keeps memory flat and output ordered
+            while len(pending) >= _window(window, retry) or (pending and pending[0].done()):
+                if retry is not None and not pending[0].done():
+                    # Rows parked meanwhile widen the window; look again shortly
+                    wait([pending[0]], timeout=0.05)
+                    continue
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+async def enrich_key_stream_async(keys: Iterable[Optional[LookupKeys]],
+                                  vendors: Dict[str, Any],
+                                  cfg: Dict[str, Any],
+                                  max_in_flight: int = 100) -> AsyncIterator[Dict[str, Any]]:
+    # asyncio counterpart of enrich_key_stream over the async clients; max_in_flight is the global cap
+    max_keys = int(cfg.get("dedupe_max_keys", 10_000))
+    resolved: "OrderedDict[tuple, asyncio.Future]" = OrderedDict()
+    pending: deque = deque()
+    skipped = asyncio.get_running_loop().create_future()
+    skipped.set_result(None)
+    retry = cfg.get("retry")
+    for k in keys:
+        task = skipped if k is None else resolved.get(k)
+        if task is None or (task.done() and k is not None and not _reusable(task.result(), cfg)):
+            task = asyncio.ensure_future(enrich_keys_async(k, vendors, cfg) if retry is None
+                                         else retry.run_async(k, vendors, cfg))
+            resolved[k] = task
+            while len(resolved) > max_keys:
+                resolved.popitem(last=False)
+        elif k is not None:
+            resolved.move_to_end(k)
+        pending.append(task)
+        while len(pending) >= _window(max_in_flight, retry) or (pending and pending[0].done()):
+            if retry is not None and not pending[0].done():
+                await asyncio.wait([pending[0]], timeout=0.05)
+                continue
+            yield await pending.popleft()
+    while pending:
+        yield await pending.popleft()
+
+def enrich_rows(rows: Iterable[pd.Series],
+                mapping_in: Dict[str, Optional[str]],
+                vendors: Dict[str, Any],
+                cfg: Dict[str, Any],
+                workers: int = 1) -> Iterator[Dict[str, Any]]:
+    # Row-at-a-time convenience wrapper: input columns are attached to each result
+    held: deque = deque()
+
+    def keys():
+        for row in rows:
+            held.append(row)
+            yield lookup_keys(row, mapping_in)
+
+    for vendor_out in enrich_key_stream(keys(), vendors, cfg, workers):
+        yield _attach(held.popleft(), vendor_out, cfg)
+
+async def enrich_rows_async(rows: Iterable[pd.Series],
+                            mapping_in: Dict[str, Optional[str]],
+                            vendors: Dict[str, Any],
+                            cfg: Dict[str, Any],
+                            max_in_flight: int = 100) -> AsyncIterator[Dict[str, Any]]:
+    held: deque = deque()
+
+    def keys():
+        for row in rows:
+            held.append(row)
+            yield lookup_keys(row, mapping_in)
+
+    async for vendor_out in enrich_key_stream_async(keys(), vendors, cfg, max_in_flight):
+        yield _attach(held.popleft(), vendor_out, cfg)
+
+def enrich_frame(df: pd.DataFrame,
+                 mapping_in: Dict[str, Optional[str]],
+                 vendors: Dict[str, Any],
+                 cfg: Dict[str, Any],
+                 workers: int = 1,
+                 salesforce: Optional[SalesforceIndex] = None) -> Iterator[Dict[str, Any]]:
+    # Whole-frame counterpart of enrich_rows: keys are built column-wise, with the Salesforce
+    # domain backfill as a join stage when an index is given
+    keys = lookup_key_frame(df, mapping_in)
+    if salesforce is not None:
+        keys = backfill_domains(keys, salesforce)
+    inputs = df.to_dict("records") if cfg.get("include_input_columns", True) else itertools.repeat({})
+    for row, vendor_out in zip(inputs, enrich_key_stream(iter_lookup_keys(keys), vendors, cfg, workers)):
+        row.update(vendor_out)
+        yield row
+
+_DONE = object()
+
+def iterate_async(make_rows: Callable[[], AsyncIterator[Dict[str, Any]]],
+                  finalize: Optional[Callable[[], Awaitable[None]]] = None,
+                  buffer: int = 1000) -> Iterator[Dict[str, Any]]:
+    # Drives an async row stream on a private event loop thread so sync writers can consume it
+    q: "queue.Queue" = queue.Queue(maxsize=buffer)
+
+    async def pump():
+        try:
+            async for item in make_rows():
+                try:
+                    q.put_nowait(item)
+                except queue.Full:
+                    # Back-pressure from a slow writer without blocking the loop
+                    await asyncio.get_running_loop().run_in_executor(None, q.put, item)
+        except BaseException as e:
+            q.put(e)
+        finally:
+            if finalize is not None:
+                await finalize()
+            q.put(_DONE)
+
+    t = threading.Thread(target=asyncio.run, args=(pump(),), name="enrich-asyncio", daemon=True)
+    t.start()
+    while True:
+        item = q.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    t.join()
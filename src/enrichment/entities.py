@@ -0,0 +1,209 @@
+from __future__ import annotations
+import json, os, re, sqlite3, threading, time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from enrichment import sinks
+from enrichment.logic import Steps, vendor_steps
+from enrichment.metrics import REGISTRY as metrics, STRATEGIES
+from enrichment.preprocess import iter_lookup_keys, lookup_key_frame
+
+# Trailing words dropped from names before matching ("Acme, Inc." and "ACME Corp" are both "acme")
+LEGAL_SUFFIXES = {"inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation", "co", "company",
+                  "gmbh", "ag", "sa", "sas", "bv", "nv", "plc", "pty", "srl", "spa", "oy", "ab", "as"}
+_RESERVED = ("match", "error", "json", "fuzzy_match")
+CONFLICT = 0  # rid of a key seen with different records; it resolves to nothing
+
+def normalize_name(name: str) -> str:
+    words = re.sub(r"[^\w\s]", " ", str(name).lower()).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+def normalize_entity_key(kind: str, key: str) -> str:
+    key = str(key).strip()
+    if kind == "name":
+        return normalize_name(key)
+    if kind == "domain":
+        return key.lower()
+    return key
+
+def trigrams(s: str) -> Set[str]:
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class EntityIndex:
+    # Vendor records from earlier runs keyed by vendor ID, Salesforce ID, sanitized domain and
+    # normalized name. Keys are held in memory (dict probes, plus a trigram index for fuzzy
+    # names) and payloads in SQLite, so a hit is one primary-key read; adds persist immediately.
+    def __init__(self, path: str, *, fuzzy_threshold: Optional[float] = None,
+                 max_age_seconds: Optional[float] = None, learn: bool = True):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_age_seconds = max_age_seconds
+        self.learn = learn
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS records (rid INTEGER PRIMARY KEY, vendor TEXT, payload TEXT, updated_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS keys (vendor TEXT, kind TEXT, key TEXT, rid INTEGER,"
+                         " PRIMARY KEY (vendor, kind, key)) WITHOUT ROWID")
+        self._keys: Dict[Tuple[str, str, str], int] = {}
+        self._names: Dict[str, List[Tuple[str, int]]] = {}       # vendor -> [(name, trigram count)]
+        self._grams: Dict[str, Dict[str, List[int]]] = {}        # vendor -> trigram -> positions in _names
+        for vendor, kind, key, rid in self._db.execute("SELECT vendor, kind, key, rid FROM keys"):
+            self._index_key(vendor, kind, key, rid)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def _index_key(self, vendor: str, kind: str, key: str, rid: int) -> None:
+        new = (vendor, kind, key) not in self._keys
+        self._keys[(vendor, kind, key)] = rid
+        if kind == "name" and new and self.fuzzy_threshold:
+            names = self._names.setdefault(vendor, [])
+            grams = trigrams(key)
+            postings = self._grams.setdefault(vendor, {})
+            for g in grams:
+                postings.setdefault(g, []).append(len(names))
+            names.append((key, len(grams)))
+
+    def _fuzzy(self, vendor: str, name: str) -> Optional[int]:
+        # Best Jaccard similarity over name trigrams, at or above fuzzy_threshold
+        postings = self._grams.get(vendor)
+        if not postings or not name:
+            return None
+        grams = trigrams(name)
+        counts: Counter = Counter()
+        for g in grams:
+            counts.update(postings.get(g, ()))
+        names = self._names[vendor]
+        best, best_sim = None, self.fuzzy_threshold
+        for pos, shared in counts.items():
+            key, size = names[pos]
+            sim = shared / (len(grams) + size - shared)
+            if sim >= best_sim and self._keys[(vendor, "name", key)] != CONFLICT:
+                best, best_sim = key, sim
+        return self._keys[(vendor, "name", best)] if best is not None else None
+
+    def resolve(self, vendor: str, steps: Steps) -> Optional[Dict[str, Any]]:
+        return self.match(vendor, steps)[0]
+
+    def match(self, vendor: str, steps: Steps) -> Tuple[Optional[Dict[str, Any]], bool]:
+        # (record, found by fuzzy name) for the first exact key hit in cascade order, else, for rows
+        # whose only key is a name, the closest name; no record sends the row to the vendor
+        result = "miss"
+        obj = None
+        with self._lock:
+            rid = None
+            for method, key in steps:
+                kind = STRATEGIES[method]
+                rid = self._keys.get((vendor, kind, normalize_entity_key(kind, key))) or None
+                if rid is not None:
+                    result = "hit"
+                    break
+            if rid is None and self.fuzzy_threshold and steps and all(m == "company_by_name" for m, _ in steps):
+                # Rows with an ID or a domain go to the vendor, which can match them precisely
+                rid = self._fuzzy(vendor, normalize_name(steps[0][1]))
+                result = "fuzzy" if rid is not None else result
+            if rid is not None:
+                row = self._db.execute("SELECT payload, updated_at FROM records WHERE rid=?", (rid,)).fetchone()
+                if row and (self.max_age_seconds is None or time.time() - row[1] <= self.max_age_seconds):
+                    obj = json.loads(row[0])
+                else:
+                    result = "stale"
+        metrics.inc("entity_index_lookups_total", vendor=vendor, result=result)
+        return obj, obj is not None and result == "fuzzy"
+
+    def known(self, vendor: str, kind: str, keys: Iterable[str]) -> List[bool]:
+        # Exact key hits that resolve() would answer, read from memory only (no fuzzy names,
+        # no payload reads); for dry runs
+        fresh = None
+        with self._lock:
+            if self.max_age_seconds is not None:
+                fresh = {rid for (rid,) in self._db.execute("SELECT rid FROM records WHERE vendor=? AND updated_at>=?",
+                                                            (vendor, time.time() - self.max_age_seconds))}
+            rids = [self._keys.get((vendor, kind, normalize_entity_key(kind, k))) for k in keys]
+        return [bool(rid) and (fresh is None or rid in fresh) for rid in rids]
+
+    def add(self, vendor: str, obj: Dict[str, Any], steps: Steps, updated_at: Optional[float] = None) -> None:
+        self.add_many(vendor, [(obj, steps)], updated_at)
+
+    def add_many(self, vendor: str, items: Iterable[Tuple[Dict[str, Any], Steps]],
+                 updated_at: Optional[float] = None, replace: bool = True) -> int:
+        # One record per vendor ID (or per first key when the payload has none) and every given
+        # lookup key points at it. replace=False is for sources that cannot tell which key
+        # actually matched: a key already pointing at another record becomes a CONFLICT instead.
+        now = updated_at or time.time()
+        n = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for obj, steps in items:
+                    keys = [(STRATEGIES[m], normalize_entity_key(STRATEGIES[m], k)) for m, k in steps if k]
+                    if obj.get("id") not in (None, ""):
+                        keys.insert(0, ("id", str(obj["id"]).strip()))
+                    keys = [(kind, key) for kind, key in dict.fromkeys(keys) if key]
+                    if not keys:
+                        continue
+                    payload = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+                    rid = (self._keys.get((vendor,) + keys[0]) if replace or keys[0][0] == "id" else None) or None
+                    if rid is None:
+                        rid = self._db.execute("INSERT INTO records (vendor, payload, updated_at) VALUES (?, ?, ?)",
+                                               (vendor, payload, now)).lastrowid
+                    else:
+                        self._db.execute("UPDATE records SET payload=?, updated_at=? WHERE rid=?", (payload, now, rid))
+                    mapped = []
+                    for kind, key in keys:
+                        current = self._keys.get((vendor, kind, key))
+                        if replace or current is None or current == rid:
+                            mapped.append((vendor, kind, key, rid))
+                        elif current != CONFLICT:
+                            mapped.append((vendor, kind, key, CONFLICT))
+                    self._db.executemany("INSERT OR REPLACE INTO keys VALUES (?, ?, ?, ?)", mapped)
+                    for m in mapped:
+                        self._index_key(*m)
+                    n += 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return n
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def _record_from_row(row: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+    # Full payload when the output has <prefix>_json, else its flattened <prefix>_* columns, which
+    # flatten() turns back into the same output columns (projections need the _json column)
+    raw = row.get(f"{prefix}_json")
+    if raw:
+        return json.loads(raw)
+    cut = len(prefix) + 1
+    return {c[cut:]: v for c, v in row.items() if c.startswith(f"{prefix}_") and c[cut:] not in _RESERVED}
+
+def index_outputs(index: EntityIndex, paths: Sequence[str], mapping: Dict[str, Optional[str]],
+                  prefixes: Dict[str, str], chunksize: int = 50_000) -> Dict[str, int]:
+    # Matched rows of earlier enriched outputs (any sink format) into the index; mapped input
+    # columns missing from an output are treated as empty. Outputs do not say which key matched,
+    # so keys seen with more than one record are left unresolved.
+    added = {vendor: 0 for vendor in prefixes}
+    for path in paths:
+        updated_at = os.path.getmtime(path)
+        for df in sinks.read_frames(path, chunksize):
+            keys = lookup_key_frame(df, {k: c if c in df.columns else None for k, c in mapping.items()})
+            for vendor, prefix in prefixes.items():
+                if f"{prefix}_match" not in df.columns:
+                    continue
+                matched = df[f"{prefix}_match"].astype(str) == "True"
+                if not matched.any():
+                    continue
+                cols = [c for c in df.columns if c.startswith(f"{prefix}_")]
+                items = ((_record_from_row(row, prefix), vendor_steps(vendor, k))
+                         for row, k in zip(df.loc[matched, cols].to_dict("records"), iter_lookup_keys(keys[matched])))
+                added[vendor] += index.add_many(vendor, items, updated_at, replace=False)
+    return added
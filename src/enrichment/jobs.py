@@ -0,0 +1,117 @@
+from __future__ import annotations
+import itertools, threading, time, traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+QUEUED, RUNNING, PAUSED, CANCELLED, FAILED, FINISHED = "queued", "running", "paused", "cancelled", "failed", "finished"
+DONE = (CANCELLED, FAILED, FINISHED)
+
+class Job:
+    # One enrichment run on its own thread. The row stream is consumed lazily, so pausing the
+    # consumer also stops the engine from starting new rows once its look-ahead window is full.
+    def __init__(self, job_id: str, make_rows: Callable[[], Iterable[Dict[str, Any]]], total: int,
+                 label: str = "", on_close: Optional[Callable[[], None]] = None):
+        self.id = job_id
+        self.label = label
+        self.total = total
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.rows: List[Dict[str, Any]] = []
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._make_rows = make_rows
+        self._on_close = on_close
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"enrich-job-{job_id}", daemon=True)
+
+    def start(self) -> "Job":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        self.started = time.time()
+        self.status = RUNNING
+        try:
+            for row in self._make_rows():
+                self.rows.append(row)
+                if not self._resume.is_set():
+                    self.status = PAUSED
+                    while not self._resume.wait(0.2) and not self._cancel.is_set():
+                        pass
+                    if not self._cancel.is_set():
+                        self.status = RUNNING
+                if self._cancel.is_set():
+                    self.status = CANCELLED
+                    break
+            else:
+                self.status = FINISHED
+        except Exception:
+            self.status = FAILED
+            self.error = traceback.format_exc(limit=5)
+        finally:
+            self.finished = time.time()
+            if self._on_close is not None:
+                self._on_close()
+
+    def pause(self) -> None:
+        if self.status not in DONE:
+            self._resume.clear()
+
+    @property
+    def pause_requested(self) -> bool:
+        return not self._resume.is_set()
+
+    def resume(self) -> None:
+        self._resume.set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self._resume.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self.status in DONE
+
+    def progress(self) -> Dict[str, Any]:
+        done = len(self.rows)
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        rate = done / elapsed if elapsed else 0.0
+        return {"id": self.id, "label": self.label, "status": self.status, "done": done, "total": self.total,
+                "fraction": done / self.total if self.total else 1.0, "rows_per_sec": round(rate, 2),
+                "eta_seconds": round((self.total - done) / rate, 1) if rate and not self.done else None,
+                "error": self.error}
+
+class JobRegistry:
+    # Shared by every session of one app process; finished jobs beyond keep_finished are dropped oldest first
+    def __init__(self, keep_finished: int = 20):
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def submit(self, make_rows: Callable[[], Iterable[Dict[str, Any]]], total: int, label: str = "",
+               on_close: Optional[Callable[[], None]] = None) -> Job:
+        with self._lock:
+            job = Job(f"{next(self._ids)}-{int(time.time())}", make_rows, total, label, on_close)
+            self._jobs[job.id] = job
+            self._prune()
+        return job.start()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.done]
+        for j in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[j.id]
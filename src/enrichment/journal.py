@@ -0,0 +1,116 @@
+from __future__ import annotations
+import hashlib, json, os, time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+def file_fingerprint(path: str, *extra: Any) -> str:
+    # Content hash of the input plus anything that changes what a finished row looks like
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+class JournalMismatch(RuntimeError):
+    pass
+
+class Journal:
+    # Durable, append-only JSON-lines record of finished rows ({"i": row index, "r": row}).
+    # Appends are buffered and fsynced per batch so the overhead stays small at high throughput.
+    def __init__(self, path: str, fingerprint: str, *, resume: bool = False,
+                 batch_rows: int = 500, batch_seconds: float = 2.0):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.done: Set[int] = set()
+        self.columns: Dict[str, None] = {}
+        self._buf: List[str] = []
+        self._last_flush = time.monotonic()
+        if resume and os.path.exists(path) and self._load():
+            self._f = open(path, "a", encoding="utf-8")
+        else:
+            self._f = open(path, "w", encoding="utf-8")
+            self._f.write(json.dumps({"fingerprint": fingerprint}) + "\n")
+            self._sync()
+
+    def _load(self) -> bool:
+        # False when not even the header made it to disk; the journal is then started over
+        with open(self.path, "rb") as f:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return False
+            header = json.loads(first)
+            if header.get("fingerprint") != self.fingerprint:
+                raise JournalMismatch(f"{self.path} was written for a different input or config; "
+                                      "delete it or run without --resume")
+            good = f.tell()
+            for line in f:
+                # A line without its newline is a torn write even if it parses; the next append
+                # would run on from it
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn write from the crash; dropped below
+                self.done.add(rec["i"])
+                self.columns.update(dict.fromkeys(rec["r"]))
+                good += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(good)
+        return True
+
+    def append(self, index: int, row: Dict[str, Any]) -> None:
+        self.columns.update(dict.fromkeys(row))
+        self._buf.append(json.dumps({"i": index, "r": row}, separators=(",", ":"), default=str))
+        self.done.add(index)
+        if len(self._buf) >= self.batch_rows or time.monotonic() - self._last_flush >= self.batch_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._f.write("\n".join(self._buf) + "\n")
+            self._buf.clear()
+        self._sync()
+
+    def _sync(self) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._f.close()
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        # Finished rows in input order. A plain sequential read unless a resumed run appended
+        # out of order, in which case rows are sorted by offset and read back with seeks.
+        with open(self.path, "rb") as f:
+            f.readline()
+            start = f.tell()
+            last, ordered = -1, True
+            for line in f:
+                i = _index(line)
+                if i < last:
+                    ordered = False
+                    break
+                last = i
+            f.seek(start)
+            if ordered:
+                for line in f:
+                    yield json.loads(line)["r"]
+                return
+            offsets: List[Tuple[int, int]] = []
+            pos = start
+            for line in f:
+                offsets.append((_index(line), pos))
+                pos += len(line)
+            offsets.sort()
+            for _, off in offsets:
+                f.seek(off)
+                yield json.loads(f.readline())["r"]
+
+def _index(line: bytes) -> int:
+    # Records are written as {"i":<index>,"r":{...}}; avoids parsing the row twice
+    return int(line[5:line.index(b",", 5)])
@@ -1,68 +1,236 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional, List
+import asyncio, json, time
+from concurrent.futures import Executor
+from typing import Dict, Any, Optional, List, Sequence, Tuple
 import pandas as pd
+from enrichment.cache import NOT_FOUND
+from enrichment.clients.transport import TRANSIENT_ERRORS
+from enrichment.metrics import REGISTRY as metrics, STRATEGIES
 from enrichment.utils import sanitize_domain, flatten
 
-def do_enrich_row(row: pd.Series,
-                  mapping_in: Dict[str, Optional[str]],
-                  vendors: Dict[str, Any],
-                  cfg: Dict[str, Any]) -> Dict[str, Any]:
-    out: Dict[str, Any] = {}
+Result = Tuple[Optional[Dict[str, Any]], Optional[str]]
+FUZZY_MATCH = "fuzzy name match"  # second element of a match the entity index found by name similarity only
+Steps = List[Tuple[str, str]]
 
-    if cfg.get("include_input_columns", True):
-        for c in row.index:
-            out[c] = row[c]
+def zoominfo_steps(zi_id: str, domain: str, name: str) -> Steps:
+    # ZoomInfo: ID -> domain -> name
+    return [(m, k) for m, k in (("company_by_id", zi_id), ("company_by_domain", domain), ("company_by_name", name)) if k]
+
+def apollo_steps(apollo_id: str, sf_id: str, domain: str, name: str) -> Steps:
+    # Apollo: Apollo ID -> Salesforce ID -> domain -> name
+    return [(m, k) for m, k in (("company_by_id", apollo_id), ("company_by_salesforce_id", sf_id),
+                                ("company_by_domain", domain), ("company_by_name", name)) if k]
+
+def vendor_steps(vendor: str, keys: LookupKeys) -> Steps:
+    zi_id, apollo_id, sf_id, name, domain = keys
+    return zoominfo_steps(zi_id, domain, name) if vendor == "zoominfo" else apollo_steps(apollo_id, sf_id, domain, name)
+
+def _record_step(vendor: str, method: str, result: Result, seconds: float, planner=None) -> None:
+    obj, err = result
+    outcome = "match" if obj is not None else "not_found" if err == NOT_FOUND else "error"
+    strategy = STRATEGIES.get(method, method)
+    metrics.observe("strategy_seconds", seconds, vendor=vendor, strategy=strategy)
+    metrics.inc("strategy_results_total", vendor=vendor, strategy=strategy, outcome=outcome)
+    if planner is not None:
+        planner.record(vendor, method, result, seconds, definitive=outcome != "error")
+
+def _record_cascade(vendor: str, winner: Optional[str]) -> None:
+    # Which strategy produced the vendor's match for a row ("none" when nothing matched)
+    metrics.inc("matched_by_total", vendor=vendor, strategy=STRATEGIES.get(winner, "none"))
+
+def _from_index(entities, vendor: str, steps: Steps) -> Optional[Result]:
+    # entities (enrichment.entities.EntityIndex) answers rows seen in earlier runs without a vendor call
+    if entities is None or not steps:
+        return None
+    obj, fuzzy = entities.match(vendor, steps)
+    if obj is None:
+        return None
+    metrics.inc("matched_by_total", vendor=vendor, strategy="entity_index")
+    return obj, FUZZY_MATCH if fuzzy else None
+
+def _learn(entities, vendor: str, steps: Steps, obj: Optional[Dict[str, Any]], won: int) -> None:
+    # The winning key and the ones the cascade never reached point at the match; keys that
+    # came back not found or failed do not
+    if obj is not None and entities is not None and entities.learn:
+        entities.add(vendor, obj, steps[won:])
+
+def _timed(client, method: str, key: str, retries: int) -> Tuple[Result, float]:
+    started = time.perf_counter()
+    result = getattr(client, method)(key, retries=retries)
+    return result, time.perf_counter() - started
+
+def run_cascade(client, steps: Steps, retries: int, planner=None, entities=None, defer: bool = False) -> Result:
+    # planner (enrichment.planner.CascadePlanner) may drop low-yield steps, reorder them,
+    # and start the second step alongside the first. defer: stop at a step that failed
+    # transiently rather than fall back, so a later pass can still match by the better key.
+    vendor = getattr(client, "vendor", "")
+    hit = _from_index(entities, vendor, steps)
+    if hit is not None:
+        return hit
+    if planner is not None:
+        steps = planner.plan(vendor, steps)
+    ahead = None
+    if planner is not None and planner.parallel_top and len(steps) > 1:
+        ahead = planner.executor().submit(_timed, client, steps[1][0], steps[1][1], retries)
+    obj, err, winner, transient = None, None, None, None
+    reached = 0
+    for reached, (method, key) in enumerate(steps):
+        if reached == 1 and ahead is not None:
+            result, seconds = ahead.result()
+        else:
+            result, seconds = _timed(client, method, key, retries)
+        _record_step(vendor, method, result, seconds, planner)
+        obj, err = result
+        if obj is not None:
+            winner = method
+            _learn(entities, vendor, steps, obj, reached)
+            break
+        transient = transient or (err if err in TRANSIENT_ERRORS else None)
+        if defer and transient:
+            break
+    if ahead is not None and reached == 0:
+        # Still counts toward the second strategy's yield and cost
+        ahead.add_done_callback(lambda f: _record_step(vendor, steps[1][0], *f.result(), planner))
+    if not (defer and transient):
+        _record_cascade(vendor, winner)  # a deferred row is counted on its final pass
+    # A step that could not be answered outranks a later "not found": the row is not a known miss
+    return obj, (transient or err) if obj is None else err
+
+def zoominfo_chain(zc, zi_id: str, domain: str, name: str, retries: int, planner=None, entities=None) -> Result:
+    return run_cascade(zc, zoominfo_steps(zi_id, domain, name), retries, planner, entities)
+
+def apollo_chain(ac, apollo_id: str, sf_id: str, domain: str, name: str, retries: int, planner=None,
+                 entities=None) -> Result:
+    return run_cascade(ac, apollo_steps(apollo_id, sf_id, domain, name), retries, planner, entities)
 
-    # Extract fields
+async def run_cascade_async(client, steps: Steps, retries: int, speculative: bool = False, planner=None,
+                            entities=None, defer: bool = False) -> Result:
+    vendor = getattr(client, "vendor", "")
+    hit = _from_index(entities, vendor, steps)
+    if hit is not None:
+        return hit
+    if planner is not None:
+        steps = planner.plan(vendor, steps)
+    # Steps in flight at once: one (plain cascade), the top two (planner.parallel_top) or all
+    # (speculative). The first match in priority order wins and the lower-priority lookups
+    # still running are cancelled.
+    window = len(steps) if speculative else 2 if planner is not None and planner.parallel_top else 1
+    tasks: List[asyncio.Future] = []
+    started: List[float] = []
+    obj, err, winner, transient = None, None, None, None
+    try:
+        for i, (method, _) in enumerate(steps):
+            while len(tasks) < min(len(steps), i + window):
+                m, k = steps[len(tasks)]
+                started.append(time.perf_counter())
+                tasks.append(asyncio.ensure_future(getattr(client, m)(k, retries=retries)))
+            obj, err = await tasks[i]
+            _record_step(vendor, method, (obj, err), time.perf_counter() - started[i], planner)
+            if obj is not None:
+                winner = method
+                _learn(entities, vendor, steps, obj, i)
+                break
+            transient = transient or (err if err in TRANSIENT_ERRORS else None)
+            if defer and transient:
+                break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    if not (defer and transient):
+        _record_cascade(vendor, winner)
+    return obj, (transient or err) if obj is None else err
+
+LookupKeys = Tuple[str, str, str, str, str]
+
+def lookup_keys(row: pd.Series, mapping_in: Dict[str, Optional[str]]) -> LookupKeys:
+    # (zoominfo_id, apollo_id, salesforce_id, name, domain), normalized as the cascade uses them
     zi_id = str(row[mapping_in.get("zoominfo_id")]).strip() if mapping_in.get("zoominfo_id") else ""
     apollo_id = str(row[mapping_in.get("apollo_id")]).strip() if mapping_in.get("apollo_id") else ""
     sf_id = str(row[mapping_in.get("salesforce_id")]).strip() if mapping_in.get("salesforce_id") else ""
     name = str(row[mapping_in.get("name")]).strip() if mapping_in.get("name") else ""
     website = str(row[mapping_in.get("website")]).strip() if mapping_in.get("website") else ""
-    domain = sanitize_domain(website)
+    return zi_id, apollo_id, sf_id, name, sanitize_domain(website)
 
-    zc = vendors["zoominfo"]
-    ac = vendors["apollo"]
+VENDORS = ("zoominfo", "apollo")
 
-    prefix_zi = cfg.get("prefix_zoominfo", "zi")
-    prefix_ap = cfg.get("prefix_apollo", "ap")
+def vendor_results(keys: LookupKeys,
+                   vendors: Dict[str, Any],
+                   cfg: Dict[str, Any],
+                   pool: Optional[Executor] = None,
+                   only: Sequence[str] = VENDORS) -> Dict[str, Result]:
+    # Cascade result per vendor in `only`; with a pool, the others run alongside the first
     retries = cfg.get("max_attempts", 5)
+    planner = cfg.get("planner")
+    entities = cfg.get("entities")
+    defer = cfg.get("retry") is not None
 
-    zi_obj, zi_err = None, None
-    ap_obj, ap_err = None, None
+    def run(vendor: str) -> Result:
+        return run_cascade(vendors[vendor], vendor_steps(vendor, keys), retries, planner, entities, defer)
 
-    # ZoomInfo: ID -> domain -> name
-    if zi_id:
-        zi_obj, zi_err = zc.company_by_id(zi_id, retries=retries)
-    if zi_obj is None and domain:
-        zi_obj, zi_err = zc.company_by_domain(domain, retries=retries)
-    if zi_obj is None and name:
-        zi_obj, zi_err = zc.company_by_name(name, retries=retries)
+    ahead = {v: pool.submit(run, v) for v in only[1:]} if pool is not None else {}
+    return {v: ahead[v].result() if v in ahead else run(v) for v in only}
 
-    # Apollo: Apollo ID -> Salesforce ID -> domain -> name
-    if apollo_id:
-        ap_obj, ap_err = ac.company_by_id(apollo_id, retries=retries)
-    if ap_obj is None and sf_id:
-        ap_obj, ap_err = ac.company_by_salesforce_id(sf_id, retries=retries)
-    if ap_obj is None and domain:
-        ap_obj, ap_err = ac.company_by_domain(domain, retries=retries)
-    if ap_obj is None and name:
-        ap_obj, ap_err = ac.company_by_name(name, retries=retries)
-
-    if zi_obj:
-        out[f"{prefix_zi}_match"] = True
-        out[f"{prefix_zi}_error"] = ""
-        out.update(flatten(prefix_zi, zi_obj))
-    else:
-        out[f"{prefix_zi}_match"] = False
-        out[f"{prefix_zi}_error"] = zi_err or "not_found"
-
-    if ap_obj:
-        out[f"{prefix_ap}_match"] = True
-        out[f"{prefix_ap}_error"] = ""
-        out.update(flatten(prefix_ap, ap_obj))
-    else:
-        out[f"{prefix_ap}_match"] = False
-        out[f"{prefix_ap}_error"] = ap_err or "not_found"
+async def vendor_results_async(keys: LookupKeys,
+                               vendors: Dict[str, Any],
+                               cfg: Dict[str, Any],
+                               only: Sequence[str] = VENDORS) -> Dict[str, Result]:
+    retries = cfg.get("max_attempts", 5)
+    speculative = cfg.get("speculative_fallbacks", False)
+    planner = cfg.get("planner")
+    entities = cfg.get("entities")
+    defer = cfg.get("retry") is not None
+    results = await asyncio.gather(*(run_cascade_async(vendors[v], vendor_steps(v, keys), retries, speculative,
+                                                       planner, entities, defer) for v in only))
+    return dict(zip(only, results))
+
+def enrich_keys(keys: LookupKeys,
+                vendors: Dict[str, Any],
+                cfg: Dict[str, Any],
+                pool: Optional[Executor] = None) -> Dict[str, Any]:
+    # Vendor columns only; callers attach the input columns. With a pool, the Apollo cascade
+    # runs alongside the ZoomInfo one.
+    results = vendor_results(keys, vendors, cfg, pool)
+    return vendor_columns(results["zoominfo"], results["apollo"], cfg)
+
+async def enrich_keys_async(keys: LookupKeys,
+                            vendors: Dict[str, Any],
+                            cfg: Dict[str, Any]) -> Dict[str, Any]:
+    # Same cascade as enrich_keys over async clients; both vendors run concurrently
+    results = await vendor_results_async(keys, vendors, cfg)
+    return vendor_columns(results["zoominfo"], results["apollo"], cfg)
+
+def vendor_columns(zi: Result, ap: Result, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    projections = cfg.get("projections") or {}
+    add_json = cfg.get("add_vendor_json_columns", False)
+    fuzzy = bool(getattr(cfg.get("entities"), "fuzzy_threshold", None))
+    for vendor, prefix, (obj, err) in (("zoominfo", cfg.get("prefix_zoominfo", "zi"), zi),
+                                       ("apollo", cfg.get("prefix_apollo", "ap"), ap)):
+        if obj:
+            out[f"{prefix}_match"] = True
+            out[f"{prefix}_error"] = ""
+            out.update((projections.get(vendor) or flatten)(prefix, obj))
+            if add_json:
+                # Full payload, compact, in one column next to the projected fields
+                out[f"{prefix}_json"] = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+        else:
+            out[f"{prefix}_match"] = False
+            out[f"{prefix}_error"] = err or "not_found"
+        if fuzzy:
+            out[f"{prefix}_fuzzy_match"] = bool(obj) and err == FUZZY_MATCH
+    return out
+
+def do_enrich_row(row: pd.Series,
+                  mapping_in: Dict[str, Optional[str]],
+                  vendors: Dict[str, Any],
+                  cfg: Dict[str, Any],
+                  pool: Optional[Executor] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+
+    if cfg.get("include_input_columns", True):
+        for c in row.index:
+            out[c] = row[c]
 
+    out.update(enrich_keys(lookup_keys(row, mapping_in), vendors, cfg, pool))
     return out
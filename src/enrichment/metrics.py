@@ -0,0 +1,143 @@
+from __future__ import annotations
+import bisect, threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; roughly log-spaced from cache-hit to slow-retry territory
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Registry:
+    # Process-wide counters, gauges and latency histograms, keyed by metric name and label set.
+    # One lock around plain dict updates: cheap next to an HTTP round trip.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[k] = value
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        k = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[k] = series.get(k, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        k = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            h = series.get(k)
+            if h is None:
+                h = series[k] = Histogram()
+            h.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    def value(self, name: str, **labels: Any) -> float:
+        with self._lock:
+            series = self._counters.get(name) or self._gauges.get(name) or {}
+            return series.get(_key(labels), 0)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {n: [dict(labels=dict(k), value=round(v, 6)) for k, v in sorted(s.items())]
+                        for n, s in sorted(self._counters.items())}
+            histograms = {n: [dict(labels=dict(k), count=h.count, sum=round(h.sum, 6),
+                                   p50=_round(h.quantile(0.5)), p90=_round(h.quantile(0.9)),
+                                   p99=_round(h.quantile(0.99)))
+                              for k, h in sorted(s.items())]
+                          for n, s in sorted(self._histograms.items())}
+            gauges = {n: [dict(labels=dict(k), value=round(v, 6)) for k, v in sorted(s.items())]
+                      for n, s in sorted(self._gauges.items())}
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def to_prometheus(self, prefix: str = "enrichment_") -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for k, v in sorted(series.items()):
+                    lines.append(f"{prefix}{name}{_labels(k)} {v:g}")
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {prefix}{name} gauge")
+                for k, v in sorted(series.items()):
+                    lines.append(f"{prefix}{name}{_labels(k)} {v:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for k, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += c
+                        le = bound if isinstance(bound, str) else f"{bound:g}"
+                        lines.append(f"{prefix}{name}_bucket{_labels(k + (('le', le),))} {cumulative}")
+                    lines.append(f"{prefix}{name}_sum{_labels(k)} {h.sum:g}")
+                    lines.append(f"{prefix}{name}_count{_labels(k)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v, 6)
+
+def _labels(k: LabelKey) -> str:
+    if not k:
+        return ""
+    inner = ",".join('{}="{}"'.format(n, v.replace("\\", "\\\\").replace('"', '\\"')) for n, v in k)
+    return "{" + inner + "}"
+
+REGISTRY = Registry()
+
+# Cascade strategy per client method, as reported in the metrics
+STRATEGIES = {"company_by_id": "id", "company_by_salesforce_id": "salesforce_id",
+              "company_by_domain": "domain", "company_by_name": "name"}
+
+def strategy_table(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Per vendor and strategy: calls, matches, p50/p99 seconds; for the Streamlit panel and CLI report
+    rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for s in summary["counters"].get("strategy_results_total", []):
+        r = rows.setdefault((s["labels"]["vendor"], s["labels"]["strategy"]),
+                            {"vendor": s["labels"]["vendor"], "strategy": s["labels"]["strategy"],
+                             "calls": 0, "match": 0, "not_found": 0, "error": 0})
+        r["calls"] += s["value"]
+        r[s["labels"]["outcome"]] += s["value"]
+    for s in summary["histograms"].get("strategy_seconds", []):
+        r = rows.get((s["labels"]["vendor"], s["labels"]["strategy"]))
+        if r is not None:
+            r["p50_s"], r["p99_s"] = s["p50"], s["p99"]
+    return [rows[k] for k in sorted(rows)]
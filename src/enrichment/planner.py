@@ -0,0 +1,126 @@
+from __future__ import annotations
+import json, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from enrichment.metrics import REGISTRY as metrics, STRATEGIES
+
+Steps = List[Tuple[str, str]]
+
+class StrategyStats:
+    __slots__ = ("attempts", "hits", "seconds", "calls")
+
+    def __init__(self, attempts: float = 0, hits: float = 0, seconds: float = 0.0, calls: float = 0):
+        self.attempts = attempts  # definitive outcomes (match or not found)
+        self.hits = hits
+        self.seconds = seconds    # wall time over every call, retries included
+        self.calls = calls
+
+    @property
+    def yield_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 1.0
+
+    @property
+    def cost(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+class CascadePlanner:
+    # Learns hit rate and cost per (vendor, strategy) as the run goes and rewrites each row's
+    # cascade: strategies yielding below min_yield after min_samples are skipped (one in
+    # explore_every rows still tries them so the estimate can recover), optionally the rest
+    # are reordered by hits per second, and optionally the top two run at the same time.
+    def __init__(self, *, min_yield: float = 0.02, min_samples: int = 200, explore_every: int = 100,
+                 reorder: bool = False, parallel_top: bool = False, state_path: Optional[str] = None,
+                 max_history: int = 5000):
+        self.min_yield = min_yield
+        self.min_samples = min_samples
+        self.explore_every = max(1, explore_every)
+        self.reorder = reorder
+        self.parallel_top = parallel_top
+        self.state_path = state_path
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], StrategyStats] = {}
+        self._plans = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if state_path and os.path.exists(state_path):
+            self.load(state_path)
+
+    def record(self, vendor: str, method: str, result: Tuple[Optional[Dict[str, Any]], Optional[str]],
+               seconds: float, definitive: bool) -> None:
+        with self._lock:
+            s = self._stats.setdefault((vendor, method), StrategyStats())
+            s.calls += 1
+            s.seconds += seconds
+            if definitive:
+                s.attempts += 1
+                s.hits += result[0] is not None
+
+    def _low_yield(self, s: StrategyStats) -> bool:
+        return s.attempts >= self.min_samples and s.yield_rate < self.min_yield
+
+    def stats(self, vendor: str, method: str) -> Optional[StrategyStats]:
+        with self._lock:
+            return self._stats.get((vendor, method))
+
+    def skips(self, vendor: str, method: str) -> bool:
+        # Whether plan() currently leaves the strategy out (bar the exploring rows)
+        s = self.stats(vendor, method)
+        return s is not None and self._low_yield(s)
+
+    def plan(self, vendor: str, steps: Steps) -> Steps:
+        if len(steps) <= 1:
+            return steps
+        with self._lock:
+            self._plans += 1
+            explore = self._plans % self.explore_every == 0
+            stats = [self._stats.get((vendor, m)) or StrategyStats() for m, _ in steps]
+        kept = [(step, s) for step, s in zip(steps, stats) if explore or not self._low_yield(s)]
+        for (m, _), s in zip(steps, stats):
+            if not explore and self._low_yield(s):
+                metrics.inc("strategy_skipped_total", vendor=vendor, strategy=STRATEGIES.get(m, m))
+        if not kept:
+            kept = [(steps[0], stats[0])]  # a row with keys always gets at least one lookup
+        if self.reorder and all(s.calls >= self.min_samples and s.cost for _, s in kept):
+            # Most hits per second of lookup first, once every remaining strategy has an estimate
+            kept.sort(key=lambda p: -p[1].yield_rate / p[1].cost)
+        return [step for step, _ in kept]
+
+    def executor(self) -> ThreadPoolExecutor:
+        # Private pool for the second of the top-two steps; it never submits further work
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="enrich-step")
+            return self._pool
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"vendor": v, "strategy": STRATEGIES.get(m, m), "method": m, "attempts": s.attempts,
+                     "hits": s.hits, "yield": round(s.yield_rate, 4), "avg_seconds": round(s.cost, 4),
+                     "calls": s.calls, "seconds": round(s.seconds, 3)}
+                    for (v, m), s in sorted(self._stats.items())]
+
+    def load(self, path: str) -> None:
+        # Earlier runs are scaled down to max_history samples so this run can still move the estimate
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            for rec in data.get("strategies", []):
+                scale = min(1.0, self.max_history / rec["calls"]) if rec["calls"] else 1.0
+                self._stats[(rec["vendor"], rec["method"])] = StrategyStats(
+                    rec["attempts"] * scale, rec["hits"] * scale, rec["seconds"] * scale, rec["calls"] * scale)
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.state_path
+        if not path:
+            return
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"strategies": self.snapshot()}, f, indent=2)
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        self.save()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+from typing import Dict, Iterator, Optional
+import pandas as pd
+from enrichment.logic import LookupKeys
+
+KEY_COLUMNS = ("zoominfo_id", "apollo_id", "salesforce_id", "name", "domain")
+
+def sanitize_domains(websites: pd.Series) -> pd.Series:
+    # Column-wide equivalent of utils.sanitize_domain
+    # Regex replaces only: they run natively on Arrow-backed strings, where extract/split go row by row
+    s = websites.fillna("").astype(str).str.strip()
+    has_scheme = s.str.startswith("http://") | s.str.startswith("https://")
+    netloc = s.str.replace(r"(?s)^https?://([^/?#]*).*", r"\1", regex=True)
+    host = netloc.where(has_scheme, s.str.replace(r"(?s)/.*", "", regex=True))
+    return host.str.lower().str.replace(r"^www\.", "", regex=True)
+
+def _column(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    if not col:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].astype(str).str.strip()
+
+def lookup_key_frame(df: pd.DataFrame, mapping_in: Dict[str, Optional[str]]) -> pd.DataFrame:
+    # Normalized lookup keys for a whole chunk, column by column (see logic.lookup_keys)
+    return pd.DataFrame({
+        "zoominfo_id": _column(df, mapping_in.get("zoominfo_id")),
+        "apollo_id": _column(df, mapping_in.get("apollo_id")),
+        "salesforce_id": _column(df, mapping_in.get("salesforce_id")),
+        "name": _column(df, mapping_in.get("name")),
+        "domain": sanitize_domains(_column(df, mapping_in.get("website"))),
+    }, index=df.index)
+
+def iter_lookup_keys(keys: pd.DataFrame) -> Iterator[LookupKeys]:
+    return zip(*(keys[c].tolist() for c in KEY_COLUMNS))
@@ -0,0 +1,68 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Sequence
+
+Projector = Callable[[str, Any], Dict[str, Any]]
+_ALL = object()  # trie marker: keep the whole subtree under this node
+
+def _walk(out: Dict[str, Any], base: str, val: Any, node: Any, max_list_items: Optional[int]) -> None:
+    if isinstance(val, list):
+        # Lists are transparent to field paths: "industries.name" matches every element
+        items = val if max_list_items is None else val[:max_list_items]
+        for i, v in enumerate(items):
+            _walk(out, f"{base}_{i}", v, node, max_list_items)
+    elif node is _ALL:
+        if isinstance(val, dict):
+            for k, v in val.items():
+                _walk(out, f"{base}_{k}".replace(".", "_"), v, _ALL, max_list_items)
+        else:
+            out[base] = val
+    elif isinstance(val, dict):
+        for k, child in node.items():
+            if k in val:
+                _walk(out, f"{base}_{k}", val[k], child, max_list_items)
+
+def _trie(paths: Sequence[str]) -> Any:
+    trie: Dict[str, Any] = {}
+    for path in paths:
+        node = trie
+        parts = [p for p in str(path).split(".") if p]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = _ALL
+            else:
+                child = node.get(part)
+                if child is _ALL:
+                    break
+                node = node.setdefault(part, {})
+    return trie if trie else _ALL
+
+def _prune(val: Any, node: Any) -> Any:
+    if node is _ALL:
+        return val
+    if isinstance(val, list):
+        return [_prune(v, node) for v in val]
+    if isinstance(val, dict):
+        return {k: _prune(val[k], child) for k, child in node.items() if k in val}
+    return val
+
+def compile_pruner(paths: Sequence[str], keep: Sequence[str] = ("id",)) -> Callable[[Any], Any]:
+    # Payload with only the branches compile_projection(paths) reads (plus keep), in the same
+    # shape, so the rest can be dropped as soon as a response is decoded
+    root = _trie(list(paths) + list(keep)) if paths else _ALL
+
+    def prune(obj: Any) -> Any:
+        return (_prune(obj, root) or obj) if isinstance(obj, dict) else obj
+
+    return prune
+
+def compile_projection(paths: Sequence[str], max_list_items: Optional[int] = None) -> Projector:
+    # Compiles dotted field paths ("name", "address.city", "industries") into a trie so a payload
+    # is walked once and only along requested branches. Output keys match utils.flatten.
+    root = _trie(paths)
+
+    def project(prefix: str, obj: Any) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        _walk(out, prefix, obj, root, max_list_items)
+        return out
+
+    return project
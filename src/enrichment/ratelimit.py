@@ -0,0 +1,324 @@
+from __future__ import annotations
+import asyncio, threading, time
+from collections import deque
+from enrichment.metrics import REGISTRY as metrics
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+class TokenBucket:
+    # Reservation-style bucket: callers take a token (possibly going into debt) under a short
+    # lock and then sleep outside of it, so the same instance serves threads and event loops.
+    paces_retries = False  # True: retryable responses slow the lane instead of sleeping the row
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.set_rate(per_minute, burst)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+
+    def set_rate(self, per_minute: float, burst: Optional[float] = None) -> None:
+        with self._lock:
+            self.per_minute = float(per_minute)
+            self.rate = self.per_minute / 60.0
+            self.capacity = float(burst) if burst else max(1.0, self.rate)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if self.rate <= 0:
+                # Unlimited lane, but a Retry-After / rate-limit pause still holds it
+                return max(0.0, self._blocked_until - now)
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    async def acquire_async(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return max(wait, 0.0)
+
+    def release(self, status: Optional[int], seconds: float) -> None:
+        # Called once per attempt after acquire(); status is None on a network error
+        # and 0 when the call was abandoned (e.g. a cancelled speculative lookup)
+        pass
+
+    def paces(self, status: int) -> bool:
+        # Whether the lane itself delays the retry of this response (after observe()); when it
+        # cannot, e.g. an unlimited lane without a Retry-After, the caller backs off instead
+        if not (status == 429 or self.paces_retries):
+            return False
+        with self._lock:
+            return self.rate > 0 or self._blocked_until > time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        # Holds the whole lane, e.g. for a Retry-After window
+        if seconds <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self._stamp = now
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            self.pause(retry_after)
+        elif status == 429 and self.rate > 0:
+            self.pause(1.0 / self.rate)
+
+        remaining = _first_number(headers, ("X-RateLimit-Remaining", "RateLimit-Remaining", "x-minute-requests-left"))
+        if remaining is None:
+            return
+        if remaining <= 0:
+            reset = _first_number(headers, ("X-RateLimit-Reset", "RateLimit-Reset"))
+            if reset is not None:
+                # Either delta-seconds or an epoch timestamp
+                self.pause(reset - time.time() if reset > 1e9 else reset)
+        with self._lock:
+            self._tokens = min(self._tokens, float(remaining))
+
+class AdaptiveLimiter(TokenBucket):
+    # AIMD controller for one vendor lane: the request rate and the number of calls in flight
+    # grow additively after each healthy round and shrink multiplicatively on 429/503 or when
+    # latency climbs well above its best-seen level, so the lane settles just under the quota.
+    paces_retries = True
+
+    def __init__(self, per_minute: float, *, name: str = "", min_per_minute: float = 5.0,
+                 max_per_minute: Optional[float] = None, concurrency: int = 4, max_concurrency: int = 50,
+                 increase_per_minute: Optional[float] = None, decrease: float = 0.5,
+                 latency_decrease: float = 0.8, latency_tolerance: float = 2.0, latency_slack: float = 0.05, cooldown: float = 2.0):
+        super().__init__(per_minute)
+        self.name = name
+        self.min_per_minute = min(min_per_minute, per_minute)
+        self.max_per_minute = max_per_minute or per_minute * 10
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = max(1, min(concurrency, self.max_concurrency))
+        self.increase_per_minute = increase_per_minute or max(1.0, per_minute * 0.1)
+        self.decrease = decrease
+        self.latency_decrease = latency_decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack  # seconds; ignores jitter on very fast endpoints
+        self.cooldown = cooldown
+        self._slots = threading.Condition(threading.Lock())
+        self._in_flight = 0
+        self._async_waiters: deque = deque()  # futures of coroutines waiting for a slot, woken via their loop
+        self._aimd = threading.Lock()
+        self._healthy = 0
+        self._ewma: Optional[float] = None
+        self._samples = 0
+        self._best: Optional[float] = None
+        self._last_cut = 0.0
+        self._publish()
+
+    def acquire(self) -> float:
+        started = time.monotonic()
+        with self._slots:
+            while self._in_flight >= self.limit:
+                self._slots.wait()
+            self._in_flight += 1
+        try:
+            return (time.monotonic() - started) + super().acquire()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    async def acquire_async(self) -> float:
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._slots:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                with self._slots:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+                    else:
+                        self._wake_async(1)  # hand the wakeup it was given to the next waiter
+                raise
+        try:
+            return (time.monotonic() - started) + await super().acquire_async()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _wake_async(self, n: int) -> None:
+        # Under _slots; a woken coroutine re-checks the limit, so a spare wakeup only costs one retry
+        while n > 0 and self._async_waiters:
+            waiter = self._async_waiters.popleft()
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # its loop is closed
+                continue
+            n -= 1
+
+    def _free_slot(self) -> None:
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify()
+            self._wake_async(1)
+
+    def release(self, status: Optional[int], seconds: float) -> None:
+        self._free_slot()
+        if status == 0:
+            return
+        if status in (429, 503):
+            self._cut(self.decrease, str(status))
+            self.pause(1.0 / self.rate if self.rate > 0 else 0.0)
+        elif status is None or status >= 500:
+            self._cut(self.decrease, "error")
+        elif self._latency_rising(seconds):
+            self._cut(self.latency_decrease, "latency")
+        else:
+            self._grow()
+
+    def _latency_rising(self, seconds: float) -> bool:
+        with self._aimd:
+            self._ewma = seconds if self._ewma is None else 0.8 * self._ewma + 0.2 * seconds
+            self._samples += 1
+            if self._samples < 10:
+                return False
+            if self._best is None or self._ewma < self._best:
+                self._best = self._ewma
+            return self._ewma > max(self._best * self.latency_tolerance, self._best + self.latency_slack)
+
+    def _grow(self) -> None:
+        # One additive step per round, i.e. once `limit` healthy calls have completed
+        with self._aimd:
+            self._healthy += 1
+            if self._healthy < self.limit:
+                return
+            self._healthy = 0
+            per_minute = min(self.max_per_minute, self.per_minute + self.increase_per_minute)
+            limit = min(self.max_concurrency, self.limit + 1)
+        self._apply(per_minute, limit)
+
+    def _cut(self, factor: float, reason: str) -> None:
+        # At most one cut per cooldown: a burst of 429s from calls already in flight is one signal
+        now = time.monotonic()
+        with self._aimd:
+            if now - self._last_cut < self.cooldown:
+                return
+            self._last_cut = now
+            self._healthy = 0
+            if reason == "latency":
+                self._ewma = self._best
+            per_minute = max(self.min_per_minute, self.per_minute * factor)
+            limit = max(1, int(self.limit * factor))
+        metrics.inc("adaptive_decreases_total", vendor=self.name, reason=reason)
+        self._apply(per_minute, limit)
+
+    def _apply(self, per_minute: float, limit: int) -> None:
+        self.set_rate(per_minute)
+        with self._slots:
+            grew = limit > self.limit
+            self.limit = limit
+            if grew:
+                self._slots.notify_all()
+                self._wake_async(len(self._async_waiters))
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set("adaptive_rate_per_min", self.per_minute, vendor=self.name)
+        metrics.set("adaptive_concurrency", self.limit, vendor=self.name)
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _first_number(headers: Mapping[str, str], names) -> Optional[float]:
+    for n in names:
+        v = headers.get(n)
+        if v is None:
+            continue
+        try:
+            return float(v)
+        except ValueError:
+            continue
+    return None
+
+class CircuitBreaker:
+    # Per-vendor fail-fast switch: after `failures` consecutive 5xx responses or network errors the
+    # circuit opens and calls are refused for reset_seconds; then one probe call is let through,
+    # which closes it on success and reopens it on failure. 429s mean the vendor is up and do not count.
+    def __init__(self, name: str = "", failures: int = 10, reset_seconds: float = 30.0):
+        self.name = name
+        self.failures = max(1, int(failures))
+        self.reset_seconds = float(reset_seconds)
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._count = 0
+        self._opened_at = 0.0
+        self._probe_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at >= self.reset_seconds:
+                self._set("half_open")
+            # A probe that never reported back (e.g. cancelled) is replaced after reset_seconds
+            if self._state == "half_open" and (self._probe_at is None or now - self._probe_at >= self.reset_seconds):
+                self._probe_at = now
+                return True
+        metrics.inc("circuit_rejected_total", vendor=self.name)
+        return False
+
+    def record(self, status: Optional[int]) -> None:
+        # status is None on a network error and 0 when the call was abandoned
+        if status == 0:
+            return
+        failed = status is None or status >= 500
+        with self._lock:
+            if not failed:
+                self._count = 0
+                if self._state != "closed":
+                    self._set("closed")
+                return
+            self._count += 1
+            if self._state == "half_open" or (self._state == "closed" and self._count >= self.failures):
+                self._opened_at = time.monotonic()
+                metrics.inc("circuit_opened_total", vendor=self.name)
+                self._set("open")
+
+    def _set(self, state: str) -> None:
+        self._state = state
+        self._probe_at = None
+        metrics.set("circuit_open", 0 if state == "closed" else 1, vendor=self.name)
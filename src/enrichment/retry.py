@@ -0,0 +1,138 @@
+from __future__ import annotations
+import asyncio, heapq, itertools, threading, time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from enrichment.clients.transport import CIRCUIT_OPEN, TRANSIENT_ERRORS, jittered_backoff
+from enrichment.logic import VENDORS, LookupKeys, Result, vendor_columns, vendor_results, vendor_results_async
+from enrichment.metrics import REGISTRY as metrics
+
+BUDGET_COLUMN = "retry_budget_exhausted"
+
+class _Row:
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.done: Dict[str, Result] = {}
+        self.last: Dict[str, Result] = {}
+        self.attempts = {v: 0 for v in VENDORS}
+        self.exhausted = False
+
+    def todo(self) -> Tuple[str, ...]:
+        return tuple(v for v in VENDORS if v not in self.done)
+
+class DeferredRetries:
+    # Rows whose lookups failed transiently (retries exhausted inline, or the vendor's circuit is
+    # open) are parked on a time-ordered queue instead of sleeping in a worker, and a scheduler
+    # thread re-runs just the failed vendors when they are due. Each row gets max_attempts passes
+    # per vendor within budget_seconds of its first one; rows that run out keep their last error
+    # and are flagged in retry_budget_exhausted.
+    def __init__(self, *, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 budget_seconds: float = 600.0, circuit_delay: float = 30.0, max_waiting: int = 10_000):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.circuit_delay = circuit_delay
+        self.max_waiting = max_waiting
+        self.waiting = 0  # rows parked right now
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _settle(self, row: _Row, results: Dict[str, Result]) -> Optional[float]:
+        # Seconds until the row's next pass, or None once every vendor has a final result
+        delay = 0.0
+        for vendor, result in results.items():
+            err = result[1]
+            if result[0] is not None or err not in TRANSIENT_ERRORS:
+                row.done[vendor] = result
+                continue
+            if err == CIRCUIT_OPEN:
+                # Refused without a call: wait out the circuit, without spending an attempt
+                delay = max(delay, self.circuit_delay)
+            else:
+                row.attempts[vendor] += 1
+                if row.attempts[vendor] >= self.max_attempts:
+                    row.done[vendor] = result
+                    row.exhausted = True
+                    continue
+                delay = max(delay, jittered_backoff(row.attempts[vendor], self.base_delay, self.max_delay))
+            metrics.inc("retry_deferred_total", vendor=vendor)
+            row.last[vendor] = result
+        if not row.todo():
+            return None
+        if time.monotonic() + delay > row.deadline:
+            for vendor in row.todo():
+                row.done[vendor] = row.last[vendor]
+            row.exhausted = True
+            return None
+        return delay
+
+    def _columns(self, row: _Row, cfg: Dict[str, Any]) -> Dict[str, Any]:
+        if row.exhausted:
+            metrics.inc("retry_budget_exhausted_total")
+        out = vendor_columns(row.done["zoominfo"], row.done["apollo"], cfg)
+        out[BUDGET_COLUMN] = row.exhausted
+        return out
+
+    def submit(self, pool: Executor, keys: LookupKeys, vendors: Dict[str, Any], cfg: Dict[str, Any],
+               vendor_pool: Optional[Executor] = None) -> Future:
+        # Future of the row's vendor columns (as enrich_keys returns them), set after its last pass
+        out: Future = Future()
+        row = _Row(time.monotonic() + self.budget_seconds)
+
+        def attempt():
+            try:
+                delay = self._settle(row, vendor_results(keys, vendors, cfg, vendor_pool, row.todo()))
+                if delay is None:
+                    out.set_result(self._columns(row, cfg))
+                else:
+                    self._park(delay, lambda: run(True))
+            except BaseException as e:
+                out.set_exception(e)
+
+        def run(parked: bool = False):
+            if parked:
+                self._count(-1)
+            try:
+                pool.submit(attempt)
+            except RuntimeError as e:  # the engine shut its pool down (run interrupted)
+                out.set_exception(e)
+
+        run()
+        return out
+
+    async def run_async(self, keys: LookupKeys, vendors: Dict[str, Any], cfg: Dict[str, Any]) -> Dict[str, Any]:
+        # asyncio counterpart of submit; parked rows sleep on the event loop
+        row = _Row(time.monotonic() + self.budget_seconds)
+        while True:
+            delay = self._settle(row, await vendor_results_async(keys, vendors, cfg, row.todo()))
+            if delay is None:
+                return self._columns(row, cfg)
+            self._count(1)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._count(-1)
+
+    def _count(self, n: int) -> None:
+        with self._cond:
+            self.waiting += n
+            metrics.set("retry_waiting_rows", self.waiting)
+
+    def _park(self, delay: float, callback: Callable[[], None]) -> None:
+        self._count(1)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retry-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            callback()
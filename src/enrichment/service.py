@@ -0,0 +1,184 @@
+from __future__ import annotations
+import json, queue, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+from enrichment.logic import LookupKeys, enrich_keys
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.preprocess import iter_lookup_keys, lookup_key_frame
+
+# Record fields read for each lookup key unless the config maps it to another field
+FIELDS = ("zoominfo_id", "apollo_id", "salesforce_id", "name", "website")
+
+class RowBatcher:
+    # Rows from concurrent requests are gathered for up to max_wait seconds (or max_batch rows),
+    # identical lookup keys across them are resolved once, and the rest share one warm row pool,
+    # so every request draws on the same vendor clients, caches and rate limiters.
+    def __init__(self, vendors: Dict[str, Any], cfg: Dict[str, Any], *, workers: int = 16,
+                 max_batch: int = 256, max_wait: float = 0.005, max_in_flight: int = 2000):
+        self.vendors = vendors
+        self.cfg = cfg
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._rows = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service-row")
+        self._vendor_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service-vendor")
+        self._thread = threading.Thread(target=self._run, name="service-dispatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, keys: Sequence[LookupKeys]) -> List[Future]:
+        # One future per key, resolved in any order. Keys are queued max_batch at a time and block
+        # while max_in_flight rows are pending, so a large request cannot starve the others.
+        futures: List[Future] = []
+        for start in range(0, len(keys), self.max_batch):
+            part = list(keys[start:start + self.max_batch])
+            futs = []
+            for _ in part:
+                self._slots.acquire()
+                fut: Future = Future()
+                fut.add_done_callback(lambda f: self._slots.release())
+                futs.append(fut)
+            self._queue.put((part, futs))
+            futures.extend(futs)
+        return futures
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, rows = [item], len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)
+                    break
+                batch.append(nxt)
+                rows += len(nxt[0])
+            self._dispatch(batch, rows)
+
+    def _dispatch(self, batch: List[Tuple[List[LookupKeys], List[Future]]], rows: int) -> None:
+        waiters: Dict[LookupKeys, List[Future]] = {}
+        for keys, futures in batch:
+            for k, fut in zip(keys, futures):
+                waiters.setdefault(k, []).append(fut)
+        metrics.inc("service_batches_total")
+        metrics.inc("service_rows_total", rows)
+        metrics.inc("service_rows_deduplicated_total", rows - len(waiters))
+        retry = self.cfg.get("retry")
+        for k, futs in waiters.items():
+            if retry is not None:
+                job = retry.submit(self._rows, k, self.vendors, self.cfg, self._vendor_pool)
+            else:
+                job = self._rows.submit(enrich_keys, k, self.vendors, self.cfg, self._vendor_pool)
+            job.add_done_callback(lambda j, futs=futs: _fan_out(j, futs))
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._rows.shutdown(wait=True)
+        self._vendor_pool.shutdown(wait=True)
+
+def _fan_out(job: Future, futures: List[Future]) -> None:
+    err = job.exception()
+    for fut in futures:
+        if err is not None:
+            fut.set_exception(err)
+        else:
+            fut.set_result(job.result())
+
+def parse_records(body: Any) -> Optional[List[Dict[str, Any]]]:
+    # A record, a list of records, or {"record": {...}} / {"records": [...]}
+    if isinstance(body, dict):
+        if isinstance(body.get("records"), list):
+            body = body["records"]
+        elif isinstance(body.get("record"), dict):
+            body = [body["record"]]
+        else:
+            body = [body]
+    if not isinstance(body, list) or not all(isinstance(r, dict) for r in body):
+        return None
+    return body
+
+def record_keys(records: List[Dict[str, Any]], mapping: Dict[str, Optional[str]]) -> List[LookupKeys]:
+    # Values are stringified per record first: a column with gaps would turn 123 into 123.0
+    df = pd.DataFrame([{k: "" if v is None else str(v) for k, v in r.items()} for r in records],
+                      dtype=object).fillna("") if records else pd.DataFrame()
+    fields = {k: mapping.get(k) or k for k in FIELDS}
+    fields = {k: c if c in df.columns else None for k, c in fields.items()}
+    return list(iter_lookup_keys(lookup_key_frame(df, fields)))
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload: Any, content_type: str = "application/json") -> None:
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            return self._reply(200, {"status": "ok"})
+        if self.path == "/metrics":
+            return self._reply(200, metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+        self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/enrich":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        server: EnrichmentServer = self.server
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"null")
+        except ValueError:
+            return self._reply(400, {"error": "body is not valid JSON"})
+        records = parse_records(body)
+        if records is None:
+            return self._reply(400, {"error": "expected a record, a list of records, or {\"records\": [...]}"})
+        if len(records) > server.max_records:
+            return self._reply(413, {"error": f"at most {server.max_records} records per request"})
+        futures = server.batcher.submit(record_keys(records, server.mapping))
+        include = server.batcher.cfg.get("include_input_columns", True)
+        # NDJSON, one line per record in request order, each sent as soon as it and those before it are done
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for record, fut in zip(records, futures):
+            try:
+                out = dict(record) if include else {}
+                out.update(fut.result())
+            except Exception as e:
+                out = {"error": f"{type(e).__name__}: {e}"}
+            line = json.dumps(out, default=str, ensure_ascii=False).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.write(b"0\r\n\r\n")
+
+class EnrichmentServer(ThreadingHTTPServer):
+    # POST /enrich (NDJSON out), GET /healthz, GET /metrics (Prometheus text)
+    daemon_threads = True
+
+    def __init__(self, batcher: RowBatcher, mapping: Dict[str, Optional[str]], *, host: str = "127.0.0.1",
+                 port: int = 8080, max_records: int = 10_000):
+        super().__init__((host, port), Handler)
+        self.batcher = batcher
+        self.mapping = mapping
+        self.max_records = max_records
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
@@ -0,0 +1,96 @@
+from __future__ import annotations
+import csv, heapq, os, zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+from enrichment import sinks
+
+ROW_INDEX = "_row"
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    # "i/N" with 0 <= i < N
+    try:
+        i, n = (int(p) for p in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {spec!r}; expected i/N, e.g. 0/4")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"invalid shard {spec!r}; need 0 <= i < N")
+    return i, n
+
+def primary_keys(keys: pd.DataFrame) -> pd.Series:
+    # Domain, else normalized name, else the IDs: rows that would share vendor lookups share a key
+    name = keys["name"].str.lower().str.replace(r"\s+", " ", regex=True)
+    ids = "id:" + keys["zoominfo_id"] + "|" + keys["apollo_id"] + "|" + keys["salesforce_id"]
+    out = ids.where(name == "", "name:" + name)
+    return out.where(keys["domain"] == "", "domain:" + keys["domain"])
+
+def shard_of(keys: pd.DataFrame, n: int) -> pd.Series:
+    # crc32 is stable across processes and machines (unlike hash()), so every node agrees
+    pk = primary_keys(keys)
+    buckets = {k: zlib.crc32(k.encode("utf-8")) % n for k in pk.unique()}
+    return pk.map(buckets)
+
+def _read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    fmt = sinks.infer_format(path)
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                row[ROW_INDEX] = int(row[ROW_INDEX])
+                yield row
+        return
+    if sinks.pa is None:
+        raise ImportError(f"reading {path} requires pyarrow (pip install pyarrow)")
+    if fmt == "parquet":
+        batches = sinks.pq.ParquetFile(path).iter_batches()
+    else:
+        reader = sinks.pa.ipc.open_file(path)
+        batches = (reader.get_batch(b) for b in range(reader.num_record_batches))
+    for batch in batches:
+        yield from batch.to_pylist()
+
+def _columns(path: str) -> List[str]:
+    fmt = sinks.infer_format(path)
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+    if fmt == "parquet":
+        return sinks.pq.read_schema(path).names
+    return sinks.pa.ipc.open_file(path).schema.names
+
+def merged_columns(headers: Sequence[Sequence[str]]) -> List[str]:
+    # Every shard writes input columns first, then its own sorted vendor columns:
+    # keep the shared leading columns and re-sort the union of the rest
+    common: List[str] = []
+    for cols in zip(*headers):
+        if any(c != cols[0] for c in cols):
+            break
+        common.append(cols[0])
+    seen = set(common)
+    return common + sorted({c for h in headers for c in h if c not in seen})
+
+def merge_shards(paths: Sequence[str], output: str, fmt: Optional[str] = None,
+                 keep_row_index: bool = False) -> int:
+    # k-way merge on the row index; every shard is already in input order
+    fmt = fmt or sinks.infer_format(output)
+    columns = merged_columns([_columns(p) for p in paths])
+    if not keep_row_index:
+        columns = [c for c in columns if c != ROW_INDEX]
+
+    def rows():
+        return heapq.merge(*(_read_rows(p) for p in paths), key=lambda r: r[ROW_INDEX])
+
+    tmp = f"{output}.tmp"
+    if fmt == "csv":
+        n = 0
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows():
+                writer.writerow(row)
+                n += 1
+    else:
+        types = sinks.TypeTracker()
+        for row in rows():  # first pass settles the column types
+            types.observe(row)
+        n = sinks.write_columnar(rows(), columns, types, tmp, fmt)
+    os.replace(tmp, output)
+    return n
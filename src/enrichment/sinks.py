@@ -0,0 +1,213 @@
+from __future__ import annotations
+import csv, json, os
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Set, Union
+import pandas as pd
+from enrichment.journal import Journal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet / Arrow output
+    pa = None
+    pq = None
+
+FORMATS = ("csv", "parquet", "arrow")
+
+def infer_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".arrow", ".feather", ".ipc"):
+        return "arrow"
+    return "csv"
+
+def _missing(v: Any) -> bool:
+    return v is None or v == "" or v != v  # NaN from pandas frames
+
+def _kind(v: Any) -> str:
+    if _missing(v):
+        return "null"
+    if isinstance(v, bool):
+        return "bool"
+    if isinstance(v, int):
+        return "int"
+    if isinstance(v, float):
+        return "float"
+    return "str"
+
+class TypeTracker:
+    # Observed value kinds per column, reduced to one Arrow type at write time
+    def __init__(self):
+        self.kinds: Dict[str, Set[str]] = {}
+
+    def observe(self, row: Dict[str, Any]) -> None:
+        for k, v in row.items():
+            self.kinds.setdefault(k, set()).add(_kind(v))
+
+    def arrow_type(self, column: str):
+        kinds = self.kinds.get(column, set()) - {"null"}
+        if kinds == {"bool"}:
+            return pa.bool_()
+        if kinds == {"int"}:
+            return pa.int64()
+        if kinds and kinds <= {"int", "float"}:
+            return pa.float64()
+        return pa.string()
+
+def _coerce(v: Any, typ) -> Any:
+    if v is None or v != v or (v == "" and typ != pa.string()):
+        return None
+    if typ == pa.string():
+        if isinstance(v, str):
+            return v
+        return json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+    if typ == pa.float64():
+        return float(v)
+    return v
+
+def _open_writer(columns: Sequence[str], types: TypeTracker, target: Union[str, BinaryIO], fmt: str,
+                 compression: str):
+    if pa is None:
+        raise ImportError(f"{fmt} output requires pyarrow (pip install pyarrow)")
+    dupes = sorted({c for c in columns if list(columns).count(c) > 1})
+    if dupes:
+        # Readers cannot tell such fields apart (and record dicts keep only one of the values)
+        raise ValueError(f"duplicate column name(s): {', '.join(dupes)}")
+    schema = pa.schema([(c, types.arrow_type(c)) for c in columns])
+    if fmt == "parquet":
+        return schema, pq.ParquetWriter(target, schema, compression=compression)
+    return schema, pa.ipc.new_file(target, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+def write_columnar(records: Iterable[Dict[str, Any]], columns: Sequence[str], types: TypeTracker,
+                   target: Union[str, BinaryIO], fmt: str = "parquet", *,
+                   row_group_size: int = 50_000, compression: str = "zstd") -> int:
+    # Streams records into a typed Parquet file or Arrow IPC file, one row group at a time
+    schema, writer = _open_writer(columns, types, target, fmt, compression)
+    n = 0
+    buf: List[Dict[str, Any]] = []
+
+    def flush():
+        cols = [pa.array([_coerce(r.get(f.name), f.type) for r in buf], type=f.type) for f in schema]
+        writer.write_table(pa.Table.from_arrays(cols, schema=schema))
+        buf.clear()
+
+    try:
+        for r in records:
+            buf.append(r)
+            n += 1
+            if len(buf) >= row_group_size:
+                flush()
+        if buf:
+            flush()
+    finally:
+        writer.close()
+    return n
+
+def write_frame(df: pd.DataFrame, target: Union[str, BinaryIO], fmt: str = "parquet", *,
+                row_group_size: int = 50_000, compression: str = "zstd") -> int:
+    # Same typed output as write_columnar for an in-memory frame, built column by column
+    columns = [str(c) for c in df.columns]
+    types = TypeTracker()
+    for i, c in enumerate(columns):
+        types.kinds.setdefault(c, set()).update(map(_kind, df.iloc[:, i].tolist()))
+    schema, writer = _open_writer(columns, types, target, fmt, compression)
+    try:
+        for start in range(0, len(df), row_group_size):
+            part = df.iloc[start:start + row_group_size]
+            cols = [pa.array([_coerce(v, f.type) for v in part.iloc[:, i].tolist()], type=f.type)
+                    for i, f in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(cols, schema=schema))
+    finally:
+        writer.close()
+    return len(df)
+
+class CsvSink:
+    # Finished rows go to a durable JSON-lines journal as they complete, so memory stays flat
+    # while the set of flattened vendor columns is still growing and a crashed run can resume.
+    # close() writes the output in one streaming pass with the final header: input columns
+    # first, then the sorted vendor columns.
+    def __init__(self, path: str, base_columns: Sequence[str], journal: Optional[Journal] = None):
+        self.path = path
+        self.base_columns = list(base_columns)
+        self.journal = journal or Journal(f"{path}.journal.jsonl", "")
+
+    @property
+    def rows(self) -> int:
+        return len(self.journal.done)
+
+    def write(self, row: Dict[str, Any], index: Optional[int] = None) -> None:
+        self.journal.append(self.rows if index is None else index, row)
+
+    def final_columns(self) -> List[str]:
+        base = set(self.base_columns)
+        return self.base_columns + sorted(k for k in self.journal.columns if k not in base)
+
+    def abort(self) -> None:
+        # Keeps the journal on disk so the run can be resumed
+        self.journal.close()
+
+    def close(self) -> int:
+        self.journal.close()
+        if self.rows:
+            tmp = f"{self.path}.tmp"
+            self._write(tmp)
+            os.replace(tmp, self.path)
+        os.remove(self.journal.path)
+        return self.rows
+
+    def _write(self, tmp: str) -> None:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.final_columns())
+            writer.writeheader()
+            for row in self.journal.rows():
+                writer.writerow(row)
+
+class ColumnarSink(CsvSink):
+    # Parquet or Arrow IPC with per-column types inferred from the values seen
+    def __init__(self, path: str, base_columns: Sequence[str], journal: Optional[Journal] = None, *,
+                 fmt: str = "parquet", row_group_size: int = 50_000, compression: str = "zstd"):
+        if pa is None:
+            raise ImportError(f"{fmt} output requires pyarrow (pip install pyarrow)")
+        super().__init__(path, base_columns, journal)
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.types = TypeTracker()
+        if self.journal.done:
+            for row in self.journal.rows():  # rows finished before a resume
+                self.types.observe(row)
+
+    def write(self, row: Dict[str, Any], index: Optional[int] = None) -> None:
+        self.types.observe(row)
+        super().write(row, index)
+
+    def _write(self, tmp: str) -> None:
+        write_columnar(self.journal.rows(), self.final_columns(), self.types, tmp, self.fmt,
+                       row_group_size=self.row_group_size, compression=self.compression)
+
+def open_sink(path: str, base_columns: Sequence[str], journal: Optional[Journal] = None,
+              fmt: Optional[str] = None) -> CsvSink:
+    fmt = fmt or infer_format(path)
+    if fmt == "csv":
+        return CsvSink(path, base_columns, journal)
+    return ColumnarSink(path, base_columns, journal, fmt=fmt)
+
+def read_frames(path: str, chunksize: int = 50_000, fmt: Optional[str] = None) -> Iterable[pd.DataFrame]:
+    # A previous output back as DataFrame chunks indexed by row position; missing values are "" in every format
+    fmt = fmt or infer_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+        return
+    if pa is None:
+        raise ImportError(f"reading {path} requires pyarrow (pip install pyarrow)")
+    if fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+    else:
+        reader = pa.ipc.open_file(path)
+        batches = (reader.get_batch(b) for b in range(reader.num_record_batches))
+    start = 0
+    for batch in batches:
+        df = batch.to_pandas().astype(object)
+        df.index += start
+        start += len(df)
+        yield df.where(df.notna(), "")
@@ -19,18 +19,19 @@ def sanitize_domain(website: str) -> str:
     return host.lower()
 
 def flatten(prefix: str, obj: Any) -> Dict[str, Any]:
+    # Dotted paths become underscore-joined column names, built in a single pass
     out: Dict[str, Any] = {}
     def _rec(base, val):
         if isinstance(val, dict):
             for k, v in val.items():
-                _rec(f"{base}{k}.", v)
+                _rec(f"{base}_{k}".replace(".", "_"), v)
         elif isinstance(val, list):
             for i, v in enumerate(val):
-                _rec(f"{base}{i}.", v)
+                _rec(f"{base}_{i}", v)
         else:
-            out[base[:-1]] = val
-    _rec(prefix + ".", obj)
-    return {k.replace(".", "_"): v for k, v in out.items()}
+            out[base] = val
+    _rec(prefix.replace(".", "_"), obj)
+    return out
 
 def rate_limiter(per_minute: int) -> float:
     if per_minute <= 0:
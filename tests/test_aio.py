@@ -0,0 +1,85 @@
+import asyncio
+import pandas as pd
+import pytest
+from enrichment.coalesce import AsyncCoalescingClient
+from enrichment.engine import enrich_rows_async, iterate_async
+from enrichment.logic import enrich_keys_async
+
+class AsyncStubZ:
+    def __init__(self):
+        self.calls, self.cancelled = [], []
+    async def _call(self, kind, key, hit, delay=0.0):
+        self.calls.append(kind)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(kind)
+            raise
+        return ({"via": kind, "key": key}, None) if hit else (None, "not found")
+    async def company_by_id(self, cid, retries=3): return await self._call("id", cid, cid == "ZI-OK", 0.01)
+    async def company_by_domain(self, d, retries=3): return await self._call("domain", d, d == "ok.com", 0.01)
+    async def company_by_name(self, n, retries=3): return await self._call("name", n, True, 1.0)
+
+class AsyncStubA(AsyncStubZ):
+    async def company_by_salesforce_id(self, s, retries=3): return await self._call("sf", s, False)
+
+CFG = {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}
+
+def test_async_cascade_matches_sync_priority():
+    z, a = AsyncStubZ(), AsyncStubA()
+    out = asyncio.run(enrich_keys_async(("", "", "SF1", "Okay", "ok.com"), {"zoominfo": z, "apollo": a}, CFG))
+    assert out["zi_via"] == "domain" and out["ap_via"] == "domain"
+    assert "name" not in z.calls and a.calls == ["sf", "domain"]
+
+def test_speculative_cancels_lower_priority_fallbacks():
+    z, a = AsyncStubZ(), AsyncStubA()
+    cfg = dict(CFG, speculative_fallbacks=True)
+    out = asyncio.run(asyncio.wait_for(
+        enrich_keys_async(("ZI-OK", "ZI-OK", "", "Okay", "nope.com"), {"zoominfo": z, "apollo": a}, cfg), 0.5))
+    assert out["zi_via"] == "id"
+    assert "name" in z.cancelled and "name" in a.cancelled
+
+def test_async_coalescing_merges_in_flight():
+    z = AsyncStubZ()
+    c = AsyncCoalescingClient(z)
+
+    async def run():
+        return await asyncio.gather(*[c.company_by_domain(d) for d in ["ok.com", "OK.com ", "ok.com"]])
+
+    assert all(r[0]["key"] == "ok.com" for r in asyncio.run(run()))
+    assert z.calls == ["domain"]
+
+def test_iterate_async_keeps_order():
+    rows = [pd.Series({"website": w}) for w in ["ok.com", "a.com", "ok.com", "b.com"]]
+    mapping = {"website": "website"}
+    vendors = {"zoominfo": AsyncStubZ(), "apollo": AsyncStubA()}
+    out = list(iterate_async(lambda: enrich_rows_async(rows, mapping, vendors, CFG, max_in_flight=2)))
+    assert [r["website"] for r in out] == ["ok.com", "a.com", "ok.com", "b.com"]
+    assert [r["zi_match"] for r in out] == [True, False, True, False]
+
+def test_async_clients_against_local_server():
+    pytest.importorskip("aiohttp")
+    from test_clients import Handler, ThreadingHTTPServer
+    import threading
+    from enrichment.clients.aio import AsyncApolloClient, AsyncTransport, AsyncZoomInfoClient
+    Handler.calls = []
+    Handler.script = {"/lookup/company": [(503, {}), (200, {"id": 1})],
+                      "/mixed_companies/search": [(200, {"organizations": [{"id": "o1"}]})]}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}"
+
+    async def run():
+        zc = AsyncZoomInfoClient("k", base_url=url, transport=AsyncTransport(base_delay=0.001))
+        ac = AsyncApolloClient("k", base_url=url, transport=AsyncTransport(base_delay=0.001))
+        try:
+            return (await zc.company_by_domain("acme.com"), await ac.company_by_name("Acme"),
+                    await zc.company_by_name(""))
+        finally:
+            await zc.close()
+            await ac.close()
+
+    try:
+        assert asyncio.run(run()) == (({"id": 1}, None), ({"id": "o1"}, None), (None, "missing name"))
+    finally:
+        srv.shutdown()
@@ -0,0 +1,47 @@
+import os, time
+import pandas as pd
+from enrichment.backfill import SalesforceIndex, backfill_domains, open_salesforce_index
+from enrichment.engine import enrich_frame
+from enrichment.preprocess import lookup_key_frame
+from test_engine import SlowA, SlowZ
+
+def test_index_load_and_lookup(tmp_path):
+    idx = SalesforceIndex(str(tmp_path / "sf.sqlite"))
+    df = pd.DataFrame({"Id": ["001", " 002 ", "003", "001", ""], "Website": ["https://www.A.com/x", "b.com", "", "c.com", "d.com"]})
+    assert idx.load([df.iloc[:2], df.iloc[2:]], "Id", "Website", "src") == 3
+    assert idx.lookup(["001", "002", "003", "zzz"]) == {"001": "c.com", "002": "b.com"}
+    assert len(idx) == 2 and idx.source() == "src"
+    idx.close()
+
+def test_backfill_fills_only_missing_domains(tmp_path):
+    idx = SalesforceIndex(str(tmp_path / "sf.sqlite"))
+    idx.load([pd.DataFrame({"Id": ["001", "002"], "Website": ["a.com", "b.com"]})], "Id", "Website")
+    df = pd.DataFrame({"sf": ["001", "002", "", "009"], "web": ["", "keep.com", "", ""]})
+    keys = backfill_domains(lookup_key_frame(df, {"salesforce_id": "sf", "website": "web"}), idx)
+    assert keys["domain"].tolist() == ["a.com", "keep.com", "", ""]
+
+def test_open_index_rebuilds_only_when_export_changes(tmp_path):
+    csv = tmp_path / "accounts.csv"
+    pd.DataFrame({"Id": ["001"], "Website": ["a.com"]}).to_csv(csv, index=False)
+    idx = open_salesforce_index(str(csv), "Id", "Website")
+    assert os.path.exists(f"{csv}.index.sqlite") and idx.lookup(["001"]) == {"001": "a.com"}
+    source = idx.source()
+    idx.close()
+    idx = open_salesforce_index(str(csv), "Id", "Website")
+    assert idx.source() == source
+    idx.close()
+    time.sleep(0.01)
+    pd.DataFrame({"Id": ["001"], "Website": ["new.com"]}).to_csv(csv, index=False)
+    idx = open_salesforce_index(str(csv), "Id", "Website")
+    assert idx.lookup(["001"]) == {"001": "new.com"}
+    idx.close()
+
+def test_enrich_frame_uses_backfilled_domain(tmp_path):
+    idx = SalesforceIndex(str(tmp_path / "sf.sqlite"))
+    idx.load([pd.DataFrame({"Id": ["001"], "Website": ["a.com"]})], "Id", "Website")
+    df = pd.DataFrame({"sf": ["001", "002"], "web": ["", "b.com"]})
+    mapping = {"salesforce_id": "sf", "website": "web"}
+    out = list(enrich_frame(df, mapping, {"zoominfo": SlowZ(), "apollo": SlowA()},
+                            {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}, workers=2, salesforce=idx))
+    assert [r["zi_domain"] for r in out] == ["a.com", "b.com"]
+    assert out[0]["web"] == "" and out[0]["sf"] == "001"
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from enrichment.batching import BatchingClient, MicroBatcher
+from enrichment.clients.apollo import ApolloClient
+from enrichment.clients.transport import Transport
+from enrichment.clients.zoominfo import ZoomInfoClient
+from enrichment.logic import apollo_steps, run_cascade
+from test_clients import server  # noqa: F401  (fixture)
+
+def test_micro_batcher_flushes_by_size_and_time():
+    batches = []
+    lock = threading.Lock()
+
+    def flush(keys):
+        with lock:
+            batches.append(sorted(keys))
+        return {k: ({"k": k}, None) for k in keys}
+
+    b = MicroBatcher(flush, max_batch=4, max_wait=0.02)
+    with ThreadPoolExecutor(10) as pool:
+        results = list(pool.map(lambda k: b.submit(k).result(), [f"d{i}" for i in range(10)] + ["d1"]))
+    b.close()
+    assert [r[0]["k"] for r in results] == [f"d{i}" for i in range(10)] + ["d1"]
+    assert sum(len(x) for x in batches) in (10, 11)  # the repeated key may land in a later batch
+    assert max(len(x) for x in batches) <= 4
+
+class BulkStub:
+    bulk_max = 10
+    def __init__(self):
+        self.bulk_calls = []
+    def companies_by_domains(self, domains, retries=3):
+        self.bulk_calls.append(list(domains))
+        return {d: ({"domain": d}, None) if d != "nope.com" else (None, "not found") for d in domains}
+    def company_by_name(self, n, retries=3):
+        return ({"name": n}, None)
+
+def test_batching_client_routes_domains_through_bulk():
+    inner = BulkStub()
+    c = BatchingClient(inner, max_wait=0.05)
+    with ThreadPoolExecutor(5) as pool:
+        out = list(pool.map(c.company_by_domain, ["a.com", "b.com", "nope.com", "c.com", "d.com"]))
+    c.close()
+    assert out[2] == (None, "not found") and out[0] == ({"domain": "a.com"}, None)
+    assert sum(len(x) for x in inner.bulk_calls) == 5 and len(inner.bulk_calls) < 5
+    assert c.company_by_name("Acme") == ({"name": "Acme"}, None)
+
+def test_bulk_client_methods(server):
+    url, h = server
+    h.script = {"/organizations/bulk_enrich": [(200, {"organizations": [{"primary_domain": "b.com", "id": "B"}]})],
+                "/enrich/company": [(200, {"data": {"result": [{"data": [{"id": 1}]}, {"data": []}]}})]}
+    ac = ApolloClient("k", base_url=url, transport=Transport(base_delay=0.001))
+    zc = ZoomInfoClient("k", base_url=url, transport=Transport(base_delay=0.001))
+    assert ac.companies_by_domains(["a.com", "www.B.com"]) == {
+        "a.com": (None, "not found"), "www.B.com": ({"organization": {"primary_domain": "b.com", "id": "B"}}, None)}
+    assert zc.companies_by_ids(["1", "2"]) == {"1": ({"id": 1}, None), "2": (None, "not found")}
+    assert h.calls[1][2]["matchCompanyInput"] == [{"companyId": "1"}, {"companyId": "2"}]
+
+def test_batched_apollo_rows_match_single_calls(server):
+    url, h = server
+    org = {"primary_domain": "a.com", "id": "A", "name": "Acme", "industry": "tools"}
+    h.script = {"/companies/enrich": [(200, {"organization": org})],
+                "/organizations/bulk_enrich": [(200, {"organizations": [org]})]}
+    steps = apollo_steps("", "", "a.com", "Acme")
+    for fields in (None, ["organization.name"]):
+        single = ApolloClient("k", base_url=url, transport=Transport(base_delay=0.001), fields=fields)
+        batched = BatchingClient(ApolloClient("k", base_url=url, transport=Transport(base_delay=0.001), fields=fields))
+        assert run_cascade(batched, steps, 1) == run_cascade(single, steps, 1)
+        batched.close()
+    assert [c[1] for c in h.calls].count("/organizations/bulk_enrich") == 2
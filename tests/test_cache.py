@@ -0,0 +1,47 @@
+from enrichment.cache import ResponseCache, CachedClient
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+    def company_by_domain(self, d, retries=3):
+        self.calls += 1
+        return ({"domain": d}, None) if d == "ok.com" else (None, "not found")
+    def company_by_name(self, n, retries=3):
+        self.calls += 1
+        return (None, "max attempts reached")
+
+def test_cached_client_hits_and_negative_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    inner = CountingClient()
+    c = CachedClient(inner, cache, "zoominfo")
+    assert c.company_by_domain("ok.com") == ({"domain": "ok.com"}, None)
+    assert c.company_by_domain(" OK.com ") == ({"domain": "ok.com"}, None)
+    assert c.company_by_domain("nope.com") == (None, "not found")
+    assert c.company_by_domain("nope.com") == (None, "not found")
+    assert inner.calls == 2
+
+def test_transient_errors_not_cached(tmp_path):
+    inner = CountingClient()
+    c = CachedClient(inner, ResponseCache(str(tmp_path / "c.sqlite")), "apollo")
+    c.company_by_name("Acme")
+    c.company_by_name("Acme")
+    assert inner.calls == 2
+
+def test_ttl_and_refresh(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), negative_ttl_seconds=0)
+    inner = CountingClient()
+    CachedClient(inner, cache, "zoominfo").company_by_domain("nope.com")
+    CachedClient(inner, cache, "zoominfo").company_by_domain("nope.com")
+    assert inner.calls == 2
+    CachedClient(inner, cache, "zoominfo").company_by_domain("ok.com")
+    CachedClient(inner, cache, "zoominfo", refresh=True).company_by_domain("ok.com")
+    assert inner.calls == 4
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    for d in ("a.com", "b.com", "c.com"):
+        cache.put("zoominfo", "company_by_domain", d, {"domain": d}, None)
+    cache.get("zoominfo", "company_by_domain", "a.com")
+    cache._evict()
+    assert cache.get("zoominfo", "company_by_domain", "a.com")[0]
+    assert not cache.get("zoominfo", "company_by_domain", "b.com")[0]
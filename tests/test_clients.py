@@ -0,0 +1,121 @@
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.ratelimit import TokenBucket
+from enrichment.clients.apollo import ApolloClient
+from enrichment.clients.transport import ERROR_BODY_BYTES, Transport
+from enrichment.clients.zoominfo import ZoomInfoClient
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls = []
+    script = {}  # path -> list of (status, body); last entry repeats
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        path = self.path.split("?")[0]
+        type(self).calls.append((self.command, self.path, body, self.client_address[1]))
+        steps = type(self).script.get(path, [(404, {})])
+        status, payload = steps.pop(0) if len(steps) > 1 else steps[0]
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    Handler.calls = []
+    Handler.script = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    t = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", Handler
+    srv.shutdown()
+
+def fast_transport(**kw):
+    return Transport(base_delay=0.001, **kw)
+
+def test_zoominfo_lookups(server):
+    url, h = server
+    h.script = {"/lookup/company": [(200, {"id": 1, "name": "Acme"})],
+                "/search/company": [(200, {"data": [{"id": 2}, {"id": 3}]})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport())
+    assert zc.company_by_domain("acme.com") == ({"id": 1, "name": "Acme"}, None)
+    assert zc.company_by_name("Acme") == ({"id": 2}, None)
+    assert zc.company_by_id("9") == (None, "not found")
+    assert zc.company_by_id("") == (None, "missing company_id")
+    assert h.calls[1][2] == {"companyName": "Acme", "rpp": 1, "page": 1}
+
+def test_apollo_search_and_errors(server):
+    url, h = server
+    h.script = {"/mixed_companies/search": [(200, {"organizations": [{"id": "o1"}]})],
+                "/companies/search": [(200, {"companies": []})],
+                "/companies/enrich": [(400, {"error": "bad"})]}
+    ac = ApolloClient("k", base_url=url, transport=fast_transport())
+    assert ac.company_by_name("Acme") == ({"id": "o1"}, None)
+    assert ac.company_by_salesforce_id("SF1") == (None, "not found")
+    obj, err = ac.company_by_domain("acme.com")
+    assert obj is None and err.startswith("HTTP 400")
+
+def test_transport_retries_then_succeeds(server):
+    url, h = server
+    h.script = {"/lookup/company": [(503, {}), (500, {}), (200, {"id": 1})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport())
+    assert zc.company_by_domain("acme.com", retries=5) == ({"id": 1}, None)
+    assert len(h.calls) == 3
+
+def test_transport_gives_up(server):
+    url, h = server
+    h.script = {"/lookup/company": [(502, {})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport())
+    assert zc.company_by_domain("acme.com", retries=2) == (None, "max attempts reached")
+    assert len(h.calls) == 2
+
+def test_unlimited_lane_backs_off_on_429(server):
+    url, h = server
+    h.script = {"/lookup/company": [(429, {}), (200, {"id": 1})]}
+    metrics.reset()
+    zc = ZoomInfoClient("k", base_url=url, transport=Transport(base_delay=0.05, limiter=TokenBucket(0)))
+    assert zc.company_by_domain("acme.com", retries=3) == ({"id": 1}, None)
+    assert len(h.calls) == 2 and metrics.value("backoff_seconds_total", vendor="zoominfo") > 0
+
+def test_transport_reuses_connections(server):
+    url, h = server
+    h.script = {"/lookup/company": [(200, {"id": 1})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport(pool_size=1))
+    for _ in range(5):
+        zc.company_by_domain("acme.com")
+    assert len({port for *_, port in h.calls}) == 1
+
+def test_error_bodies_are_bounded_and_connections_kept(server):
+    url, h = server
+    h.script = {"/lookup/company": [(400, {"error": "x" * 5000}), (200, {"id": 1})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport(pool_size=1))
+    obj, err = zc.company_by_domain("acme.com")
+    assert obj is None and err.startswith("HTTP 400: {") and len(err) == len("HTTP 400: ") + ERROR_BODY_BYTES
+    assert zc.company_by_domain("acme.com") == ({"id": 1}, None)
+    assert len({port for *_, port in h.calls}) == 1
+
+def test_clients_prune_results_to_output_fields(server):
+    url, h = server
+    big = {"id": 1, "name": "Acme", "description": "x" * 1000, "address": {"city": "Austin", "zip": "1"}}
+    h.script = {"/lookup/company": [(200, big)],
+                "/enrich/company": [(200, {"data": {"result": [{"data": [big]}]}})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport(), fields=["name", "address.city"])
+    assert zc.company_by_domain("acme.com") == ({"id": 1, "name": "Acme", "address": {"city": "Austin"}}, None)
+    assert zc.companies_by_domains(["acme.com"])["acme.com"][0] == {"id": 1, "name": "Acme", "address": {"city": "Austin"}}
+    assert h.calls[1][2]["outputFields"] == ["id", "name", "address"]
+
+def test_backoff_is_jittered_and_capped():
+    t = Transport(base_delay=1.0, max_delay=4.0)
+    assert all(0 <= t.backoff(a) <= 4.0 for a in range(1, 10) for _ in range(20))
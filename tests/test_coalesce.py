@@ -0,0 +1,38 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from enrichment.coalesce import CoalescingClient, SingleFlight
+
+class SlowClient:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+    def company_by_domain(self, d, retries=3):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return ({"domain": d}, None)
+    def company_by_name(self, n, retries=3):
+        with self._lock:
+            self.calls += 1
+        return (None, "HTTP 500: boom")
+
+def test_concurrent_identical_lookups_merge():
+    inner = SlowClient()
+    c = CoalescingClient(inner)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda d: c.company_by_domain(d), ["ok.com", "OK.com", "ok.com "] * 4))
+    assert inner.calls == 1
+    assert all(r == ({"domain": "ok.com"}, None) for r in results)
+
+def test_transient_errors_not_memoized():
+    inner = SlowClient()
+    c = CoalescingClient(inner)
+    c.company_by_name("Acme")
+    c.company_by_name("Acme")
+    assert inner.calls == 2
+
+def test_single_flight_is_bounded():
+    sf = SingleFlight(max_entries=2)
+    for k in range(5):
+        sf.do(k, lambda: k)
+    assert len(sf._entries) == 2
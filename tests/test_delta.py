@@ -0,0 +1,65 @@
+import os, time
+import pandas as pd
+from enrichment.delta import ENRICHED_AT, PreviousOutput, enriched_at, row_fingerprints
+from enrichment.engine import enrich_key_stream
+from enrichment.preprocess import lookup_key_frame
+from test_engine import SlowA, SlowZ
+
+MAPPING = {"zoominfo_id": None, "apollo_id": None, "salesforce_id": "sf", "name": "name", "website": "web"}
+
+def fingerprint(**row):
+    return row_fingerprints(lookup_key_frame(pd.DataFrame([row]), MAPPING)).iloc[0]
+
+def write_previous(path, now):
+    pd.DataFrame({
+        "sf": ["1", "2", "3", "4", "5"], "name": ["A", "B", "C", "D", "E"],
+        "web": ["https://www.a.com", "b.com", "c.com", "d.com", "e.com"],
+        "zi_match": ["True", "False", "False", "True", "True"],
+        "zi_error": ["", "not_found", "HTTP 500", "", ""], "zi_id": ["1", "", "", "4", "5"],
+        "ap_match": ["False"] * 5, "ap_error": ["not_found"] * 5,
+        ENRICHED_AT: [enriched_at(now), enriched_at(now), enriched_at(now), enriched_at(now - 90 * 86400), ""],
+    }).to_csv(path, index=False)
+
+def test_fingerprint_uses_normalized_keys():
+    assert fingerprint(sf="1", name="A ", web="https://www.A.com/") == fingerprint(sf="1", name="A", web="a.com")
+    assert fingerprint(sf="1", name="A", web="a.com") != fingerprint(sf="2", name="A", web="a.com")
+
+def test_previous_output_keeps_fresh_successful_rows(tmp_path):
+    path = str(tmp_path / "prev.csv")
+    now = time.time()
+    write_previous(path, now)
+    os.utime(path, (now - 10 * 86400, now - 10 * 86400))
+    prev = PreviousOutput(path, MAPPING, ["zi", "ap"], max_age_seconds=30 * 86400, now=now)
+    assert prev.get(fingerprint(sf="1", name="A", web="a.com"))["zi_id"] == "1"
+    assert prev.get(fingerprint(sf="2", name="B", web="b.com")) is not None   # a miss is a result
+    assert prev.get(fingerprint(sf="3", name="C", web="c.com")) is None       # failed
+    assert prev.get(fingerprint(sf="4", name="D", web="d.com")) is None       # too old
+    # Unstamped rows are dated by the file's mtime, and carry that date forward
+    assert prev.get(fingerprint(sf="5", name="E", web="e.com"))[ENRICHED_AT] == enriched_at(now - 10 * 86400)
+    assert prev.refresh == {"failed": 1, "stale": 1}
+    assert prev.get(fingerprint(sf="1", name="A", web="other.com")) is None
+    fps = [fingerprint(sf="1", name="A", web="a.com"), fingerprint(sf="3", name="C", web="c.com")]
+    assert list(prev.get_many(fps)) == fps[:1]
+    assert len(prev) == 3
+    prev.close()
+    assert not os.path.exists(prev._db_path)
+    strict = PreviousOutput(path, MAPPING, ["zi", "ap"], retry_not_found=True, now=now)
+    assert len(strict) == 0
+    strict.close()
+
+def test_previous_output_requires_input_columns(tmp_path):
+    path = str(tmp_path / "prev.csv")
+    pd.DataFrame({"zi_match": ["True"], "zi_error": [""]}).to_csv(path, index=False)
+    try:
+        PreviousOutput(path, MAPPING, ["zi", "ap"])
+    except ValueError as e:
+        assert "include_input_columns" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+def test_key_stream_passes_skipped_rows_through_in_order():
+    keys = [("", "", "", "", "a.com"), None, ("", "", "", "", "b.com"), None]
+    cfg = {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}
+    for workers in (1, 3):
+        out = list(enrich_key_stream(iter(keys), {"zoominfo": SlowZ(), "apollo": SlowA()}, cfg, workers=workers))
+        assert [o and o["zi_domain"] for o in out] == ["a.com", None, "b.com", None]
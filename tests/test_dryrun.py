@@ -0,0 +1,58 @@
+import pandas as pd
+from enrichment.cache import ResponseCache
+from enrichment.dryrun import CASCADES, CallPlan, format_plan
+from enrichment.entities import EntityIndex
+from enrichment.logic import vendor_steps
+from enrichment.preprocess import KEY_COLUMNS
+
+def frame(*rows):
+    return pd.DataFrame([dict(zip(KEY_COLUMNS, r)) for r in rows], columns=list(KEY_COLUMNS))
+
+def strategies(report, vendor):
+    return {s["strategy"]: s for v in report["vendors"] if v["vendor"] == vendor for s in v["strategies"]}
+
+def test_cascades_follow_the_cascade_order():
+    keys = ("zi1", "ap1", "sf1", "Acme", "acme.com")
+    for vendor, steps in CASCADES.items():
+        by_column = dict(zip(KEY_COLUMNS, keys))
+        assert [(m, by_column[c]) for m, c in steps] == vendor_steps(vendor, keys)
+
+def test_duplicates_are_looked_up_once():
+    plan = CallPlan()
+    plan.add(frame(("", "", "", "Acme", "acme.com"), ("", "", "", "Acme", "acme.com"), ("", "", "", "Acme Two", "acme.com")))
+    plan.add(frame(("", "", "", "acme", ""), ("", "", "", "", "")))
+    report = plan.report({"zoominfo": 60, "apollo": 30})
+    assert report["rows"] == 5
+    zi = strategies(report, "zoominfo")
+    assert zi["domain"]["worst_lookups"] == 1
+    assert zi["name"]["worst_lookups"] == 2  # "Acme" and "acme" are the same lookup
+    # Rows with a domain reach the name step only when it misses (assumed yield 0.5)
+    assert zi["name"]["expected_lookups"] == 1.5
+    v = report["vendors"][0]
+    assert v["worst_calls"] == 3 and v["worst_seconds"] == 3.0
+    assert report["worst_seconds"] == 6.0  # Apollo at 30/min is the slower lane
+    assert "Estimated wall time: 6s worst case" in format_plan(report)
+
+def test_cached_results_and_index_hits_settle_steps(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    cache.put("zi:ns", "company_by_domain", "hit.com", {"id": 1}, None)
+    cache.put("zi:ns", "company_by_domain", "miss.com", None, "not found")
+    entities = EntityIndex(str(tmp_path / "e.sqlite"), fuzzy_threshold=None)
+    entities.add("zoominfo", {"id": 9}, [("company_by_name", "Known Inc")])
+    plan = CallPlan(cache=cache, namespaces={"zoominfo": "zi:ns"}, entities=entities)
+    plan.add(frame(("", "", "", "Hit", "HIT.com"), ("", "", "", "Miss", "miss.com"), ("", "", "", "New", "new.com"),
+                   ("", "", "", "KNOWN", "known.com")))
+    report = plan.report({"zoominfo": 60, "apollo": 60})
+    zi = strategies(report, "zoominfo")
+    assert zi["domain"]["cached"] == 2 and zi["domain"]["worst_lookups"] == 1
+    assert zi["name"]["worst_lookups"] == 2  # "Miss" and "New"; "Hit" was answered by the cache
+    assert zi["name"]["expected_lookups"] == 1.5
+    assert report["vendors"][0]["indexed_rows"] == 1
+    # Apollo reads its own namespace
+    assert strategies(report, "apollo")["domain"]["cached"] == 0
+
+def test_batched_lookups_share_calls():
+    plan = CallPlan(bulk={("zoominfo", "company_by_domain"): 25})
+    plan.add(frame(*[("", "", "", "", f"c{i}.com") for i in range(60)]))
+    zi = strategies(plan.report({"zoominfo": 60, "apollo": 60}), "zoominfo")
+    assert zi["domain"]["worst_lookups"] == 60 and zi["domain"]["worst_calls"] == 3
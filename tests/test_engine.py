@@ -0,0 +1,49 @@
+import time
+import pandas as pd
+from enrichment.engine import enrich_rows
+
+class SlowZ:
+    def company_by_id(self, cid, retries=3): return (None, "not found")
+    def company_by_domain(self, d, retries=3):
+        time.sleep(0.01 * (hash(d) % 3))
+        return ({"domain": d}, None)
+    def company_by_name(self, n, retries=3): return (None, "not found")
+
+class SlowA:
+    def company_by_id(self, aid, retries=3): return (None, "not found")
+    def company_by_salesforce_id(self, s, retries=3): return (None, "not found")
+    def company_by_domain(self, d, retries=3):
+        time.sleep(0.01)
+        return ({"domain": d}, None)
+    def company_by_name(self, n, retries=3): return (None, "not found")
+
+MAPPING = {"zoominfo_id": None, "apollo_id": None, "salesforce_id": None, "name": None, "website": "website"}
+
+def test_enrich_rows_concurrent_keeps_order():
+    rows = [pd.Series({"website": f"c{i}.com"}) for i in range(25)]
+    out = list(enrich_rows(rows, MAPPING, {"zoominfo": SlowZ(), "apollo": SlowA()},
+                           {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}, workers=8))
+    assert [r["zi_domain"] for r in out] == [f"c{i}.com" for i in range(25)]
+    assert all(r["ap_match"] for r in out)
+
+def test_enrich_rows_serial_matches_concurrent():
+    rows = [pd.Series({"website": f"https://www.c{i}.com"}) for i in range(5)]
+    vendors = {"zoominfo": SlowZ(), "apollo": SlowA()}
+    cfg = {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}
+    assert list(enrich_rows(rows, MAPPING, vendors, cfg)) == list(enrich_rows(rows, MAPPING, vendors, cfg, workers=3))
+
+class CountingZ(SlowZ):
+    def __init__(self): self.calls = 0
+    def company_by_domain(self, d, retries=3):
+        self.calls += 1
+        return ({"domain": d}, None)
+
+def test_enrich_rows_dedupes_identical_keys():
+    rows = [pd.Series({"website": w, "n": i}) for i, w in enumerate(["a.com", "https://www.a.com", "b.com", "a.com"])]
+    for workers in (1, 4):
+        z = CountingZ()
+        out = list(enrich_rows(rows, MAPPING, {"zoominfo": z, "apollo": SlowA()},
+                               {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}, workers=workers))
+        assert z.calls == 2
+        assert [r["n"] for r in out] == [0, 1, 2, 3]
+        assert out[3]["zi_domain"] == "a.com"
@@ -0,0 +1,102 @@
+import pandas as pd
+from enrichment.entities import EntityIndex, index_outputs, normalize_name
+from enrichment.logic import enrich_keys, run_cascade
+from enrichment.metrics import REGISTRY as metrics
+
+class Vendor:
+    vendor = "zoominfo"
+
+    def __init__(self, found):
+        self.found = found
+        self.calls = []
+
+    def _lookup(self, method, key):
+        self.calls.append((method, key))
+        obj = self.found.get((method, key))
+        return (obj, None) if obj else (None, "not found")
+
+    def company_by_id(self, k, retries=3): return self._lookup("company_by_id", k)
+    def company_by_domain(self, k, retries=3): return self._lookup("company_by_domain", k)
+    def company_by_name(self, k, retries=3): return self._lookup("company_by_name", k)
+    def company_by_salesforce_id(self, k, retries=3): return self._lookup("company_by_salesforce_id", k)
+
+def test_normalize_name():
+    assert normalize_name("Acme, Inc.") == normalize_name("ACME  corp") == "acme"
+    assert normalize_name("Co") == "co"
+
+def test_exact_and_fuzzy_resolve(tmp_path):
+    idx = EntityIndex(str(tmp_path / "e.sqlite"), fuzzy_threshold=0.8)
+    idx.add("zoominfo", {"id": 7, "name": "Acme"}, [("company_by_domain", "acme.com"), ("company_by_name", "Acme Widgets Inc")])
+    assert idx.resolve("zoominfo", [("company_by_domain", "ACME.com")])["id"] == 7
+    assert idx.resolve("zoominfo", [("company_by_id", "7")])["id"] == 7
+    assert idx.resolve("zoominfo", [("company_by_name", "Acme Widgetts")])["id"] == 7
+    assert idx.resolve("zoominfo", [("company_by_name", "Other Co")]) is None
+    assert idx.resolve("apollo", [("company_by_domain", "acme.com")]) is None
+    idx.close()
+    # Persisted: a reopened index answers the same keys
+    idx = EntityIndex(str(tmp_path / "e.sqlite"), fuzzy_threshold=None)
+    assert idx.resolve("zoominfo", [("company_by_name", "acme widgets")])["id"] == 7
+    assert idx.resolve("zoominfo", [("company_by_name", "Acme Widgetts")]) is None
+    idx.close()
+
+def test_max_age(tmp_path):
+    idx = EntityIndex(str(tmp_path / "e.sqlite"), max_age_seconds=60)
+    idx.add("zoominfo", {"id": 1}, [("company_by_domain", "old.com")], updated_at=1.0)
+    assert idx.resolve("zoominfo", [("company_by_domain", "old.com")]) is None
+    idx.close()
+
+def test_cascade_skips_network_on_hit_and_learns_from_winning_step(tmp_path):
+    metrics.reset()
+    idx = EntityIndex(str(tmp_path / "e.sqlite"))
+    v = Vendor({("company_by_name", "Acme"): {"id": 3}})
+    steps = [("company_by_domain", "acme.com"), ("company_by_name", "Acme")]
+    assert run_cascade(v, steps, 1, entities=idx) == ({"id": 3}, None)
+    assert len(v.calls) == 2
+    # The domain came back not found, so only the name (and the vendor ID) learned the record
+    assert idx.resolve("zoominfo", [("company_by_domain", "acme.com")]) is None
+    assert run_cascade(v, [("company_by_domain", "other.com"), ("company_by_name", "Acme")], 1, entities=idx)[0] == {"id": 3}
+    assert len(v.calls) == 2
+    assert metrics.value("matched_by_total", vendor="zoominfo", strategy="entity_index") == 1
+    idx.close()
+
+def test_index_outputs_marks_conflicting_keys(tmp_path):
+    out = tmp_path / "out.csv"
+    pd.DataFrame({"site": ["a.com", "a.com", "b.com"], "zi_match": ["True", "True", "False"],
+                  "zi_error": ["", "", "not_found"], "zi_id": ["1", "2", ""], "zi_name": ["A", "A2", ""]}).to_csv(out, index=False)
+    idx = EntityIndex(str(tmp_path / "e.sqlite"))
+    added = index_outputs(idx, [str(out)], {"website": "site"}, {"zoominfo": "zi", "apollo": "ap"})
+    assert added == {"zoominfo": 2, "apollo": 0}
+    assert idx.resolve("zoominfo", [("company_by_id", "2")]) == {"id": "2", "name": "A2"}
+    assert idx.resolve("zoominfo", [("company_by_domain", "a.com")]) is None
+    idx.close()
+
+def test_enrich_keys_uses_index_for_both_vendors(tmp_path):
+    idx = EntityIndex(str(tmp_path / "e.sqlite"))
+    z, a = Vendor({}), Vendor({})
+    a.vendor = "apollo"
+    idx.add("zoominfo", {"id": 1}, [("company_by_domain", "x.com")])
+    idx.add("apollo", {"id": 2}, [("company_by_salesforce_id", "SF1")])
+    out = enrich_keys(("", "", "SF1", "", "x.com"), {"zoominfo": z, "apollo": a},
+                      {"prefix_zoominfo": "zi", "prefix_apollo": "ap", "entities": idx})
+    assert out["zi_id"] == 1 and out["ap_id"] == 2
+    assert z.calls == [] and a.calls == []
+    idx.close()
+
+def test_fuzzy_names_only_for_name_only_rows_and_marked(tmp_path):
+    idx = EntityIndex(str(tmp_path / "e.sqlite"), fuzzy_threshold=0.75)  # "company 123" vs "company 1234": 0.786
+    idx.add("zoominfo", {"id": 39868}, [("company_by_name", "Company 1234")])
+    assert EntityIndex(str(tmp_path / "e.sqlite")).resolve("zoominfo", [("company_by_name", "Company 123")]) is None
+    # A row with a domain asks the vendor rather than taking a similar name
+    z = Vendor({})
+    out = enrich_keys(("", "", "", "Company 123", "c123.com"), {"zoominfo": z, "apollo": Vendor({})},
+                      {"prefix_zoominfo": "zi", "prefix_apollo": "ap", "entities": idx})
+    assert not out["zi_match"] and not out["zi_fuzzy_match"]
+    assert z.calls == [("company_by_domain", "c123.com"), ("company_by_name", "Company 123")]
+    out = enrich_keys(("", "", "", "Company 123", ""), {"zoominfo": Vendor({}), "apollo": Vendor({})},
+                      {"prefix_zoominfo": "zi", "prefix_apollo": "ap", "entities": idx})
+    assert out["zi_id"] == 39868 and out["zi_fuzzy_match"] and out["zi_error"] == ""
+    idx.add("zoominfo", {"id": 5}, [("company_by_name", "Exact Co")])
+    out = enrich_keys(("", "", "", "Exact Co", ""), {"zoominfo": Vendor({}), "apollo": Vendor({})},
+                      {"prefix_zoominfo": "zi", "prefix_apollo": "ap", "entities": idx})
+    assert out["zi_id"] == 5 and not out["zi_fuzzy_match"]
+    idx.close()
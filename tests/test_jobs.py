@@ -0,0 +1,58 @@
+import threading, time
+from enrichment.jobs import JobRegistry
+
+def slow_rows(n, delay=0.01, produced=None):
+    def make():
+        for i in range(n):
+            time.sleep(delay)
+            if produced is not None:
+                produced.append(i)
+            yield {"i": i}
+    return make
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+def test_job_runs_in_background_and_reports_progress():
+    closed = threading.Event()
+    job = JobRegistry().submit(slow_rows(20), 20, "t", on_close=closed.set)
+    assert job.progress()["done"] < 20
+    job.join(2)
+    p = job.progress()
+    assert p["status"] == "finished" and p["done"] == 20 and p["fraction"] == 1.0
+    assert [r["i"] for r in job.rows] == list(range(20)) and closed.is_set()
+
+def test_pause_resume_and_cancel():
+    produced = []
+    job = JobRegistry().submit(slow_rows(1000, produced=produced), 1000)
+    assert wait_for(lambda: len(job.rows) > 3)
+    job.pause()
+    assert wait_for(lambda: job.status == "paused")
+    n = len(produced)
+    time.sleep(0.1)
+    assert len(produced) == n  # the stream is not pulled while paused
+    job.resume()
+    assert wait_for(lambda: len(produced) > n)
+    job.cancel()
+    job.join(2)
+    assert job.status == "cancelled" and len(job.rows) < 1000
+
+def test_failed_job_keeps_error():
+    def boom():
+        yield {"i": 0}
+        raise RuntimeError("vendor down")
+    job = JobRegistry().submit(boom, 2)
+    job.join(2)
+    assert job.status == "failed" and "vendor down" in job.error and len(job.rows) == 1
+
+def test_registry_prunes_old_finished_jobs():
+    reg = JobRegistry(keep_finished=2)
+    jobs = [reg.submit(slow_rows(1, 0), 1) for _ in range(3)]
+    for j in jobs:
+        j.join(2)
+    reg.submit(slow_rows(1, 0), 1).join(2)
+    ids = [j.id for j in reg.jobs()]
+    assert jobs[0].id not in ids and reg.get(jobs[2].id) is not None
@@ -0,0 +1,59 @@
+import pytest
+from enrichment.journal import Journal, JournalMismatch, file_fingerprint
+
+def test_resume_skips_finished_rows_and_drops_torn_write(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    j = Journal(path, "fp")
+    j.append(0, {"a": 1})
+    j.append(1, {"a": 2, "b": 3})
+    j.close()
+    with open(path, "a") as f:
+        f.write('{"i":2,"r":{"a"')  # crash mid-write
+    j = Journal(path, "fp", resume=True)
+    assert j.done == {0, 1}
+    assert list(j.columns) == ["a", "b"]
+    j.append(2, {"a": 4})
+    j.close()
+    assert [r["a"] for r in j.rows()] == [1, 2, 4]
+
+def test_resume_drops_complete_json_without_newline(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    j = Journal(path, "fp")
+    j.append(0, {"a": 1})
+    j.close()
+    with open(path, "a") as f:
+        f.write('{"i":1,"r":{"a":2}}')  # parses, but the newline never made it
+    j = Journal(path, "fp", resume=True)
+    assert j.done == {0}
+    j.append(1, {"a": 3})
+    j.close()
+    assert [r["a"] for r in j.rows()] == [1, 3]
+    with open(path, "w") as f:
+        f.write('{"fingerprint": "fp"}')  # torn header: started over
+    j = Journal(path, "fp", resume=True)
+    assert j.done == set()
+    j.append(0, {"a": 1})
+    j.close()
+    assert [r["a"] for r in j.rows()] == [1]
+
+def test_rows_come_back_in_input_order(tmp_path):
+    j = Journal(str(tmp_path / "j.jsonl"), "fp", batch_rows=1)
+    for i in (3, 0, 2, 1):
+        j.append(i, {"i": i})
+    j.close()
+    assert [r["i"] for r in j.rows()] == [0, 1, 2, 3]
+
+def test_resume_refuses_other_input(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    Journal(path, "fp-a").close()
+    with pytest.raises(JournalMismatch):
+        Journal(path, "fp-b", resume=True)
+
+def test_fingerprint_covers_content_and_config(tmp_path):
+    p = tmp_path / "in.csv"
+    p.write_text("a\n1\n")
+    fp = file_fingerprint(str(p), {"name": "a"})
+    assert fp == file_fingerprint(str(p), {"name": "a"})
+    assert fp != file_fingerprint(str(p), {"name": "b"})
+    p.write_text("a\n2\n")
+    assert fp != file_fingerprint(str(p), {"name": "a"})
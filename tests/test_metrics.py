@@ -0,0 +1,63 @@
+import pytest
+from enrichment.clients.zoominfo import ZoomInfoClient
+from enrichment.logic import run_cascade, zoominfo_steps
+from enrichment.metrics import REGISTRY, Histogram, Registry, strategy_table
+from test_clients import fast_transport, server  # noqa: F401
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+def test_histogram_quantiles():
+    h = Histogram(buckets=(1, 2, 4))
+    for v in (0.5, 1.5, 1.5, 3, 10):
+        h.observe(v)
+    assert h.count == 5 and h.sum == 16.5
+    assert 1 <= h.quantile(0.5) <= 2
+    assert h.quantile(1.0) == 4
+    assert Histogram().quantile(0.5) is None
+
+def test_summary_and_prometheus():
+    r = Registry()
+    r.inc("calls_total", vendor="apollo")
+    r.inc("calls_total", 2, vendor="apollo")
+    r.observe("seconds", 0.02, vendor='a"b')
+    assert r.value("calls_total", vendor="apollo") == 3
+    summary = r.summary()
+    assert summary["counters"]["calls_total"] == [{"labels": {"vendor": "apollo"}, "value": 3}]
+    assert summary["histograms"]["seconds"][0]["count"] == 1
+    text = r.to_prometheus()
+    assert 'enrichment_calls_total{vendor="apollo"} 3' in text
+    assert 'enrichment_seconds_bucket{vendor="a\\"b",le="+Inf"} 1' in text
+    assert 'enrichment_seconds_count{vendor="a\\"b"} 1' in text
+
+class Stub:
+    vendor = "zoominfo"
+
+    def company_by_id(self, key, retries=3):
+        return None, "HTTP 500: boom"
+
+    def company_by_domain(self, key, retries=3):
+        return None, "not found"
+
+    def company_by_name(self, key, retries=3):
+        return {"id": 1}, None
+
+def test_cascade_records_strategies():
+    assert run_cascade(Stub(), zoominfo_steps("7", "acme.com", "Acme"), 1) == ({"id": 1}, None)
+    assert REGISTRY.value("matched_by_total", vendor="zoominfo", strategy="name") == 1
+    rows = {r["strategy"]: r for r in strategy_table(REGISTRY.summary())}
+    assert rows["id"]["error"] == 1 and rows["domain"]["not_found"] == 1 and rows["name"]["match"] == 1
+
+def test_transport_records_status_and_retries(server):  # noqa: F811
+    url, h = server
+    h.script = {"/lookup/company": [(503, {}), (429, {}), (200, {"id": 1})]}
+    zc = ZoomInfoClient("k", base_url=url, transport=fast_transport())
+    assert zc.company_by_domain("acme.com") == ({"id": 1}, None)
+    labels = dict(vendor="zoominfo", endpoint="/lookup/company")
+    assert REGISTRY.value("http_responses_total", status="503", **labels) == 1
+    assert REGISTRY.value("http_responses_total", status="200", **labels) == 1
+    assert REGISTRY.value("http_retries_total", **labels) == 2
+    assert REGISTRY.value("backoff_seconds_total", vendor="zoominfo") > 0
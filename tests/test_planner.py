@@ -0,0 +1,88 @@
+import asyncio, json, threading, time
+from enrichment.logic import run_cascade, run_cascade_async, apollo_steps
+from enrichment.planner import CascadePlanner
+
+class Stub:
+    vendor = "apollo"
+
+    def __init__(self, hits=("company_by_domain",), delay=0.0):
+        self.hits = hits
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _answer(self, method, key):
+        with self.lock:
+            self.calls.append(method)
+        time.sleep(self.delay)
+        return ({"id": key}, None) if method in self.hits else (None, "not found")
+
+    def company_by_id(self, key, retries=3):
+        return self._answer("company_by_id", key)
+
+    def company_by_salesforce_id(self, key, retries=3):
+        return self._answer("company_by_salesforce_id", key)
+
+    def company_by_domain(self, key, retries=3):
+        return self._answer("company_by_domain", key)
+
+    def company_by_name(self, key, retries=3):
+        return self._answer("company_by_name", key)
+
+def test_planner_skips_low_yield_strategies():
+    planner = CascadePlanner(min_yield=0.1, min_samples=5, explore_every=1000)
+    client = Stub()
+    steps = apollo_steps("", "001", "acme.com", "Acme")
+    for _ in range(10):
+        assert run_cascade(client, steps, 1, planner) == ({"id": "acme.com"}, None)
+    assert client.calls.count("company_by_salesforce_id") == 5
+    assert planner.plan("apollo", steps) == [("company_by_domain", "acme.com"), ("company_by_name", "Acme")]
+    # never plans a row down to nothing
+    assert planner.plan("apollo", [("company_by_salesforce_id", "001"), ("company_by_salesforce_id", "002")]) == \
+        [("company_by_salesforce_id", "001")]
+
+def test_planner_reorders_by_hits_per_second():
+    planner = CascadePlanner(min_yield=0.0, min_samples=2, reorder=True)
+    for _ in range(3):
+        planner.record("apollo", "company_by_domain", (None, "not found"), 0.1, True)
+        planner.record("apollo", "company_by_name", ({"id": 1}, None), 0.1, True)
+    assert planner.plan("apollo", [("company_by_domain", "a.com"), ("company_by_name", "A")])[0][0] == "company_by_name"
+
+def test_parallel_top_two_overlaps_first_steps():
+    planner = CascadePlanner(parallel_top=True)
+    client = Stub(hits=("company_by_salesforce_id",), delay=0.1)
+    started = time.perf_counter()
+    assert run_cascade(client, apollo_steps("", "001", "acme.com", ""), 1, planner)[0] == {"id": "001"}
+    assert time.perf_counter() - started < 0.18
+    planner.close()
+    assert sorted(client.calls) == ["company_by_domain", "company_by_salesforce_id"]
+
+def test_async_parallel_top_two():
+    class AsyncStub(Stub):
+        async def company_by_salesforce_id(self, key, retries=3):
+            await asyncio.sleep(0.05)
+            return None, "not found"
+
+        async def company_by_domain(self, key, retries=3):
+            await asyncio.sleep(0.05)
+            return {"id": key}, None
+
+    planner = CascadePlanner(parallel_top=True)
+    started = time.perf_counter()
+    result = asyncio.run(run_cascade_async(AsyncStub(), [("company_by_salesforce_id", "1"), ("company_by_domain", "a.com")],
+                                           1, planner=planner))
+    assert result == ({"id": "a.com"}, None)
+    assert time.perf_counter() - started < 0.09
+
+def test_planner_state_round_trip(tmp_path):
+    path = str(tmp_path / "planner.json")
+    planner = CascadePlanner(state_path=path, max_history=10)
+    for _ in range(20):
+        planner.record("zoominfo", "company_by_name", (None, "not found"), 0.5, True)
+    planner.close()
+    restored = CascadePlanner(state_path=path, max_history=10, min_samples=10, min_yield=0.5)
+    rec = restored.snapshot()[0]
+    assert rec["calls"] == 10 and rec["hits"] == 0
+    assert restored.plan("zoominfo", [("company_by_domain", "a.com"), ("company_by_name", "A")]) == \
+        [("company_by_domain", "a.com")]
+    assert json.load(open(path))["strategies"][0]["method"] == "company_by_name"
@@ -0,0 +1,22 @@
+import pandas as pd
+from enrichment.logic import lookup_keys
+from enrichment.preprocess import iter_lookup_keys, lookup_key_frame, sanitize_domains
+from enrichment.utils import sanitize_domain
+
+WEBSITES = ["https://www.example.com", "http://example.com/abc", "example.com", "", "  WWW.Acme.IO/x ",
+            "https://sub.example.com?q=1", "https://user@Host.com:8080/p", "HTTP://x.com", "www.", "https://",
+            "ftp://files.example.com", "acme.com?ref=1", None]
+
+def test_sanitize_domains_matches_scalar_version():
+    vec = sanitize_domains(pd.Series(WEBSITES, dtype=object)).tolist()
+    assert vec == [sanitize_domain(w or "") for w in WEBSITES]
+
+def test_lookup_key_frame_matches_row_extraction():
+    df = pd.DataFrame({"zi": [" Z1 ", ""], "ap": ["", "A1"], "sf": ["", " SF "], "n": ["Acme ", ""],
+                       "w": ["https://www.acme.com/", "globex.com"]})
+    mapping = {"zoominfo_id": "zi", "apollo_id": "ap", "salesforce_id": "sf", "name": "n", "website": "w"}
+    assert list(iter_lookup_keys(lookup_key_frame(df, mapping))) == [lookup_keys(r, mapping) for _, r in df.iterrows()]
+
+def test_lookup_key_frame_unmapped_columns():
+    df = pd.DataFrame({"n": ["Acme"]})
+    assert list(iter_lookup_keys(lookup_key_frame(df, {"name": "n"}))) == [("", "", "", "Acme", "")]
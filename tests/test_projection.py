@@ -0,0 +1,37 @@
+import json
+from enrichment.logic import vendor_columns
+from enrichment.projection import compile_projection, compile_pruner
+from enrichment.utils import flatten
+
+PAYLOAD = {"id": 7, "name": "Acme", "address": {"city": "Austin", "zip": "78701"},
+           "industries": [{"name": "Software", "code": 1}, {"name": "SaaS", "code": 2}, {"name": "AI", "code": 3}],
+           "tags": ["a", "b"], "big": {"blob": list(range(100))}}
+
+def test_empty_projection_matches_flatten():
+    assert compile_projection([])("zi", PAYLOAD) == flatten("zi", PAYLOAD)
+
+def test_projection_keeps_only_requested_paths():
+    project = compile_projection(["name", "address.city", "industries.name", "missing.path"], max_list_items=2)
+    assert project("zi", PAYLOAD) == {"zi_name": "Acme", "zi_address_city": "Austin",
+                                      "zi_industries_0_name": "Software", "zi_industries_1_name": "SaaS"}
+
+def test_projection_subtree_and_list_cap():
+    project = compile_projection(["address", "tags", "address.city"], max_list_items=1)
+    assert project("ap", PAYLOAD) == {"ap_address_city": "Austin", "ap_address_zip": "78701", "ap_tags_0": "a"}
+
+def test_vendor_columns_json_column():
+    cfg = {"add_vendor_json_columns": True, "projections": {"zoominfo": compile_projection(["id"])}}
+    out = vendor_columns(({"id": 7, "x": {"y": 1}}, None), (None, "not found"), cfg)
+    assert out["zi_id"] == 7 and "zi_x_y" not in out
+    assert json.loads(out["zi_json"]) == {"id": 7, "x": {"y": 1}}
+    assert "ap_json" not in out and out["ap_error"] == "not found"
+
+def test_pruned_payload_projects_the_same():
+    paths = ["name", "address.city", "industries.name", "missing.path"]
+    pruned = compile_pruner(paths)(PAYLOAD)
+    assert pruned == {"id": 7, "name": "Acme", "address": {"city": "Austin"},
+                      "industries": [{"name": "Software"}, {"name": "SaaS"}, {"name": "AI"}]}
+    project = compile_projection(paths, max_list_items=2)
+    assert project("zi", pruned) == project("zi", PAYLOAD)
+    assert compile_pruner([])(PAYLOAD) is PAYLOAD
+    assert compile_pruner(["missing"], keep=())(PAYLOAD) is PAYLOAD
@@ -0,0 +1,105 @@
+import asyncio, time
+from enrichment.ratelimit import TokenBucket, parse_retry_after
+
+def test_token_bucket_spaces_calls():
+    tb = TokenBucket(600)  # 10/s, burst of 10
+    waits = [tb.reserve() for _ in range(12)]
+    assert waits[0] == 0.0
+    assert waits[-1] > 0.1
+
+def test_token_bucket_unlimited():
+    tb = TokenBucket(0)
+    assert all(tb.reserve() == 0.0 for _ in range(100))
+
+def test_unlimited_lane_honors_pauses():
+    tb = TokenBucket(0)
+    assert not tb.paces(429)  # nothing to pace with: the caller backs off
+    tb.observe(429, {"Retry-After": "2"})
+    assert tb.reserve() > 1.5 and tb.paces(429)
+    assert not tb.paces(503)
+
+def test_retry_after_pauses_lane():
+    tb = TokenBucket(6000)
+    tb.observe(429, {"Retry-After": "2"})
+    assert tb.reserve() > 1.5
+
+def test_remaining_zero_pauses_until_reset():
+    tb = TokenBucket(6000)
+    tb.observe(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"})
+    assert tb.reserve() > 2.5
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+
+def test_acquire_async():
+    tb = TokenBucket(60000)
+
+    async def run():
+        await asyncio.gather(*[tb.acquire_async() for _ in range(20)])
+
+    t0 = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - t0 < 2
+
+def test_adaptive_grows_while_healthy_and_cuts_on_429():
+    from enrichment.ratelimit import AdaptiveLimiter
+    tb = AdaptiveLimiter(60000, concurrency=2, max_concurrency=8, max_per_minute=120000, cooldown=60)
+    for _ in range(20):
+        tb.acquire()
+        tb.release(200, 0.01)
+    assert tb.limit > 2 and 60000 < tb.per_minute <= 120000
+    limit, rate = tb.limit, tb.per_minute
+    tb.acquire()
+    tb.release(429, 0.01)
+    assert tb.limit == max(1, int(limit * 0.5)) and tb.per_minute == rate * 0.5
+    tb.acquire()
+    tb.release(503, 0.01)  # within the cooldown: one storm, one cut
+    assert tb.per_minute == rate * 0.5
+
+def test_adaptive_cuts_on_rising_latency():
+    from enrichment.ratelimit import AdaptiveLimiter
+    tb = AdaptiveLimiter(6000, concurrency=50, max_concurrency=50, max_per_minute=6000)
+    for _ in range(10):
+        tb.acquire()
+        tb.release(200, 0.1)
+    for _ in range(10):
+        tb.acquire()
+        tb.release(200, 1.0)
+    assert tb.per_minute < 6000 and tb.limit < 50
+
+def test_adaptive_caps_in_flight():
+    import threading
+    from enrichment.ratelimit import AdaptiveLimiter
+    tb = AdaptiveLimiter(60000, concurrency=1, max_concurrency=1)
+    tb.acquire()
+    got = threading.Event()
+    t = threading.Thread(target=lambda: (tb.acquire(), got.set()))
+    t.start()
+    assert not got.wait(0.1)
+    tb.release(0, 0.0)  # abandoned call frees its slot without feeding the controller
+    assert got.wait(1.0)
+    t.join()
+    assert tb.limit == 1
+
+def test_adaptive_async_waiters_are_woken_not_polled():
+    from enrichment.ratelimit import AdaptiveLimiter
+    tb = AdaptiveLimiter(6_000_000, concurrency=1, max_concurrency=1)
+
+    async def run():
+        await tb.acquire_async()
+        waiter = asyncio.ensure_future(tb.acquire_async())
+        await asyncio.sleep(0)
+        tb.release(0, 0.0)
+        for _ in range(3):  # a few loop passes, well short of any polling interval
+            await asyncio.sleep(0)
+        assert waiter.done()
+        # A cancelled waiter passes its wakeup on instead of stranding the next one
+        first, second = asyncio.ensure_future(tb.acquire_async()), asyncio.ensure_future(tb.acquire_async())
+        await asyncio.sleep(0)
+        tb.release(0, 0.0)
+        first.cancel()
+        await asyncio.wait_for(second, 1.0)
+
+    asyncio.run(run())
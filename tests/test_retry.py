@@ -0,0 +1,96 @@
+import time
+from enrichment.clients.transport import CIRCUIT_OPEN, EXHAUSTED
+from enrichment.engine import enrich_key_stream
+from enrichment.logic import run_cascade
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.ratelimit import CircuitBreaker
+from enrichment.retry import BUDGET_COLUMN, DeferredRetries
+from test_engine import SlowA, SlowZ
+
+CFG = {"prefix_zoominfo": "zi", "prefix_apollo": "ap", "max_attempts": 1}
+
+class FlakyZ(SlowZ):
+    # Fails the first `failures` calls per domain; "down.com" never recovers
+    def __init__(self, failures=2):
+        self.failures = failures
+        self.calls = {}
+
+    def company_by_domain(self, d, retries=3):
+        self.calls[d] = self.calls.get(d, 0) + 1
+        if d == "down.com" or self.calls[d] <= self.failures:
+            return (None, EXHAUSTED)
+        return ({"domain": d}, None)
+
+class CountingA(SlowA):
+    def __init__(self):
+        self.calls = 0
+
+    def company_by_domain(self, d, retries=3):
+        self.calls += 1
+        return ({"domain": d}, None)
+
+def keys(*domains):
+    return [("", "", "", "", d) for d in domains]
+
+def test_cascade_reports_transient_failure_over_later_miss():
+    class Z(SlowZ):
+        def company_by_domain(self, d, retries=3):
+            return (None, EXHAUSTED)
+    assert run_cascade(Z(), [("company_by_domain", "a.com"), ("company_by_name", "A")], 1) == (None, EXHAUSTED)
+
+def test_deferred_retries_park_rows_and_keep_order():
+    z, a = FlakyZ(failures=2), CountingA()
+    retry = DeferredRetries(max_attempts=5, base_delay=0.01, max_delay=0.02, budget_seconds=5)
+    out = list(enrich_key_stream(keys("a.com", "b.com", "c.com"), {"zoominfo": z, "apollo": a},
+                                 dict(CFG, retry=retry), workers=1))
+    assert [r["zi_domain"] for r in out] == ["a.com", "b.com", "c.com"]
+    assert z.calls == {"a.com": 3, "b.com": 3, "c.com": 3}
+    assert a.calls == 3  # Apollo matched on the first pass and is not asked again
+    assert not any(r[BUDGET_COLUMN] for r in out)
+    assert retry.waiting == 0
+
+def test_rows_out_of_budget_are_flagged():
+    metrics.reset()
+    z = FlakyZ(failures=0)
+    retry = DeferredRetries(max_attempts=3, base_delay=0.01, max_delay=0.01, budget_seconds=5)
+    out = list(enrich_key_stream(keys("down.com", "ok.com"), {"zoominfo": z, "apollo": CountingA()},
+                                 dict(CFG, retry=retry), workers=2))
+    assert out[0]["zi_error"] == EXHAUSTED and out[0][BUDGET_COLUMN] and out[0]["ap_match"]
+    assert out[1]["zi_match"] and not out[1][BUDGET_COLUMN]
+    assert z.calls["down.com"] == 3
+    assert metrics.value("retry_budget_exhausted_total") == 1
+    retry = DeferredRetries(max_attempts=100, base_delay=0.05, max_delay=0.05, budget_seconds=0.2)
+    started = time.monotonic()
+    out = list(enrich_key_stream(keys("down.com"), {"zoominfo": FlakyZ(), "apollo": CountingA()},
+                                 dict(CFG, retry=retry), workers=2))
+    assert out[0][BUDGET_COLUMN] and time.monotonic() - started < 1
+
+def test_circuit_opens_probes_and_closes():
+    b = CircuitBreaker("zoominfo", failures=3, reset_seconds=0.05)
+    for status in (503, None, 429, 500, 502, 503):
+        assert b.allow()
+        b.record(status)
+    assert b.state == "open" and not b.allow()
+    time.sleep(0.06)
+    assert b.allow() and not b.allow()  # one probe at a time
+    b.record(503)
+    assert b.state == "open"
+    time.sleep(0.06)
+    assert b.allow()
+    b.record(200)
+    assert b.state == "closed" and b.allow()
+
+def test_open_circuit_defers_without_spending_attempts():
+    class Breaking(SlowZ):
+        def __init__(self):
+            self.refused = 2
+
+        def company_by_domain(self, d, retries=3):
+            if self.refused:
+                self.refused -= 1
+                return (None, CIRCUIT_OPEN)
+            return ({"domain": d}, None)
+    retry = DeferredRetries(max_attempts=1, circuit_delay=0.01, budget_seconds=5)
+    out = list(enrich_key_stream(keys("a.com"), {"zoominfo": Breaking(), "apollo": CountingA()},
+                                 dict(CFG, retry=retry), workers=1))
+    assert out[0]["zi_match"] and not out[0][BUDGET_COLUMN]
@@ -0,0 +1,64 @@
+import json, threading
+import requests
+from enrichment.metrics import REGISTRY as metrics
+from enrichment.service import EnrichmentServer, RowBatcher, parse_records, record_keys
+from test_engine import CountingZ, SlowA
+
+CFG = {"prefix_zoominfo": "zi", "prefix_apollo": "ap"}
+
+def serve(vendors, mapping=None, **kw):
+    batcher = RowBatcher(vendors, CFG, workers=4, max_wait=0.05)
+    server = EnrichmentServer(batcher, mapping or {}, port=0, **kw)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+    server.batcher.close()
+
+def test_parse_records_and_keys():
+    assert parse_records({"name": "A"}) == [{"name": "A"}]
+    assert parse_records({"records": [{"name": "A"}]}) == [{"name": "A"}]
+    assert parse_records([1]) is None
+    keys = record_keys([{"Company": "Acme", "website": "https://www.acme.com/x"}, {"salesforce_id": " 001 "}],
+                       {"name": "Company"})
+    assert keys == [("", "", "", "Acme", "acme.com"), ("", "", "001", "", "")]
+    # Numeric IDs stay as sent even when other records lack the field
+    assert record_keys([{"zoominfo_id": 123, "name": "a"}, {"name": "b"}], {})[0][0] == "123"
+
+def test_enrich_streams_ndjson_in_order_and_batches_requests():
+    metrics.reset()
+    z = CountingZ()
+    server = serve({"zoominfo": z, "apollo": SlowA()})
+    try:
+        records = [{"website": f"c{i % 3}.com", "n": i} for i in range(6)]
+        results = [None, None]
+
+        def post(slot):
+            r = requests.post(f"{server.url}/enrich", json={"records": records}, stream=True)
+            assert r.headers["Content-Type"] == "application/x-ndjson"
+            results[slot] = [json.loads(line) for line in r.iter_lines() if line]
+
+        threads = [threading.Thread(target=post, args=(s,)) for s in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for out in results:
+            assert [r["n"] for r in out] == list(range(6))
+            assert [r["zi_domain"] for r in out] == [f"c{i % 3}.com" for i in range(6)]
+        # Identical keys within a micro-batch are looked up once
+        assert z.calls < 12
+        assert metrics.value("service_rows_total") == 12
+        assert requests.post(f"{server.url}/enrich", data="nope").status_code == 400
+        assert requests.get(f"{server.url}/healthz").json() == {"status": "ok"}
+    finally:
+        stop(server)
+
+def test_rejects_oversized_requests():
+    server = serve({"zoominfo": CountingZ(), "apollo": SlowA()}, max_records=2)
+    try:
+        assert requests.post(f"{server.url}/enrich", json=[{"name": "a"}] * 3).status_code == 413
+    finally:
+        stop(server)
@@ -0,0 +1,36 @@
+import csv
+import pandas as pd
+import pytest
+from enrichment.preprocess import lookup_key_frame
+from enrichment.sharding import ROW_INDEX, merge_shards, merged_columns, parse_shard, primary_keys, shard_of
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    for bad in ("4/4", "x", "1/0", "-1/2"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+def test_duplicates_share_a_shard():
+    df = pd.DataFrame({"n": ["Acme  Inc", "acme inc", "Other", ""], "w": ["", "", "https://www.Acme.com/x", "acme.com"],
+                       "id": ["", "", "", "7"]})
+    keys = lookup_key_frame(df, {"name": "n", "website": "w", "zoominfo_id": "id"})
+    assert primary_keys(keys).tolist() == ["name:acme inc", "name:acme inc", "domain:acme.com", "domain:acme.com"]
+    shards = shard_of(keys, 7)
+    assert shards[0] == shards[1] and shards[2] == shards[3]
+    assert shard_of(keys, 7).tolist() == shards.tolist()
+
+def test_merged_columns_unifies_vendor_columns():
+    assert merged_columns([["_row", "name", "ap_a", "zi_b"], ["_row", "name", "ap_c"]]) == \
+        ["_row", "name", "ap_a", "ap_c", "zi_b"]
+
+def test_merge_restores_input_order(tmp_path):
+    a, b = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    pd.DataFrame({ROW_INDEX: [0, 3], "name": ["x", "y"], "zi_id": ["1", "2"]}).to_csv(a, index=False)
+    pd.DataFrame({ROW_INDEX: [1, 2, 4], "name": ["p", "q", "r"], "ap_id": ["5", "", "6"]}).to_csv(b, index=False)
+    out = str(tmp_path / "out.csv")
+    assert merge_shards([a, b], out) == 5
+    with open(out, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["name", "ap_id", "zi_id"]
+    assert [r[0] for r in rows[1:]] == ["x", "p", "q", "y", "r"]
+    assert rows[4] == ["y", "", "2"]
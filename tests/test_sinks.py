@@ -0,0 +1,84 @@
+import csv, os
+import pandas as pd
+import pytest
+from enrichment.sinks import CsvSink, open_sink
+
+def test_csv_sink_unifies_evolving_columns(tmp_path):
+    path = str(tmp_path / "out.csv")
+    sink = CsvSink(path, ["name"])
+    sink.write({"name": "a", "zi_match": True, "zi_b": 1})
+    sink.write({"name": "b", "zi_match": False, "ap_x": None, "zi_a": "z"})
+    assert sink.close() == 2
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["name", "ap_x", "zi_a", "zi_b", "zi_match"]
+    assert rows[1] == ["a", "", "", "1", "True"]
+    assert rows[2] == ["b", "", "z", "", "False"]
+    assert not os.path.exists(path + ".journal.jsonl")
+
+def test_csv_sink_empty_writes_nothing(tmp_path):
+    path = str(tmp_path / "out.csv")
+    assert CsvSink(path, ["name"]).close() == 0
+    assert not os.path.exists(path)
+
+def test_open_sink_infers_format(tmp_path):
+    from enrichment.sinks import infer_format
+    assert infer_format("x.parquet") == "parquet"
+    assert infer_format("x.ARROW") == "arrow"
+    assert infer_format("x.csv") == "csv"
+    assert type(open_sink(str(tmp_path / "o.csv"), [])) is CsvSink
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_sink_types_and_row_groups(tmp_path, fmt):
+    pa = pytest.importorskip("pyarrow")
+    from enrichment.sinks import ColumnarSink
+    path = str(tmp_path / f"out.{fmt}")
+    sink = ColumnarSink(path, ["name"], fmt=fmt, row_group_size=2)
+    sink.write({"name": "a", "zi_match": True, "zi_n": 1, "zi_r": 1})
+    sink.write({"name": "b", "zi_match": False, "zi_n": "", "zi_r": 2.5, "ap_tags": ["x"]})
+    sink.write({"name": "c", "zi_match": True, "zi_n": 3})
+    assert sink.close() == 3
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        f = pq.ParquetFile(path)
+        assert f.metadata.num_row_groups == 2
+        table = f.read()
+    else:
+        table = pa.ipc.open_file(path).read_all()
+    assert table.column_names == ["name", "ap_tags", "zi_match", "zi_n", "zi_r"]
+    assert table.schema.field("zi_match").type == pa.bool_()
+    assert table.schema.field("zi_n").type == pa.int64()
+    assert table.schema.field("zi_r").type == pa.float64()
+    assert table.column("zi_n").to_pylist() == [1, None, 3]
+    assert table.column("ap_tags").to_pylist() == [None, '["x"]', None]
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_read_frames_round_trip(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    from enrichment.sinks import read_frames
+    path = str(tmp_path / f"out.{fmt}")
+    sink = open_sink(path, ["name"])
+    for i in range(5):
+        sink.write({"name": f"n{i}", "zi_match": i % 2 == 0, "zi_id": i if i % 2 == 0 else ""})
+    sink.close()
+    frames = list(read_frames(path, chunksize=2))
+    assert [len(f) for f in frames] == [2, 2, 1]
+    df = pd.concat(frames)
+    assert df.index.tolist() == [0, 1, 2, 3, 4]
+    assert df["name"].tolist() == [f"n{i}" for i in range(5)]
+    assert [str(v) for v in df["zi_match"]] == ["True", "False", "True", "False", "True"]
+    assert df["zi_id"].iloc[1] == ""
+
+def test_write_frame_builds_typed_columns_and_rejects_duplicates(tmp_path):
+    pytest.importorskip("pyarrow")
+    import io
+    from enrichment.sinks import write_frame
+    df = pd.DataFrame({"Company Name": ["Z", "Z2"], "zi_match": [True, False], "zi_n": [1, None]})
+    path = str(tmp_path / "out.parquet")
+    assert write_frame(df, path, row_group_size=1) == 2
+    back = pd.read_parquet(path)
+    assert back["Company Name"].tolist() == ["Z", "Z2"] and back["zi_match"].tolist() == [True, False]
+    dup = pd.DataFrame([["Z", "A"]], columns=["Company Name", "Company Name"])
+    with pytest.raises(ValueError, match="Company Name"):
+        write_frame(dup, io.BytesIO())